@@ -0,0 +1,180 @@
+"""
+Budgets on the resources an exploration may use.
+
+A budget is checked between the steps of an engine. Once a limit runs
+out the engine stops, keeps what it has found so far and leaves a
+summary of what it did not get to in its ``summary`` attribute.
+"""
+import builtins
+import io
+import time
+
+import z3
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, memory limits are ignored there
+    resource = None
+
+
+def _rss_mb():
+    """Peak resident memory of the process in MB"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Budget(object):
+    """Limits of a single run of an engine, None for no limit.
+
+    ``time`` is in seconds, ``memory`` in MB and ``query_timeout`` in
+    milliseconds per solver query. ``queries``, ``states`` and ``errors``
+    bound the number of solver queries, of states created by forks and
+    of assertion failures found.
+    """
+
+    def __init__(self, time=None, queries=None, states=None, memory=None,
+                 query_timeout=None, errors=None):
+        self.time = time
+        self.queries = queries
+        self.states = states
+        self.memory = memory
+        self.query_timeout = query_timeout
+        self.errors = errors
+        self.reset()
+
+    def reset(self):
+        """Start counting from scratch"""
+        self._start = time.monotonic()
+        self.num_queries = 0
+        self.num_unknown = 0
+        self.num_states = 1
+        self.num_errors = 0
+        self.num_final = 0
+        self.num_bytes = 0
+
+    def check(self, solver):
+        """Check a solver within the per-query timeout"""
+        if self.query_timeout is not None:
+            solver.set('timeout', self.query_timeout)
+        self.num_queries += 1
+        res = solver.check()
+        if res == z3.unknown:
+            self.num_unknown += 1
+        return res
+
+    def fork(self, n):
+        """Account for a state that forked into n states"""
+        self.num_states += n - 1
+
+    def error(self):
+        """Account for an assertion failure"""
+        self.num_errors += 1
+
+    def final(self, size):
+        """Account for a final state that takes size bytes"""
+        self.num_final += 1
+        self.num_bytes += size
+
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def exhausted(self):
+        """Name the first limit that has run out, None if there is none"""
+        if self.errors is not None and self.num_errors >= self.errors:
+            return 'errors'
+        if self.queries is not None and self.num_queries >= self.queries:
+            return 'queries'
+        if self.states is not None and self.num_states >= self.states:
+            return 'states'
+        if self.time is not None and self.elapsed() >= self.time:
+            return 'time'
+        if self.memory is not None and _rss_mb() >= self.memory:
+            return 'memory'
+        return None
+
+    def summary(self, reason, paths, pending):
+        return Summary(reason, paths, pending, self)
+
+
+class Summary(object):
+    """What a run of an engine did and what it left unexplored.
+
+    ``reason`` names the limit that stopped the run, None if it was
+    complete. ``pending`` is the number of states left unexplored, None
+    if the engine cannot tell.
+    """
+
+    def __init__(self, reason, paths, pending, budget):
+        self.reason = reason
+        self.paths = paths
+        self.pending = pending
+        self.queries = budget.num_queries
+        self.unknown = budget.num_unknown
+        self.states = budget.num_states
+        self.errors = budget.num_errors
+        self.time = budget.elapsed()
+        # mean size of a final state, not counting shared terms
+        self.state_bytes = budget.num_bytes // max(budget.num_final, 1)
+
+    def is_complete(self):
+        """True if every path was explored to the end"""
+        return self.reason is None and self.unknown == 0
+
+    def __str__(self):
+        buf = io.StringIO()
+        if self.reason is None:
+            buf.write('exploration complete')
+        else:
+            buf.write('stopped by the ' + self.reason + ' limit')
+        buf.write(', %d paths done' % self.paths)
+        if self.pending is None:
+            buf.write(', unexplored paths remain')
+        elif self.pending > 0:
+            buf.write(', %d states unexplored' % self.pending)
+        buf.write(', %d queries' % self.queries)
+        if self.unknown > 0:
+            buf.write(' (%d unknown, their paths dropped)' % self.unknown)
+        buf.write(', %d bytes per final state' % self.state_bytes)
+        buf.write(', %.2fs' % self.time)
+        return buf.getvalue()
+
+
+def add_arguments(ap):
+    """Add the budget options to a command line parser"""
+    ap.add_argument('--time', metavar='S', type=float, default=None,
+                    help='Stop after S seconds')
+    ap.add_argument('--max-queries', metavar='N', type=builtins.int, default=None,
+                    help='Stop after N solver queries')
+    ap.add_argument('--max-states', metavar='N', type=builtins.int, default=None,
+                    help='Stop once N states have been created')
+    ap.add_argument('--memory', metavar='MB', type=builtins.int, default=None,
+                    help='Stop once the process uses MB megabytes of memory')
+    ap.add_argument('--query-timeout', metavar='MS', type=builtins.int, default=None,
+                    help='Give up on a solver query after MS milliseconds')
+    ap.add_argument('--max-errors', metavar='K', type=builtins.int, default=None,
+                    help='Stop after K assertion failures')
+    ap.add_argument('--stop-on-first-error', dest='max_errors',
+                    action='store_const', const=1,
+                    help='Stop after the first assertion failure')
+
+
+def check_jobs(ap, args):
+    """Reject the limits of a whole run if the run explores with worker
+       processes, whose budgets only cover one branch prefix each"""
+    if args.jobs <= 1:
+        return
+    limits = [('--time', args.time), ('--max-queries', args.max_queries),
+              ('--max-states', args.max_states),
+              ('--max-errors and --stop-on-first-error', args.max_errors)]
+    for name, val in limits:
+        if val is not None:
+            ap.error(name + ' cannot be used with --jobs')
+
+
+def from_args(args):
+    """Create the budget given on the command line"""
+    return Budget(time=args.time, queries=args.max_queries,
+                  states=args.max_states, memory=args.memory,
+                  query_timeout=args.query_timeout, errors=args.max_errors)
@@ -0,0 +1,88 @@
+"""
+Policies on when a concolic engine gives up on symbolic values.
+
+The engine accounts the solver queries of every branch site to a
+policy. Once the queries of a site cost more than the policy allows,
+the site is run concretely from then on: the variables of the
+condition of an if or assert are bound to their concrete values, and a
+loop is finished concretely. Products and divisions of two values that
+depend on the inputs can be bound as well, before they reach the
+solver. Every such decision is kept in the ``decisions`` attribute.
+"""
+import builtins
+
+
+class Policy(object):
+    """Thresholds on the solver cost of branch sites, None for no limit.
+
+    ``site_time`` bounds the seconds spent on the queries of a single
+    branch site, ``query_size`` the number of constraints of a single
+    query. If ``nonlinear`` is True, non-linear terms are bound to
+    their concrete values.
+    """
+
+    def __init__(self, site_time=None, query_size=None, nonlinear=False):
+        self.site_time = site_time
+        self.query_size = query_size
+        self.nonlinear = nonlinear
+        self.reset()
+
+    def reset(self):
+        """Forget the costs and decisions of previous runs"""
+        # seconds of queries by branch site id
+        self._time = dict()
+        # ids of the branch sites and terms that are run concretely
+        self._concrete = set()
+        # (statement or expression, reason) in the order they were made
+        self.decisions = []
+
+    def query(self, node, seconds, size):
+        """Account for a query of a branch site on a path of size constraints"""
+        total = self._time.get(id(node), 0) + seconds
+        self._time[id(node)] = total
+        if id(node) in self._concrete:
+            return
+        if self.site_time is not None and total >= self.site_time:
+            self._decide(node, 'queries took %.2fs' % total)
+        elif self.query_size is not None and size >= self.query_size:
+            self._decide(node, 'query of %d constraints' % size)
+
+    def is_concrete(self, node):
+        """True if a branch site is run concretely"""
+        return id(node) in self._concrete
+
+    def bind_nonlinear(self, node):
+        """True if the values of a non-linear term are bound. The first
+           time a term is bound it is recorded as a decision"""
+        if not self.nonlinear:
+            return False
+        if id(node) not in self._concrete:
+            self._decide(node, 'non-linear term')
+        return True
+
+    def _decide(self, node, reason):
+        self._concrete.add(id(node))
+        self.decisions.append((node, reason))
+
+
+def describe(decision):
+    """A line of text for a decision of a policy"""
+    node, reason = decision
+    text = str(node).strip().splitlines()
+    return 'concretized %s (%s)' % (text[0] if text else node, reason)
+
+
+def add_arguments(ap):
+    """Add the concretization options to a command line parser"""
+    ap.add_argument('--site-time', metavar='S', type=float, default=None,
+                    help='Run a branch site concretely once its queries took S seconds')
+    ap.add_argument('--max-query-size', metavar='N', type=builtins.int, default=None,
+                    help='Run a branch site concretely once a query has N constraints')
+    ap.add_argument('--concretize-nonlinear', action='store_true',
+                    help='Bind products and divisions of symbolic values to concrete values')
+
+
+def from_args(args):
+    """Create the policy given on the command line"""
+    return Policy(site_time=args.site_time, query_size=args.max_query_size,
+                  nonlinear=args.concretize_nonlinear)
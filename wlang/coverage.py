@@ -0,0 +1,63 @@
+"""
+Branch coverage of programs.
+
+Every outcome of an if, loop or assert of a program, an edge, gets a
+dense id when the program is loaded: the outcomes of the i-th branch
+site in program order are 2i when the condition holds and 2i + 1 when
+it fails. Runs record the edges they take in a bitmap with a byte per
+edge that is shared by all runs of a program.
+"""
+from . import util
+
+
+class Coverage(object):
+    """The edges of a program that runs have taken so far.
+
+    Statements that are not branch sites, such as assumptions, have no
+    edges and count as covered.
+    """
+
+    def __init__(self, prg):
+        self.sites = util.branch_sites(prg)
+        self._ids = {id(s): 2 * i for i, s in enumerate(self.sites)}
+        self.bitmap = bytearray(2 * len(self.sites))
+        # edges that no run can take
+        self._excluded = set()
+
+    def edge(self, node, taken):
+        """The id of an outcome of a branch site, None for other statements"""
+        base = self._ids.get(id(node))
+        if base is None:
+            return None
+        return base + (0 if taken else 1)
+
+    def hit(self, node, taken):
+        """Record that a run took an edge. Return True if it is new"""
+        e = self.edge(node, taken)
+        if e is None or self.bitmap[e]:
+            return False
+        self.bitmap[e] = 1
+        return True
+
+    def is_covered(self, node, taken):
+        e = self.edge(node, taken)
+        return e is None or self.bitmap[e] == 1
+
+    def exclude(self, node, taken):
+        """Mark an edge that no run can take"""
+        self._excluded.add(self.edge(node, taken))
+
+    def covered(self):
+        """The number of edges taken so far"""
+        return sum(self.bitmap)
+
+    def total(self):
+        """The number of edges that runs may take"""
+        return len(self.bitmap) - len(self._excluded)
+
+    def is_saturated(self):
+        """True if every edge that runs may take has been taken"""
+        return all(b or e in self._excluded for e, b in enumerate(self.bitmap))
+
+    def __str__(self):
+        return 'covered %d of %d branch outcomes' % (self.covered(), self.total())
@@ -1,27 +1,55 @@
 from functools import reduce
+import builtins
+import heapq
+import itertools
+import operator
 import sys
+import time
 
 import io 
 import z3
 
-from . import ast, int, sym
+from . import (ast, concretize, coverage, exhaust, int, interval, parallel,
+               persistent, replay, sym, util)
+from . import budget as budget_
+from . import simplify as smp
 from .bcolors import bcolors
-import copy
 class ExeState(object):
-    def __init__(self, solver=None):
+    def __init__(self, solver=None, compact=None, ctx=None):
         self.con_state: int.State = int.State()
-        self.sym_state: sym.SymState = sym.SymState()
+        self.con_state.env = persistent.PDict()
+        self.sym_state: sym.SymState = sym.SymState(compact=compact, ctx=ctx)
         self._is_infeasable = False
         self._is_error = False
+        # index of the successor taken at every fork so far
+        self.branches = ()
+        # iteration of every enclosing loop, innermost first
+        self.loops = ()
+        # values of the inputs of a concolic run, by name
+        self.inputs = None
+        # the variable every input symbol was created for, by the name of
+        # the symbol, in the order they were created
+        self.symbols = persistent.PMap()
 
     def fork(self):
-        """Fork the current state into two identical states that can evolve separately"""
-        child = ExeState()
+        """Fork the current state into two identical states that can evolve separately.
 
-        child.con_state.env = dict(self.con_state.env)
+        The child shares the envs, the path and the last model of the
+        parent until either of them changes them. It gets a solver only
+        once it makes a query that the shared model does not answer.
+        """
+        # not built by __init__, whose fresh states would be replaced anyway
+        child = ExeState.__new__(ExeState)
+        child.con_state = int.State.__new__(int.State)
+        child.con_state.env = persistent.PDict(self.con_state.env)
+        child._is_infeasable = self._is_infeasable
+        child._is_error = self._is_error
+        child.branches = self.branches
+        child.loops = self.loops
+        child.inputs = self.inputs
+        child.symbols = self.symbols
 
-        child.sym_state.env = dict(self.sym_state.env)
-        child.sym_state.add_pc(*self.sym_state.path)
+        _, child.sym_state = self.sym_state.fork()
         if ( self.sym_state.is_error() ):
             child.sym_state.mk_error()
 
@@ -31,32 +59,57 @@ class ExeState(object):
         return str(self)
     
     def __str__(self):
-        buf = io.StringIO()
-        buf.write('Init Concrete State: ')
-        buf.write('\n')
-        buf.write(str(self._get_init_state()))
-        buf.write('\n') 
-        buf.write('Concrete State: ')
-        buf.write('\n')
-        buf.write(str(self.con_state))
-        buf.write('\n')     
-        buf.write('Symbolic State: ')
-        buf.write('\n')
-        buf.write(str(self.sym_state))
-
-        return buf.getvalue()
+        return _state_str(self._get_init_state(), self.con_state, self.sym_state)
     
+    def get_inputs(self):
+        """The value of every input of the path, None if it has none. The
+           n-th value havoc gave a variable x is named x!n, and inputs the
+           path does not constrain are 0"""
+        model = None
+        if self.inputs is None:
+            # the model of the last check of the path, if it has not changed
+            model = self.sym_state.model()
+            if model is None:
+                return None
+            model = self._concrete_model(model)
+        res = dict()
+        havocs = dict()
+        for name, var in self.symbols.items():
+            n = havocs.get(var, 0)
+            havocs[var] = n + 1
+            if model is None:
+                val = self.inputs.get(name, 0)
+            else:
+                sym_val = z3.Int(name, self.sym_state.ctx)
+                val = model.eval(sym_val, model_completion=True).as_long()
+            res[var + "!" + str(n)] = val
+        return res
+
+    def _concrete_model(self, model):
+        """A model of the path that agrees with the concrete values. The
+           last model of the path need not, as a branch only one outcome
+           of which is feasible keeps the concrete values it had"""
+        ctx = self.sym_state.ctx
+        agree = [smp.mk_rel("=", v, z3.IntVal(self.con_state.env[k], ctx))
+                 for k, v in self.sym_state.env.items() if k in self.con_state.env]
+        if all(z3.is_true(model.eval(a, model_completion=True)) for a in agree):
+            return model
+        solver = z3.Solver(ctx=ctx)
+        solver.add(*self.sym_state.path)
+        solver.add(*agree)
+        if solver.check() != z3.sat:
+            return model
+        return solver.model()
+
     def _get_init_state(self):
-        res = self.sym_state._solver.check()
-        if res == z3.sat:
-            model = self.sym_state._solver.model()
-            st = int.State()
-            for var in model:
-                concrete_value = model[var]
-                st.env[str(var).split("!")[0]] = concrete_value.as_long()
-            return st
-        else:
+        inputs = self.get_inputs()
+        if inputs is None:
             return None
+        # the first value havoc gave every variable
+        st = int.State()
+        for _, var in self.symbols.items():
+            st.env.setdefault(var, inputs[var + "!0"])
+        return st
     
     def mk_infeasable(self):
         self._is_infeasable = True
@@ -66,19 +119,594 @@ class ExeState(object):
 
     def is_valid(self):
         return not (self._is_infeasable or self._is_error or self.sym_state.is_error())
+
+class ExeResult(object):
+    """
+    A terminated execution state. The symbolic part is a sym.SymResult and
+    the initial concrete state is kept as the witness of the path, so the
+    solver of the state can be released.
+    """
+    __slots__ = ('con_state', 'sym_state', 'init_state', 'inputs', 'branches',
+                 '_is_valid', '_is_infeasible')
+
+    def __init__(self, state: ExeState):
+        self.con_state = state.con_state
+        self.inputs = state.get_inputs()
+        self.init_state = state._get_init_state()
+        self.sym_state = sym.SymResult(state.sym_state)
+        self.branches = state.branches
+        self._is_valid = state.is_valid()
+        self._is_infeasible = state._is_infeasable
+
+    def is_valid(self):
+        return self._is_valid
+
+    def is_infeasible(self):
+        """True if the path breaks an assumption"""
+        return self._is_infeasible
+
+    def size(self):
+        """Bytes taken by the result, not counting the z3 terms it shares"""
+        res = sys.getsizeof(self) + self.sym_state.size()
+        res += sys.getsizeof(self.con_state.env)
+        if self.init_state is not None:
+            res += sys.getsizeof(self.init_state.env)
+        return res
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return _state_str(self.init_state, self.con_state, self.sym_state)
+
+def _state_str(init_state, con_state, sym_state):
+    buf = io.StringIO()
+    buf.write('Init Concrete State: ')
+    buf.write('\n')
+    buf.write(str(init_state))
+    buf.write('\n') 
+    buf.write('Concrete State: ')
+    buf.write('\n')
+    buf.write(str(con_state))
+    buf.write('\n')     
+    buf.write('Symbolic State: ')
+    buf.write('\n')
+    buf.write(str(sym_state))
+
+    return buf.getvalue()
     
+_REL = {
+    "<=": operator.le,
+    "<": operator.lt,
+    "=": operator.eq,
+    ">=": operator.ge,
+    ">": operator.gt,
+}
+
+_ARITH = {
+    "+": (operator.add, smp.mk_add),
+    "-": (operator.sub, smp.mk_sub),
+    "*": (operator.mul, smp.mk_mul),
+    "/": (smp.div, smp.mk_div),
+}
+
+
+class ConcolicEvaluator(ast.AstVisitor):
+    """Evaluates an expression concretely and symbolically in one pass.
+
+    Every variable of an ExeState has a concrete value, and the ones that
+    depend on the inputs, the tainted ones, have a symbolic shadow too.
+    The result of an expression is the pair of both, where the symbolic
+    part is None if no tainted variable is used, so that no z3 term is
+    built for it. Division follows z3 on concrete values too, so the two
+    never disagree, except for division by zero, which z3 leaves open: the
+    concrete part is then None, and the symbolic part is always a term.
+    The divisors are recorded, so that the engine can branch on whether
+    they are zero. Non-linear
+    terms are bound to their concrete values if the concretize.Policy
+    given says so.
+    """
+
+    def __init__(self, ctx, policy=None):
+        self.ctx = ctx
+        self.policy = policy
+        # the divisors of the divisions that depend on the inputs, and
+        # the zero of those that do not, since the engine last took them
+        self.divisors = []
+
+    def term(self, exp, state):
+        """The symbolic value of an expression, a constant if it is not tainted"""
+        n = len(self.divisors)
+        res = self._term(self.visit(exp, state=state))
+        # invariants do not branch on their divisors
+        del self.divisors[n:]
+        return res
+
+    def _term(self, val):
+        con, sym = val
+        if sym is not None:
+            return sym
+        if isinstance(con, bool):
+            return z3.BoolVal(con, self.ctx)
+        return z3.IntVal(con, self.ctx)
+
+    def _terms(self, kids):
+        """The symbolic values of the kids of an expression, None if none is tainted"""
+        if all(k[1] is None for k in kids):
+            return None
+        return [self._term(k) for k in kids]
+
+    def visit_IntVar(self, node, *args, **kwargs):
+        st = kwargs["state"]
+        return (st.con_state.env[node.name], st.sym_state.env.get(node.name))
+
+    def visit_BoolConst(self, node, *args, **kwargs):
+        return (node.val, None)
+
+    def visit_IntConst(self, node, *args, **kwargs):
+        return (node.val, None)
+
+    def visit_RelExp(self, node, *args, **kwargs):
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        con = None if _undefined(kids) else _REL[node.op](kids[0][0], kids[1][0])
+        terms = self._terms(kids)
+        return (con, None if terms is None else smp.mk_rel(node.op, *terms))
+
+    def visit_BExp(self, node, *args, **kwargs):
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        terms = self._terms(kids)
+        undefined = _undefined(kids)
+        if node.op == "not":
+            con = None if undefined else not kids[0][0]
+            return (con, None if terms is None else smp.mk_not(terms[0]))
+        if node.op == "and":
+            con = None if undefined else all(k[0] for k in kids)
+            return (con, None if terms is None else smp.mk_and(*terms))
+        assert node.op == "or"
+        con = None if undefined else any(k[0] for k in kids)
+        return (con, None if terms is None else smp.mk_or(*terms))
+
+    def visit_AExp(self, node, *args, **kwargs):
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        con_fn, sym_fn = _ARITH[node.op]
+        terms = self._terms(kids)
+        con = None
+        if node.op == "/":
+            self.divisors.extend(self._term(k) for k in kids[1:]
+                                 if k[1] is not None or k[0] == 0)
+        if not _undefined(kids):
+            try:
+                con = reduce(con_fn, [k[0] for k in kids])
+            except ZeroDivisionError:
+                # left open as z3 does
+                terms = [self._term(k) for k in kids]
+        if (con is not None and terms is not None and self.policy is not None
+                and _is_nonlinear(node, kids) and self.policy.bind_nonlinear(node)):
+            terms = self._bind_nonlinear(node, kids, terms, kwargs["state"])
+        return (con, None if terms is None else sym_fn(*terms))
+
+    def _bind_nonlinear(self, node, kids, terms, st):
+        """Bind all symbolic factors of a product but the first one, or
+           the symbolic divisors of a division, to their concrete values"""
+        tainted = [i for i, k in enumerate(kids) if k[1] is not None]
+        keep = tainted[0] if node.op == "*" else 0
+        res = list(terms)
+        for i in tainted:
+            if i != keep:
+                res[i] = z3.IntVal(kids[i][0], self.ctx)
+                st.sym_state.add_pc(smp.mk_rel("=", kids[i][1], res[i]))
+        return res
+
+
+def _undefined(kids):
+    """True if the concrete value of a kid divides by zero"""
+    return any(k[0] is None for k in kids)
+
+
+def _is_nonlinear(node, kids):
+    """True if an arithmetic expression multiplies or divides by a symbolic value"""
+    tainted = [i for i, k in enumerate(kids) if k[1] is not None]
+    if node.op == "*":
+        return len(tainted) > 1
+    return node.op == "/" and any(i > 0 for i in tainted)
+
+
 class ExeExec(ast.AstVisitor):
-    def __init__(self):
-        self.sym_vistor = sym.SymExec()
+    def __init__(self, ctx=None, budget=None, prune=False, summarize=False,
+                 intervals=False, loop_bound=10, infer_bounds=False,
+                 generational=False, policy=None, stop_on_coverage=False,
+                 enumerate_below=None, enumerate_jobs=1, steps=10000):
+        # limits of a run and the summary of the last one
+        self.budget = budget if budget is not None else budget_.Budget()
+        self.summary = None
+        self.sym_vistor = sym.SymExec(ctx=ctx, budget=self.budget)
         self.con_vistor = int.Interpreter() 
-        pass
+        # when to give up on symbolic values for concrete ones
+        self.policy = policy if policy is not None else concretize.Policy()
+        self.evaluator = ConcolicEvaluator(self.sym_vistor.ctx, self.policy)
+        # branch prefix to replay before exploring, see wlang.parallel
+        self.prefix = ()
+        # gives a branch prefix away to another worker, or returns False
+        self.donate = None
+        # prune states subsumed by ones seen at loop heads and after ifs
+        self.prune = prune
+        self.visited = sym.VisitedStates()
+        # use the invariants of loops instead of unrolling them
+        self.summarize = summarize
+        # decide conditions by an interval analysis before using the solver
+        self.intervals = intervals
+        self.facts = None
+        # number of times a loop is run symbolically before it is finished
+        # concretely, by default, per loop and as inferred
+        self.loop_bound = loop_bound
+        self._loop_bounds = dict()
+        self.infer_bounds = infer_bounds
+        self.inferred_bounds = dict()
+        # run the program concretely and find new inputs one branch at a
+        # time instead of forking
+        self.generational = generational
+        # number of loop iterations a concrete run may take
+        self.steps = steps
+        # branch outcomes taken by the runs of the last program, and
+        # whether to stop once all of them are
+        self.coverage = None
+        self.stop_on_coverage = stop_on_coverage
+        # run programs with at most this many inputs on all of them, on
+        # this many processes, instead of exploring them
+        self.enumerate_below = enumerate_below
+        self.enumerate_jobs = enumerate_jobs
+
+    def set_loop_bound(self, node, bound):
+        """Set the number of times a given loop is run symbolically"""
+        self._loop_bounds[id(node)] = bound
+
+    def get_loop_bound(self, node):
+        """The bound set for a loop, else the inferred one, else the default"""
+        bound = self.inferred_bounds.get(id(node), self.loop_bound)
+        return self._loop_bounds.get(id(node), bound)
 
     def run(self, ast, state):
-        states = self.visit(ast, state=state)
-        if (len(states) > 0):
-            return states
+        return list(self.stream(ast, state))
+
+    def stream(self, ast, state):
+        """Yield an ExeResult for every final state as soon as its path is done"""
+        self.budget.reset()
+        self.summary = None
+        self.visited = sym.VisitedStates()
+        self.policy.reset()
+        self.coverage = coverage.Coverage(ast)
+        analysis = None
+        if self.intervals or self.infer_bounds:
+            analysis = interval.IntervalAnalysis()
+            analysis.check(ast)
+        self.facts = analysis if self.intervals else None
+        if self.facts is not None:
+            # the outcomes that the analysis rules out are never taken
+            for site in self.coverage.sites:
+                decided = self.facts.decide(site)
+                if decided is not None:
+                    self.coverage.exclude(site, not decided)
+        self.inferred_bounds = dict()
+        if self.infer_bounds:
+            self.inferred_bounds = interval.loop_bounds(ast, analysis)
+        state.sym_state.budget = self.budget
+        paths = 0
+        dom = exhaust.domain(ast) if self.enumerate_below is not None else None
+        if dom is not None and exhaust.size(dom) <= self.enumerate_below:
+            states = self._enumerate(ast, state, dom)
+        elif self.generational:
+            states = self._generational(ast, state)
         else:
-            return []
+            states = self.visit(ast, state=state)
+        try:
+            for st in states:
+                paths += 1
+                # the solvers of the state go away with it
+                res = ExeResult(st)
+                self.budget.final(res.size())
+                yield res
+        except _Exhausted as e:
+            self.summary = self.budget.summary(e.reason, paths, None)
+            return
+        self.summary = self.budget.summary(None, paths, 0)
+
+    def _fork(self, *states):
+        """Record the successor every state takes at a fork and return
+           the ones explored by this engine"""
+        base = states[0].branches
+        for i, st in enumerate(states):
+            st.branches = base + (i,)
+        res = [states[i] for i in parallel.split(self, base, len(states))]
+        self.budget.fork(len(res))
+        return res
+
+    def _is_feasible(self, node, state, taken):
+        """Check whether a state can take a branch of a statement, see
+           sym.SymExec._is_feasible. If taken is None the state branches
+           on the divisors of the statement instead"""
+        decided = None
+        if self.facts is not None and taken is not None:
+            decided = self.facts.decide(node)
+        if decided is not None:
+            return decided == taken
+        start = time.monotonic()
+        res = not state.sym_state.is_empty()
+        self.policy.query(node, time.monotonic() - start, len(state.sym_state.path))
+        return res
+
+    def _bind(self, node, st):
+        """Bind the variables of the condition of a statement that depend
+           on the inputs to their concrete values"""
+        sym_env = st.sym_state.env
+        for name in [k for k in sym_env if util.uses_vars(node.cond, [k])]:
+            val = z3.IntVal(st.con_state.env[name], self.evaluator.ctx)
+            st.sym_state.add_pc(smp.mk_rel("=", sym_env[name], val))
+            del sym_env[name]
+
+    def _divisors(self):
+        """The constraints that some divisor of the last evaluation is
+           zero and that none is, None if it has none"""
+        divisors, self.evaluator.divisors = self.evaluator.divisors, []
+        if len(divisors) == 0:
+            return None
+        zero = z3.IntVal(0, self.evaluator.ctx)
+        zeros = [smp.mk_rel("=", d, zero) for d in divisors]
+        return smp.mk_or(*zeros), smp.mk_and(*[smp.mk_not(z) for z in zeros])
+
+    def _divides_by_zero(self, node, st):
+        """Make a state whose concrete values divide by zero in a
+           statement an error state"""
+        _log_error("[Division error]: Division by zero.", node, st)
+        st.mk_error()
+        self.budget.error()
+
+    def _guard(self, node, st, con):
+        """Branch on whether a divisor of the last evaluation of a
+           statement is zero, con being its concrete value in st. Return
+           the error states where one is, and the state where none is:
+           st if the statement goes on with the concrete values of st, a
+           state with new ones to evaluate it again, or None if that
+           branch is not explored"""
+        conds = self._divisors()
+        if conds is None:
+            if con is not None:
+                return [], st
+            # the divisors do not depend on the inputs
+            self._divides_by_zero(node, st)
+            return [st], None
+        _, bad = st.fork()
+        bad.sym_state.add_pc(conds[0])
+        # the concrete values of st divide by zero if con is None
+        if con is not None and not self._is_feasible(node, bad, None):
+            # the path condition implies that no divisor is zero
+            return [], st
+        _, ok = st.fork()
+        ok.sym_state.add_pc(conds[1])
+        if not self._is_feasible(node, ok, None):
+            self._divides_by_zero(node, bad)
+            return [bad], None
+        bad.con_state.env = _pick_concrete(bad)
+        ok.con_state.env = _pick_concrete(ok)
+        take = self._fork(bad, ok)
+        if bad in take:
+            self._divides_by_zero(node, bad)
+        return [bad] if bad in take else [], ok if ok in take else None
+
+    def _check_budget(self):
+        reason = self.budget.exhausted()
+        if reason is None and self.stop_on_coverage and self.coverage.is_saturated():
+            reason = 'coverage'
+        if reason is not None:
+            raise _Exhausted(reason)
+
+    def _enumerate(self, node, state, dom):
+        """Run a program on every input of its domain instead of exploring
+           it, see wlang.exhaust. Yield the final state of every path"""
+        enum = exhaust.Enumerator(steps=self.steps, jobs=self.enumerate_jobs)
+        for path in enum.run(node, dom):
+            self._check_budget()
+            _, st = state.fork()
+            st.con_state.env = persistent.PDict(path.env)
+            st.inputs = path.inputs
+            st.symbols = persistent.PMap((v + "!0", v) for v in dom)
+            for e in path.edges:
+                self.coverage.bitmap[e] = 1
+            if isinstance(path.error, ast.AssertStmt):
+                _log_error("[Assert error]: Assert fails.", path.error, st)
+                st.mk_error()
+                self.budget.error()
+            elif path.is_error():
+                self._divides_by_zero(path.error, st)
+            yield st
+        if enum.stopped > 0:
+            # some inputs ran into the step limit, their paths are missing
+            raise _Exhausted('steps')
+
+    def _generational(self, node, state):
+        """Explore a program with a generational concolic search.
+
+        Every run follows the concrete values of its inputs and records
+        the branch constraints of its path. A new input is found for
+        each branch after the one the run was generated from, by
+        negating that branch and keeping the ones before it. Inputs
+        that flip a branch to an outcome not covered yet are run first,
+        as long as no other run covers it before them. Branches of
+        loops past their bound are not negated. Yield the final state
+        of every run that takes a new path and satisfies its assumptions.
+        Runs that take more than ``steps`` loop iterations are not
+        yielded, and the search ends as incomplete.
+        """
+        order = itertools.count()
+        # (-score, order, inputs, index of the first branch to negate,
+        #  the outcome the inputs flip to)
+        queue = [(0, next(order), dict(), 0, None)]
+        paths = set()
+        stopped = 0
+        while len(queue) > 0:
+            self._check_budget()
+            score, _, inputs, bound, target = heapq.heappop(queue)
+            if score < 0 and self.coverage.is_covered(*target):
+                # another run got there first
+                heapq.heappush(queue, (0, next(order), inputs, bound, target))
+                continue
+            _, st = state.fork()
+            run = _Run(inputs)
+            st.inputs = run.used
+            self._run_once(node, st, run)
+            path = tuple((id(n), taken) for n, taken, _, _ in run.trace)
+            if path in paths:
+                continue
+            paths.add(path)
+            if run.stopped:
+                # the run did not end, so its final state is unknown
+                stopped += 1
+            elif not st._is_infeasable:
+                yield st
+
+            solver = z3.Solver(ctx=self.sym_vistor.ctx)
+            for n, taken, cond, _ in run.trace[:bound]:
+                solver.add(cond)
+            for i in range(bound, len(run.trace)):
+                n, taken, cond, flip = run.trace[i]
+                if flip:
+                    solver.push()
+                    solver.add(smp.mk_not(cond))
+                    if self.budget.check(solver) == z3.sat:
+                        child = dict(inputs)
+                        child.update(_model_values(solver.model(), run.used, self.sym_vistor.ctx))
+                        score = 0 if self.coverage.is_covered(n, not taken) else 1
+                        heapq.heappush(queue, (-score, next(order), child, i + 1,
+                                               (n, not taken)))
+                    solver.pop()
+                solver.add(cond)
+        if stopped > 0:
+            # some runs ran into the step limit, their paths are missing
+            raise _Exhausted('steps')
+
+    def flip(self, prg, inputs, site):
+        """Find inputs that follow the run of a program on the given
+           inputs up to an evaluation of the condition of a branch site,
+           and take the other outcome there. Return None if there are
+           none. Inputs are named as in the generational search"""
+        if self.coverage is None:
+            self.coverage = coverage.Coverage(prg)
+        st = ExeState(ctx=self.sym_vistor.ctx)
+        st.sym_state.budget = self.budget
+        run = _Run(inputs)
+        st.inputs = run.used
+        self._run_once(prg, st, run)
+
+        solver = z3.Solver(ctx=self.sym_vistor.ctx)
+        for n, taken, cond, _ in run.trace:
+            if n is site:
+                solver.push()
+                solver.add(smp.mk_not(cond))
+                if self.budget.check(solver) == z3.sat:
+                    res = dict(run.used)
+                    res.update(_model_values(solver.model(), run.used, self.sym_vistor.ctx))
+                    return res
+                solver.pop()
+            solver.add(cond)
+        return None
+
+    def _run_once(self, node, st, run):
+        """Run a statement along the path its concrete values take.
+           Return False if the run ends in it"""
+        if isinstance(node, ast.StmtList):
+            return all(self._run_once(s, st, run) for s in node.stmts)
+
+        if isinstance(node, ast.AsgnStmt):
+            con_val, sym_val = self.evaluator.visit(node.rhs, state=st)
+            if not self._run_divisors(node, node.rhs, st, run, con_val):
+                return False
+            self._assign(node, st, con_val, sym_val)
+        elif isinstance(node, ast.HavocStmt):
+            for v in node.vars:
+                name = run.fresh(v.name)
+                st.symbols = st.symbols.set(name, v.name)
+                st.sym_state.env[v.name] = z3.Int(name, self.sym_vistor.ctx)
+                st.con_state.env[v.name] = run.used[name]
+        elif isinstance(node, ast.IfStmt):
+            taken = self._run_branch(node, st, run)
+            if taken is None:
+                return False
+            if taken:
+                return self._run_once(node.then_stmt, st, run)
+            if node.has_else():
+                return self._run_once(node.else_stmt, st, run)
+        elif isinstance(node, ast.WhileStmt):
+            depth = 0
+            while True:
+                taken = self._run_branch(node, st, run, depth < self.get_loop_bound(node))
+                if taken is None:
+                    return False
+                if not taken:
+                    break
+                self._check_budget()
+                run.steps += 1
+                if run.steps > self.steps:
+                    run.stopped = True
+                    return False
+                if not self._run_once(node.body, st, run):
+                    return False
+                depth += 1
+        elif isinstance(node, ast.AssertStmt):
+            taken = self._run_branch(node, st, run)
+            if taken is None:
+                return False
+            if not taken:
+                _log_error("[Assert error]: Assert fails.", node, st)
+                st.mk_error()
+                self.budget.error()
+                return False
+        elif isinstance(node, ast.AssumeStmt):
+            # only a run that breaks the assumption looks for one that does not
+            taken = self._run_branch(node, st, run, None)
+            if taken is None:
+                return False
+            if not taken:
+                st.mk_infeasable()
+                return False
+        return True
+
+    def _run_divisors(self, node, exp, st, run, con):
+        """Record whether a divisor of an expression of a statement is
+           zero as a branch of a run, con being its concrete value. The
+           branch is recorded at the expression, which is no branch site.
+           Return False if the run ends in the statement"""
+        conds = self._divisors()
+        taken = con is not None
+        cond = None if conds is None else conds[1] if taken else conds[0]
+        # the divisors that do not depend on the inputs are constant
+        if cond is not None and not z3.is_true(cond):
+            st.sym_state.add_pc(cond)
+            run.trace.append((exp, taken, cond, True))
+        if not taken:
+            self._divides_by_zero(node, st)
+            return False
+        return True
+
+    def _run_branch(self, node, st, run, flip=True):
+        """Evaluate the condition of a statement and record the branch taken.
+           The branch is negated later if flip is True, or if it is None
+           and the condition fails. Return None if the condition divides
+           by zero"""
+        taken, cond = self.evaluator.visit(node.cond, state=st)
+        if not self._run_divisors(node, node.cond, st, run, taken):
+            return None
+        self.coverage.hit(node, taken)
+        if cond is None:
+            # the condition does not depend on the inputs
+            return taken
+        if flip is None:
+            flip = not taken
+        if not taken:
+            cond = smp.mk_not(cond)
+        # constant conditions do not depend on the inputs
+        if not z3.is_true(cond):
+            st.sym_state.add_pc(cond)
+            run.trace.append((node, taken, cond, flip))
+        return taken
 
     def visit_SkipStmt(self, node, *args, **kwargs):
         return [kwargs["state"]]
@@ -89,232 +717,450 @@ class ExeExec(ast.AstVisitor):
     def visit_AsgnStmt(self, node, *args, **kwargs):
         st: ExeState = kwargs["state"]
 
-        st.sym_state = self.sym_vistor.visit(node, state=st.sym_state)[0]
-        st.con_state = self.con_vistor.visit(node, state=st.con_state)
-        return [st]
+        con_val, sym_val = self.evaluator.visit(node.rhs, state=st)
+        res, ok = self._guard(node, st, con_val)
+        if ok is not st:
+            return res if ok is None else res + self.visit(node, state=ok)
+        self._assign(node, st, con_val, sym_val)
+        return res + [st]
+
+    def _assign(self, node, st, con_val, sym_val):
+        """Assign the value of the right-hand side of an assignment"""
+        st.con_state.env[node.lhs.name] = con_val
+        if sym_val is not None:
+            st.sym_state.env[node.lhs.name] = sym_val
+        elif node.lhs.name in st.sym_state.env:
+            # the variable no longer depends on the inputs
+            del st.sym_state.env[node.lhs.name]
 
     def visit_IfStmt(self, node, *args, **kwargs):
         st: ExeState = kwargs["state"]
 
-        # Evaluate conditionwha
-        con_cond = self.con_vistor.visit(node.cond, state=st.con_state)
-        sym_cond = self.sym_vistor.visit(node.cond, state=st.sym_state)
+        # Evaluate condition
+        con_cond, sym_cond = self.evaluator.visit(node.cond, state=st)
+        errors, ok = self._guard(node, st, con_cond)
+        yield from errors
+        if ok is not st:
+            if ok is not None:
+                yield from self.visit(node, state=ok)
+            return
+        if sym_cond is not None and self.policy.is_concrete(node):
+            self._bind(node, st)
+            sym_cond = None
+
+        if sym_cond is None:
+            # the condition does not depend on the inputs, so the concrete
+            # values take the only feasible branch
+            self.coverage.hit(node, con_cond)
+            if con_cond:
+                yield from self.visit(node.then_stmt, state=st)
+            elif node.has_else():
+                yield from self.visit(node.else_stmt, state=st)
+            else:
+                yield st
+            return
         
         # Fork execution state
         passed_st, failed_st = st.fork()
 
         # Update path condition
         passed_st.sym_state.add_pc(sym_cond)
-        failed_st.sym_state.add_pc(z3.Not(sym_cond))
-
-        states = []
+        failed_st.sym_state.add_pc(smp.mk_not(sym_cond))
 
         # if both branches are SAT we need to compute new concrete assignments
-        if not (passed_st.sym_state.is_empty() or failed_st.sym_state.is_empty()):
+        if self._is_feasible(node, passed_st, True) and self._is_feasible(node, failed_st, False):
             if con_cond:
                 # if concrete cond is true false_st needs new concrete assignments
-                failed_st.con_state.env = _pick_concrete(failed_st.sym_state)
+                failed_st.con_state.env = _pick_concrete(failed_st)
             else:
                 # if concrete cond is false true_st needs new concrete assignments
-                passed_st.con_state.env = _pick_concrete(passed_st.sym_state)
+                passed_st.con_state.env = _pick_concrete(passed_st)
 
-            passed_states = self.visit(node.then_stmt, state=passed_st)
-            states.extend(passed_states)
+            take = self._fork(passed_st, failed_st)
 
-            if node.has_else():
-                failed_states = self.visit(node.else_stmt, state=failed_st)
-                states.extend(failed_states)
+            if passed_st in take:
+                self.coverage.hit(node, True)
+                yield from self._visited(node, self.visit(node.then_stmt, state=passed_st))
+
+            if failed_st not in take:
+                pass
+            elif node.has_else():
+                self.coverage.hit(node, False)
+                yield from self._visited(node, self.visit(node.else_stmt, state=failed_st))
             else:
-                states.extend([failed_st])
+                self.coverage.hit(node, False)
+                yield from self._visited(node, [failed_st])
 
-            return states
+            return
 
         # if we make it here only 1 path is SAT
+        self.coverage.hit(node, con_cond)
         if con_cond:
-            passed_states = self.visit(node.then_stmt, state=passed_st)
-            states.extend(passed_states)
+            yield from self.visit(node.then_stmt, state=passed_st)
         else:
             if node.has_else():
-                failed_states = self.visit(node.else_stmt, state=failed_st)
-                states.extend(failed_states)
+                yield from self.visit(node.else_stmt, state=failed_st)
             else:
-                states.extend([failed_st])
-        
-        return states
+                yield failed_st
+
+    def _visited(self, node, states):
+        """The states that are not subsumed by ones seen after a statement"""
+        for st in states:
+            if (not self.prune or not st.is_valid()
+                    or self.visited.visit(node, st.loops, st.sym_state, _untainted(st))):
+                yield st
+
+    def _loop(self, node, state, depth):
+        """Execute the body of a loop and the iterations that follow it"""
+        outer = state.loops
+        state.loops = (depth,) + outer
+        # get program states after executing loop body
+        for true_st in self.visit(node.body, state=state):
+            self._check_budget()
+            true_st.loops = outer
+            if not true_st.is_valid():
+                # the path ended in the body, so it does not go round again
+                yield true_st
+            elif depth < self.get_loop_bound(node):
+                # Extract states for next iteration of the loop
+                yield from self.visit(node, state=true_st, depth=depth+1)
+            else:
+                # if depth reaches the bound this loop is complex and we will let the loop finish concretely
+                yield from self._finish_loop(node, true_st)
+
+    def _finish_loop(self, node, st):
+        """Run the rest of a loop concretely. The statements of the body
+           are run by the engine, so that division follows z3 and failed
+           assertions and assumptions end the path as they do elsewhere"""
+        states = [st]
+        while len(states) > 0:
+            st = states.pop()
+            # havocs in the body may have added symbolic values again
+            _concretize_sym_state(st)
+            if not st.is_valid():
+                yield st
+                continue
+            self._check_budget()
+            con_cond, _ = self.evaluator.visit(node.cond, state=st)
+            errors, ok = self._guard(node, st, con_cond)
+            yield from errors
+            if ok is not st:
+                if ok is not None:
+                    states.append(ok)
+                continue
+            self.coverage.hit(node, con_cond)
+            if not con_cond:
+                yield st
+                continue
+            # iterate rather than recurse, so that long loops are fine
+            states.extend(reversed(list(self.visit(node.body, state=st))))
 
     def visit_WhileStmt(self, node, *args, **kwargs):
         depth = kwargs.get('depth', 0)
 
         st: ExeState = kwargs["state"]
+        if self.prune and not self.visited.visit(node, (depth,) + st.loops, st.sym_state,
+                                                 _untainted(st)):
+            return
+        if self.summarize and node.inv is not None:
+            yield from self._summarize(node, st)
+            return
+        if self.policy.is_concrete(node):
+            # the queries of the loop cost too much to go on symbolically
+            yield from self._finish_loop(node, st)
+            return
 
-        con_cond = self.con_vistor.visit(node.cond, state=st.con_state)
-        sym_cond = self.sym_vistor.visit(node.cond, state=st.sym_state)
+        con_cond, sym_cond = self.evaluator.visit(node.cond, state=st)
+        errors, ok = self._guard(node, st, con_cond)
+        yield from errors
+        if ok is not st:
+            if ok is not None:
+                yield from self.visit(node, state=ok, depth=depth)
+            return
 
-        states = []
+        if sym_cond is None:
+            # the condition does not depend on the inputs
+            self.coverage.hit(node, con_cond)
+            if con_cond:
+                yield from self._loop(node, st, depth)
+            else:
+                yield st
+            return
 
         # fork execution state
         true_st, false_st = st.fork()
 
         true_st.sym_state.add_pc(sym_cond)
-        false_st.sym_state.add_pc(z3.Not(sym_cond))
+        false_st.sym_state.add_pc(smp.mk_not(sym_cond))
 
         # if both branches are SAT we need to compute new concrete assignments
-        if not (true_st.sym_state.is_empty() or false_st.sym_state.is_empty()):
+        if self._is_feasible(node, true_st, True) and self._is_feasible(node, false_st, False):
             if con_cond:
                 # if concrete cond is true false_st needs new concrete assignments
-                false_st.con_state.env = _pick_concrete(false_st.sym_state)
+                false_st.con_state.env = _pick_concrete(false_st)
             else:
                 # if concrete cond is false true_st needs new concrete assignments
-                true_st.con_state.env = _pick_concrete(true_st.sym_state)
+                true_st.con_state.env = _pick_concrete(true_st)
 
-            states.extend([false_st]) # Add the false state to output
+            take = self._fork(false_st, true_st)
+            if false_st in take:
+                self.coverage.hit(node, False)
+                yield false_st # Add the false state to output
 
             # evaluate loop
-            if depth < 10:
-                true_states: list[ExeState] = self.visit(node.body, state=true_st) # get program states after executing loop body
-                for true_st in true_states:
-                    # Extract states for next iteration of the loop
-                    loop_states = self.visit(node, state=true_st, depth=depth+1)
-                    states.extend(loop_states)
-            else:
-                # if depth is greater than 10 this loop is complex and we will let the loop finish concretely
-                true_states: list[ExeState] = self.visit(node.body, state=true_st) # get program states after executing loop body
-                for true_st in true_states:
-                    true_st.con_state = self.con_vistor.visit(node, state=true_st.con_state)
-                    _concretize_sym_state(true_st)
-                    states.extend([true_st])
-            
-            return states
+            if true_st in take:
+                self.coverage.hit(node, True)
+                yield from self._loop(node, true_st, depth)
+            return
 
         # if we make it here only a single branch is SAT
+        self.coverage.hit(node, con_cond)
         if con_cond:
             # true_st is SAT
             # evaluate loop
-            if depth < 10:
-                true_states: list[ExeState] = self.visit(node.body, state=true_st) # get program states after executing loop body
-                for true_st in true_states:
-                    # Extract states for next iteration of the loop
-                    loop_states = self.visit(node, state=true_st, depth=depth+1)
-                    states.extend(loop_states)
-            else:
-                # if depth is greater than 10 this loop is complex and we will let the loop finish concretely
-                true_states: list[ExeState] = self.visit(node.body, state=true_st) # get program states after executing loop body
-                for true_st in true_states:
-                    true_st.con_state = self.con_vistor.visit(node, state=true_st.con_state)
-                    _concretize_sym_state(true_st)
-                    states.extend([true_st])
+            yield from self._loop(node, true_st, depth)
         else:
             # false_st is SAT
-            states.extend([false_st]) # Add the false state to output
-
-        return states
+            yield false_st # Add the false state to output
     
+    def _summarize(self, node, st):
+        """Execute a loop in one step using its invariant, see
+           sym.SymExec._summarize"""
+        sym_inv = self.evaluator.term(node.inv, st)
+        st, entry_st = st.fork()
+        entry_st.sym_state.add_pc(smp.mk_not(sym_inv))
+        st.sym_state.add_pc(sym_inv)
+
+        states = []
+        body_st = None
+        if not entry_st.sym_state.is_empty():
+            entry_st.con_state.env = _pick_concrete(entry_st)
+            _log_error("[Invariant error]: Invariant may not hold on entry.", node, entry_st)
+            entry_st.mk_error()
+            self.budget.error()
+            states.append(entry_st)
+
+        if not st.sym_state.is_empty():
+            havoc = ast.HavocStmt([ast.IntVar(v) for v in util.assigned_vars(node.body)])
+            st = self.visit_HavocStmt(havoc, state=st)[0]
+            sym_inv = self.evaluator.term(node.inv, st)
+            sym_cond = self.evaluator.term(node.cond, st)
+
+            exit_st, body_st = st.fork()
+            exit_st.sym_state.add_pc(sym_inv)
+            exit_st.sym_state.add_pc(smp.mk_not(sym_cond))
+            body_st.sym_state.add_pc(sym_inv)
+            body_st.sym_state.add_pc(sym_cond)
+            for s in (exit_st, body_st):
+                if not s.sym_state.is_empty():
+                    s.con_state.env = _pick_concrete(s)
+                    states.append(s)
+
+        take = self._fork(*states) if len(states) > 1 else states
+        for s in take:
+            if s is not body_st:
+                yield s
+                continue
+            # the body must keep the invariant, after that the state dies
+            for out in self.visit(node.body, state=body_st):
+                if not out.is_valid():
+                    yield out
+                    continue
+                out_inv = self.evaluator.term(node.inv, out)
+                out.sym_state.add_pc(smp.mk_not(out_inv))
+                if not out.sym_state.is_empty():
+                    out.con_state.env = _pick_concrete(out)
+                    _log_error("[Invariant error]: Invariant may not be inductive.", node, out)
+                    out.mk_error()
+                    self.budget.error()
+                    yield out
+
     def visit_AssertStmt(self, node, *args, **kwargs):
         st: ExeState = kwargs["state"]
 
         # evaluate condition 
-        con_cond = self.con_vistor.visit(node.cond, state=st.con_state)
-        sym_cond = self.sym_vistor.visit(node.cond, state=st.sym_state)
-        
+        con_cond, sym_cond = self.evaluator.visit(node.cond, state=st)
+        res, ok = self._guard(node, st, con_cond)
+        if ok is not st:
+            return res if ok is None else res + self.visit(node, state=ok)
+        if sym_cond is not None and self.policy.is_concrete(node):
+            self._bind(node, st)
+            sym_cond = None
+
+        if sym_cond is None:
+            # the condition does not depend on the inputs, so only the
+            # concrete outcome is feasible
+            return res + self._assert_concrete(node, st, con_cond)
+
         # fork execution state
         passed_st, failed_st = st.fork()
 
         # update pc
         passed_st.sym_state.add_pc(sym_cond)
-        failed_st.sym_state.add_pc(z3.Not(sym_cond))
+        failed_st.sym_state.add_pc(smp.mk_not(sym_cond))
 
         # if both branches are SAT we need to compute new concrete assignments
-        if not (passed_st.sym_state.is_empty() or failed_st.sym_state.is_empty()):
+        if self._is_feasible(node, passed_st, True) and self._is_feasible(node, failed_st, False):
             # TODO: If current concrete state passes cond we dont need to update 
             #       the concrete assignment for that path and vise-versa.
-            passed_st.con_state = _pick_concrete(passed_st.sym_state)
+            passed_st.con_state.env = _pick_concrete(passed_st)
 
-            failed_st.con_state = _pick_concrete(failed_st.sym_state)
+            failed_st.con_state.env = _pick_concrete(failed_st)
             _log_error("[Assert error]: Assert can fail.", node, failed_st)
             failed_st.mk_error()
+            self.budget.error()
+            self.budget.fork(2)
+            self.coverage.hit(node, True)
+            self.coverage.hit(node, False)
 
-            return [passed_st, failed_st]
+            # the error comes first so that it is reported before the
+            # budget is checked again
+            return res + [failed_st, passed_st]
         
         # if we make it here only a single branch is SAT
+        return res + self._assert_concrete(node, passed_st if con_cond else failed_st, con_cond)
+
+    def _assert_concrete(self, node, st, con_cond):
+        """The state after an assertion that holds exactly if con_cond does"""
+        self.coverage.hit(node, con_cond)
         if con_cond:
-            return [passed_st]
-        else:
-            # concrete value failed assertion
-            _log_error("[Assert error]: Assert always fails.", node, failed_st)
-            st.mk_error()
-            return [failed_st]
-        
+            return [st]
+        # concrete value failed assertion
+        _log_error("[Assert error]: Assert always fails.", node, st)
+        st.mk_error()
+        self.budget.error()
+        return [st]
+
     def visit_AssumeStmt(self, node, *args, **kwargs):
         st: ExeState = kwargs["state"]
 
-        cond = self.sym_vistor.visit(node.cond, state=st.sym_state)
+        con_cond, cond = self.evaluator.visit(node.cond, state=st)
+        res, ok = self._guard(node, st, con_cond)
+        if ok is not st:
+            return res if ok is None else res + self.visit(node, state=ok)
+        if cond is None:
+            # the assumption does not depend on the inputs
+            if not con_cond:
+                _log_error("[Assume error]: Assumption cannot be satisfied.", node, st)
+                st.mk_infeasable()
+            return res + [st]
         st.sym_state.add_pc(cond)
 
         if not st.sym_state.is_empty(): 
             # if we can generate a concrete assignment
-            st.con_state.env = _pick_concrete(st.sym_state)
+            st.con_state.env = _pick_concrete(st)
         else: 
             # following this assumption no concrete state exists
             _log_error("[Assume error]: Assumption cannot be satisfied.", node, st)
             st.mk_infeasable()
 
-        return [st]
+        return res + [st]
 
     def visit_HavocStmt(self, node, *args, **kwargs):
         st: ExeState = kwargs["state"]
 
-        st.sym_state = self.sym_vistor.visit_HavocStmt(node, state=st.sym_state)[0]
-        st.con_state = self.con_vistor.visit_HavocStmt(node, state=st.con_state)
+        for v in node.vars:
+            # assign 0 as the default value
+            st.con_state.env[v.name] = 0
+            sym_val = z3.FreshInt(v.name, self.evaluator.ctx)
+            st.symbols = st.symbols.set(sym_val.decl().name(), v.name)
+            st.sym_state.env[v.name] = sym_val
 
         return [st]
         
     def visit_StmtList(self, node, *args, **kwargs):
-        states: list[ExeState] | ExeState = kwargs["state"]
-        states = [states]
-    
-        for stmt in node.stmts:
-            new_states = []
-            for state in states:
-                if state.is_valid():
-                    # this is a valid state so we can compute the next state
-                    res_state = self.visit(stmt, state=state)
-                else: 
-                    # this state is invalid we so don't execute it
-                    res_state = [state]
-                new_states.extend(res_state)
-
-            states = new_states
-        return states
+        return self._exec_list(node.stmts, kwargs["state"])
+
+    def _exec_list(self, stmts, state):
+        """Execute a list of statements depth-first, one path at a time"""
+        # states still to be run from the i-th statement on
+        stack = [(0, iter([state]))]
+        while len(stack) > 0:
+            i, states = stack[-1]
+            st = next(states, None)
+            if st is None:
+                stack.pop()
+            elif i == len(stmts) or not st.is_valid():
+                # this state is done or invalid so we don't execute it
+                yield st
+            else:
+                self._check_budget()
+                stack.append((i + 1, iter(self.visit(stmts[i], state=st))))
     
+class _Run(object):
+    """A single run of a generational search"""
+
+    def __init__(self, inputs):
+        # values of the inputs, 0 for the ones not given
+        self.inputs = inputs
+        # inputs read by the run, named after the variable and the number
+        # of times it was havocked before
+        self.used = dict()
+        self._havocs = dict()
+        # (statement, branch taken, its constraint, whether to negate it)
+        self.trace = list()
+        # loop iterations so far, and whether the run hit the step limit
+        self.steps = 0
+        self.stopped = False
+
+    def fresh(self, var):
+        """Name the next input of a variable and give it its value"""
+        n = self._havocs.get(var, 0)
+        self._havocs[var] = n + 1
+        name = var + "!" + str(n)
+        self.used[name] = self.inputs.get(name, 0)
+        return name
+
+class _Exhausted(Exception):
+    """Raised to unwind the exploration once the budget runs out"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+def _model_values(model, names, ctx):
+    """The values a model gives the input symbols of the given names.
+       Symbols the model leaves open are left out, and so are the
+       functions z3 adds to it, such as the one for division by zero"""
+    res = dict()
+    for name in names:
+        val = model.eval(z3.Int(name, ctx))
+        if z3.is_int_value(val):
+            res[name] = val.as_long()
+    return res
+
 def _log_error(message: str, node, state):
     print(f"{bcolors.FAIL}{message}")
     print(f"Node: \n{str(node)}")
     print(f"State: \n{str(state)}{bcolors.ENDC}\n")
 
-def _pick_concrete(state: sym.SymState): 
+def _pick_concrete(state: ExeState): 
     """
     Helper method for picking concrete values since sym.SymState.pick_concrete() 
-    returns z3 objects which don't play nice when you try to evaluate them concretely
+    returns z3 objects which don't play nice when you try to evaluate them concretely.
+    Variables that do not depend on the inputs keep their concrete values.
     """
-    con_env = {}
-    sym_env = state.pick_concerete().env
+    # shares the values of the other variables with the current env
+    con_env = persistent.PDict(state.con_state.env)
+    sym_env = state.sym_state.pick_concerete().env
     for k, v in sym_env.items():
         con_env[str(k)] = v.as_long()
     return con_env
 
+def _untainted(state: ExeState):
+    """The concrete values of the variables that do not depend on the inputs"""
+    sym_env = state.sym_state.env
+    return tuple(sorted((k, v) for k, v in state.con_state.env.items() if k not in sym_env))
+
 def _concretize_sym_state(state: ExeState):
     """
     Helper method to handle updating symbolic state when an execution path is too complex.
-    This method replaces symbolic variables with their concrete values and resets the path conditions.
+    This method drops the symbolic values of the variables, so that they keep only their
+    concrete ones and no longer depend on the inputs.
     """
-    con_env = state.con_state.env
     sym_env = state.sym_state.env
-
-    # Add constraints that force the symbolic state to match the concrete state
-    for v in con_env.keys():
-        sym_env[v] = z3.IntVal(con_env[v])
-        constraint = sym_env[v] == z3.IntVal(con_env[v])
-        state.sym_state.add_pc(constraint)
+    for v in list(sym_env.keys()):
+        del sym_env[v]
 
     return state
 
@@ -324,39 +1170,103 @@ def _parse_args():
                                  description='WLang Interpreter')
     ap.add_argument('in_file', metavar='FILE',
                     help='WLang program to interpret')
+    ap.add_argument('--compact', metavar='N', type=builtins.int, default=None,
+                    help='Compact path conditions longer than N constraints')
+    ap.add_argument('--prune', action='store_true',
+                    help='Prune states subsumed by ones seen at loop heads and after ifs')
+    ap.add_argument('--summarize', action='store_true',
+                    help='Use the invariants of loops instead of unrolling them')
+    ap.add_argument('--intervals', action='store_true',
+                    help='Decide conditions by an interval analysis before using the solver')
+    ap.add_argument('--generational', action='store_true',
+                    help='Run the program concretely and negate one branch at a time for new inputs')
+    ap.add_argument('--loop-bound', metavar='N', type=builtins.int, default=10,
+                    help='Run loops symbolically N times before finishing them concretely')
+    ap.add_argument('--steps', metavar='N', type=builtins.int, default=10000,
+                    help='End a concrete run after N loop iterations')
+    ap.add_argument('--infer-bounds', action='store_true',
+                    help='Run loops symbolically as often as an interval analysis finds they can run')
+    ap.add_argument('--stop-on-coverage', action='store_true',
+                    help='Stop once every outcome of every branch is covered')
+    ap.add_argument('--enumerate-below', metavar='N', type=builtins.int, default=None,
+                    help='Run programs with at most N bounded inputs on all of them')
+    ap.add_argument('--enumerate-jobs', metavar='N', type=builtins.int, default=1,
+                    help='Enumerate inputs on N processes')
+    ap.add_argument('--save-tests', metavar='DIR', default=None,
+                    help='Save the inputs and outcomes of all paths to DIR, see wlang.replay')
+    ap.add_argument('--jobs', metavar='N', type=builtins.int, default=1,
+                    help='Explore with N worker processes')
+    budget_.add_arguments(ap)
+    concretize.add_arguments(ap)
     args = ap.parse_args()
+    budget_.check_jobs(ap, args)
+    if args.jobs > 1 and args.save_tests is not None:
+        # the results of the workers only come back as reports
+        ap.error('--save-tests cannot be used with --jobs')
     return args
 
-def main():
-    args = _parse_args()
+def _setup(args):
+    """Create the engine, the program and initial states from the arguments"""
     prg = ast.parse_file(args.in_file)
-    st = ExeState()
-    exe = ExeExec()
+    exe = ExeExec(budget=budget_.from_args(args), prune=args.prune,
+                  summarize=args.summarize, intervals=args.intervals,
+                  loop_bound=args.loop_bound, infer_bounds=args.infer_bounds,
+                  generational=args.generational, steps=args.steps,
+                  policy=concretize.from_args(args),
+                  stop_on_coverage=args.stop_on_coverage,
+                  enumerate_below=args.enumerate_below,
+                  enumerate_jobs=args.enumerate_jobs)
+    return (exe, prg, lambda: ExeState(compact=args.compact))
 
-    states: list[ExeState] = exe.run(prg, st)
+def _report(state: ExeState):
+    return (state.is_valid(), str(state))
 
-    valid_states = [s for s in states if s.is_valid()] # cull invalid states
-    invalid_states = [s for s in states if not s.is_valid()]
+def main():
+    args = _parse_args()
+    exe = None
+    # results to save, see --save-tests
+    results = []
+    if args.jobs > 1:
+        states = parallel.explore(_setup, args, args.jobs, _report)
+    else:
+        exe, prg, mk_state = _setup(args)
+
+        def report(state):
+            if args.save_tests is not None:
+                results.append(state)
+            return _report(state)
+        states = (report(s) for s in exe.stream(prg, mk_state()))
 
-    count = 0
-    for out in invalid_states:
-        count = count + 1
-        print('[exec]: invalid state reached')
+    # print every state as soon as its path is done
+    valid = 0
+    invalid = 0
+    for is_valid, out in states:
+        if is_valid:
+            valid = valid + 1
+            print('[exec]: state reached')
+        else:
+            invalid = invalid + 1
+            print('[exec]: invalid state reached')
         print(out)
-        print('[exec]: found', count, 'invalid states\n')
 
-    if len(valid_states) == 0:
+    if invalid > 0:
+        print('[exec]: found', invalid, 'invalid states')
+    if valid == 0:
         print('[exec]: no valid output states')
     else:
-        count = 0
-        for out in valid_states:
-
-            count = count + 1
-            print('[exec]: state reached')
-            print(out)
-        print('[exec]: found', count, 'valid states')
+        print('[exec]: found', valid, 'valid states')
+    if exe is not None and not exe.summary.is_complete():
+        print('[exec]:', exe.summary)
+    if exe is not None:
+        print('[exec]:', exe.coverage)
+        for d in exe.policy.decisions:
+            print('[exec]:', concretize.describe(d))
+    if exe is not None and args.save_tests is not None:
+        n = replay.save(args.save_tests, results)
+        print('[exec]: saved the inputs of', n, 'paths to', args.save_tests)
+    if exe is not None and args.infer_bounds:
+        sym._print_bounds('[exec]:', exe, prg)
     return 0
 
-
 if __name__ == '__main__':
     sys.exit(main())
\ No newline at end of file
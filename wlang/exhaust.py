@@ -0,0 +1,204 @@
+"""
+Exhaustive enumeration of the inputs of programs.
+
+A program whose havocs all come first, followed by assumptions that
+bound every havoc'd variable to a finite range, has a finite input
+domain. If the domain is small, running the program concretely on every
+input in it is cheaper than exploring it symbolically, and it finds
+every path, every failed assertion and every division by zero without
+a single solver query.
+
+Inputs are named as in wlang.fuzz: the n-th value havoc gives a
+variable x is the input x!n.
+"""
+import itertools
+import math
+import multiprocessing as mp
+
+from . import ast, coverage, fuzz, interval
+
+
+def _has_havoc(node):
+    if isinstance(node, ast.HavocStmt):
+        return True
+    if isinstance(node, ast.StmtList):
+        return any(_has_havoc(s) for s in node.stmts)
+    if isinstance(node, ast.IfStmt):
+        return _has_havoc(node.then_stmt) or (node.has_else() and _has_havoc(node.else_stmt))
+    if isinstance(node, ast.WhileStmt):
+        return _has_havoc(node.body)
+    return False
+
+
+def _statements(node, res):
+    """Append the statements of a program to a list, in the order they appear"""
+    if isinstance(node, ast.StmtList):
+        for s in node.stmts:
+            _statements(s, res)
+        return res
+    res.append(node)
+    if isinstance(node, ast.IfStmt):
+        _statements(node.then_stmt, res)
+        if node.has_else():
+            _statements(node.else_stmt, res)
+    elif isinstance(node, ast.WhileStmt):
+        _statements(node.body, res)
+    return res
+
+
+def domain(prg):
+    """The range of every havoc'd variable of a program, by name, or None
+       if the inputs are not all bounded.
+
+       The ranges are read off the havocs and assumptions at the start of
+       the program, so they may include inputs that the assumptions rule
+       out; runs on those inputs stop at the assumptions.
+    """
+    stmts = prg.stmts if isinstance(prg, ast.StmtList) else [prg]
+    prefix = []
+    for s in stmts:
+        if not isinstance(s, (ast.HavocStmt, ast.AssumeStmt, ast.SkipStmt)):
+            break
+        prefix.append(s)
+    if any(_has_havoc(s) for s in stmts[len(prefix):]):
+        return None
+
+    names = []
+    for s in prefix:
+        if isinstance(s, ast.HavocStmt):
+            for v in s.vars:
+                if v.name in names:
+                    # only the last value is bounded by the assumptions
+                    return None
+                names.append(v.name)
+
+    env = interval.IntervalAnalysis().check(ast.StmtList(prefix))
+    res = dict()
+    for name in names:
+        if env is None:
+            # the assumptions cannot hold, so there are no inputs
+            res[name] = (0, -1)
+            continue
+        lo, hi = env.get(name, (-math.inf, math.inf))
+        if math.isinf(lo) or math.isinf(hi):
+            return None
+        res[name] = (lo, hi)
+    return res
+
+
+def size(dom):
+    """The number of inputs in a domain"""
+    res = 1
+    for lo, hi in dom.values():
+        res *= max(0, hi - lo + 1)
+    return res
+
+
+class Path(object):
+    """A path of a program and the first input that takes it"""
+
+    def __init__(self, run, edges):
+        self.inputs = run.used
+        # ids of the branch outcomes the path takes, see wlang.coverage
+        self.edges = edges
+        self.env = run.env
+        # the assertion the path fails, or the statement it divides by
+        # zero in, None if it does neither
+        self.error = run.node if run.is_error() else None
+        # number of inputs that take the path
+        self.count = 1
+
+    def is_error(self):
+        return self.error is not None
+
+
+def _enumerate(prg, names, ranges, steps):
+    """Run a program on every input in a product of ranges. Return its
+       paths, keyed by the edges they take and the position of the
+       statement they fail at, and the number of inputs rejected by
+       assumptions and stopped by the step limit"""
+    tracer = fuzz.Tracer(steps)
+    cov = coverage.Coverage(prg)
+    stmts = {id(s): i for i, s in enumerate(_statements(prg, []))}
+    paths = dict()
+    rejected = 0
+    stopped = 0
+    for values in itertools.product(*ranges):
+        run = tracer.trace(prg, dict(zip(names, values)), lambda: 0)
+        if run.stop == 'assume':
+            rejected += 1
+            continue
+        if run.stop == 'steps':
+            stopped += 1
+            continue
+        edges = tuple(cov.edge(n, t) for n, t in run.path)
+        # a division by zero ends a path without a branch of its own
+        key = (edges, stmts[id(run.node)] if run.is_error() else None)
+        if key in paths:
+            paths[key].count += 1
+        else:
+            paths[key] = Path(run, edges)
+    return paths, rejected, stopped
+
+
+def _enumerate_chunk(args):
+    prg, names, ranges, steps = args
+    paths, rejected, stopped = _enumerate(prg, names, ranges, steps)
+    # nodes do not keep their identity across processes, so errors are
+    # sent back by their position in the program
+    for (_, error), p in paths.items():
+        p.error = error
+    return paths, rejected, stopped
+
+
+class Enumerator(object):
+    """Runs a program on every input of its domain.
+
+    ``steps`` is the number of loop iterations a run may take, ``jobs``
+    the number of processes the domain is split over.
+    """
+
+    def __init__(self, steps=10000, jobs=1):
+        self.steps = steps
+        self.jobs = jobs
+        self.reset()
+
+    def reset(self):
+        self.runs = 0
+        # inputs rejected by assumptions and stopped by the step limit
+        self.rejected = 0
+        self.stopped = 0
+
+    def run(self, prg, dom):
+        """Return a Path for every path of a program on a domain, in the
+           order of the first input that takes it"""
+        self.reset()
+        # every variable is havoc'd once, so its input is the first one
+        names = [v + "!0" for v in dom]
+        ranges = [range(lo, hi + 1) for lo, hi in dom.values()]
+        self.runs = size(dom)
+        if self.jobs <= 1 or len(ranges) == 0:
+            paths, self.rejected, self.stopped = _enumerate(prg, names, ranges, self.steps)
+            return list(paths.values())
+
+        # split the range of the first input into a chunk per job
+        first = ranges[0]
+        n = -(-len(first) // self.jobs)
+        chunks = [[first[i:i + n]] + ranges[1:] for i in range(0, len(first), n)]
+        with mp.Pool(self.jobs) as pool:
+            parts = pool.map(_enumerate_chunk,
+                             [(prg, names, c, self.steps) for c in chunks])
+
+        stmts = _statements(prg, [])
+        paths = dict()
+        for part, rejected, stopped in parts:
+            self.rejected += rejected
+            self.stopped += stopped
+            for key, p in part.items():
+                if key in paths:
+                    paths[key].count += p.count
+                    continue
+                if p.error is not None:
+                    p.error = stmts[p.error]
+                paths[key] = p
+        return list(paths.values())
@@ -0,0 +1,319 @@
+"""
+Hybrid fuzzing of programs.
+
+Random inputs hit most branches of a program cheaply, so the fuzzer
+mutates the inputs of the runs that covered something new and runs them
+concretely, without a solver. Only when no new branch outcome has been
+covered for a while is a branch that is stuck on one outcome handed to
+the concolic engine, which solves for an input that takes the other one.
+
+Inputs are named like the inputs of the generational search of
+wlang.exe: the n-th value havoc gives a variable x is the input x!n.
+"""
+import builtins
+import random
+import sys
+
+from . import ast, coverage, exe, int
+from . import simplify as smp
+
+
+class _Stop(Exception):
+    """Raised to end a run that cannot go on"""
+
+    def __init__(self, reason, node=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.node = node
+
+
+class Tracer(int.Interpreter):
+    """A concrete interpreter that reads its inputs from a dict, records
+    the branch outcomes it takes and ends a run at the first failed
+    assertion or assumption, or once it has run too many loop iterations.
+    Division follows z3, as in wlang.exe, and a division by zero is an
+    error of the statement it is in, as it is there.
+    """
+
+    def __init__(self, steps=10000):
+        super(Tracer, self).__init__()
+        self.steps = steps
+
+    def trace(self, prg, inputs, gen):
+        """Run a program on inputs and return a Run. Inputs that are
+           missing are made up by gen"""
+        run = Run(inputs, gen)
+        st = int.State()
+        # assignments update the env in place, so it is the final one
+        # even if the run stops early
+        run.env = st.env
+        try:
+            self.visit(prg, state=st, run=run)
+        except _Stop as e:
+            run.stop, run.node = e.reason, e.node
+        return run
+
+    def _eval(self, node, exp, *args, **kwargs):
+        """The value of an expression of a statement"""
+        try:
+            return self.visit(exp, *args, **kwargs)
+        except ZeroDivisionError:
+            raise _Stop('division by zero', node)
+
+    def visit_AExp(self, node, *args, **kwargs):
+        if node.op != "/":
+            return super(Tracer, self).visit_AExp(node, *args, **kwargs)
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        res = kids[0]
+        for k in kids[1:]:
+            res = smp.div(res, k)
+        return res
+
+    def visit_AsgnStmt(self, node, *args, **kwargs):
+        st = kwargs["state"]
+        st.env[node.lhs.name] = self._eval(node, node.rhs, *args, **kwargs)
+        return st
+
+    def _branch(self, node, *args, **kwargs):
+        taken = self._eval(node, node.cond, *args, **kwargs)
+        kwargs["run"].path.append((node, taken))
+        return taken
+
+    def visit_IfStmt(self, node, *args, **kwargs):
+        if self._branch(node, *args, **kwargs):
+            return self.visit(node.then_stmt, *args, **kwargs)
+        if node.has_else():
+            return self.visit(node.else_stmt, *args, **kwargs)
+        return kwargs["state"]
+
+    def visit_WhileStmt(self, node, *args, **kwargs):
+        run = kwargs["run"]
+        # iterate rather than recurse, so that long loops are fine
+        while self._branch(node, *args, **kwargs):
+            run.steps += 1
+            if run.steps > self.steps:
+                raise _Stop('steps', node)
+            kwargs["state"] = self.visit(node.body, *args, **kwargs)
+        return kwargs["state"]
+
+    def visit_AssertStmt(self, node, *args, **kwargs):
+        if not self._branch(node, *args, **kwargs):
+            raise _Stop('assert', node)
+        return kwargs["state"]
+
+    def visit_AssumeStmt(self, node, *args, **kwargs):
+        if not self._eval(node, node.cond, *args, **kwargs):
+            raise _Stop('assume', node)
+        return kwargs["state"]
+
+    def visit_HavocStmt(self, node, *args, **kwargs):
+        st = kwargs["state"]
+        for v in node.vars:
+            st.env[v.name] = kwargs["run"].fresh(v.name)
+        return st
+
+
+class Run(object):
+    """A concrete run of a program"""
+
+    def __init__(self, inputs, gen):
+        self.inputs = inputs
+        self._gen = gen
+        # inputs read by the run
+        self.used = dict()
+        self._havocs = dict()
+        # (branch site, outcome) in the order they were taken
+        self.path = list()
+        # values of the variables at the end of the run
+        self.env = None
+        self.steps = 0
+        # why the run ended early, None if it did not, and where
+        self.stop = None
+        self.node = None
+
+    def fresh(self, var):
+        """The value of the next input of a variable"""
+        n = self._havocs.get(var, 0)
+        self._havocs[var] = n + 1
+        name = var + "!" + str(n)
+        if name not in self.inputs:
+            self.inputs[name] = self._gen()
+        self.used[name] = self.inputs[name]
+        return self.used[name]
+
+    def is_error(self):
+        return self.stop in ('assert', 'division by zero')
+
+
+def _constants(node, res):
+    """Collect the integer constants of a program"""
+    if isinstance(node, ast.IntConst):
+        res.add(node.val)
+    elif isinstance(node, ast.Exp):
+        for a in node.args:
+            _constants(a, res)
+    elif isinstance(node, ast.StmtList):
+        for s in node.stmts:
+            _constants(s, res)
+    elif isinstance(node, ast.AsgnStmt):
+        _constants(node.rhs, res)
+    elif isinstance(node, (ast.IfStmt, ast.WhileStmt, ast.AssertStmt, ast.AssumeStmt)):
+        _constants(node.cond, res)
+        for s in (getattr(node, 'then_stmt', None), getattr(node, 'else_stmt', None),
+                  getattr(node, 'body', None)):
+            if s is not None:
+                _constants(s, res)
+    return res
+
+
+class Fuzzer(object):
+    """Mutates the inputs of a program and falls back on the concolic
+    engine for branches that mutation does not flip.
+
+    ``stall`` is the number of runs without new coverage after which a
+    stuck branch is solved, ``steps`` the number of loop iterations a
+    run may take. ``engine`` is the ExeExec that solves branches, by
+    default one whose runs take at most ``steps`` iterations too.
+    """
+
+    def __init__(self, seed=None, stall=200, steps=10000, engine=None):
+        self.random = random.Random(seed)
+        self.stall = stall
+        self.tracer = Tracer(steps)
+        self.engine = engine if engine is not None else exe.ExeExec(steps=steps)
+        self.reset()
+
+    def reset(self):
+        self.coverage = None
+        # inputs of the runs that covered something new
+        self.corpus = []
+        # (inputs, statement) of the first run that failed each assertion
+        # or divided by zero in each statement
+        self.failures = []
+        self.runs = 0
+        # branches solved by the concolic engine, and given up on
+        self.solved = 0
+        self._stuck = set()
+        self._dict = [0, 1, -1]
+
+    def fuzz(self, prg, runs=1000):
+        """Fuzz a program for a number of runs, or until every branch
+           outcome is covered. Return the failures, see failures"""
+        self.reset()
+        self.coverage = coverage.Coverage(prg)
+        self.engine.coverage = None
+        for c in sorted(_constants(prg, set())):
+            self._dict.extend((c - 1, c, c + 1))
+
+        stalled = 0
+        self._execute(prg, dict())
+        while self.runs < runs and not self.coverage.is_saturated():
+            if stalled >= self.stall:
+                stalled = 0
+                inputs = self._solve(prg)
+                if inputs is None:
+                    # every stuck branch was tried, go back to mutating
+                    self._stuck = set()
+                    continue
+            elif len(self.corpus) > 0:
+                inputs = self._mutate(self.random.choice(self.corpus))
+            else:
+                # no run got anywhere yet, make up all the inputs
+                inputs = dict()
+            if self._execute(prg, inputs):
+                stalled = 0
+            else:
+                stalled += 1
+        return self.failures
+
+    def _gen(self):
+        if self.random.random() < 0.5:
+            return self.random.choice(self._dict)
+        return self.random.randint(-1000, 1000)
+
+    def _mutate(self, inputs):
+        res = dict(inputs)
+        if len(res) == 0:
+            return res
+        for _ in range(self.random.randint(1, 2)):
+            name = self.random.choice(sorted(res))
+            op = self.random.randrange(4)
+            if op == 0:
+                res[name] += self.random.choice((-1, 1))
+            elif op == 1:
+                res[name] += self.random.randint(-100, 100)
+            elif op == 2:
+                res[name] = -res[name]
+            else:
+                res[name] = self._gen()
+        return res
+
+    def _execute(self, prg, inputs):
+        """Run the program on inputs. Return True if it covered something new"""
+        run = self.tracer.trace(prg, dict(inputs), self._gen)
+        self.runs += 1
+        new = False
+        for node, taken in run.path:
+            new = self.coverage.hit(node, taken) or new
+        if new:
+            self.corpus.append(run.used)
+        if run.is_error() and all(n is not run.node for _, n in self.failures):
+            self.failures.append((run.used, run.node))
+        return new
+
+    def _solve(self, prg):
+        """Solve for inputs that take the uncovered outcome of a branch
+           that only one outcome of was taken so far"""
+        for site in self.coverage.sites:
+            if id(site) in self._stuck:
+                continue
+            outcomes = [self.coverage.is_covered(site, t) for t in (True, False)]
+            if outcomes.count(True) != 1:
+                continue
+            self._stuck.add(id(site))
+            for inputs in self.corpus:
+                run = self.tracer.trace(prg, dict(inputs), self._gen)
+                # the engine would run into the step limit as well
+                if run.stop == 'steps' or not any(n is site for n, _ in run.path):
+                    continue
+                res = self.engine.flip(prg, run.used, site)
+                if res is not None:
+                    self.solved += 1
+                    return res
+        return None
+
+
+def _parse_args():
+    import argparse
+    ap = argparse.ArgumentParser(prog='fuzz',
+                                 description='WLang hybrid fuzzer')
+    ap.add_argument('in_file', metavar='FILE',
+                    help='WLang program to fuzz')
+    ap.add_argument('--runs', metavar='N', type=builtins.int, default=1000,
+                    help='Stop after N runs')
+    ap.add_argument('--seed', metavar='S', type=builtins.int, default=None,
+                    help='Seed of the random mutations')
+    ap.add_argument('--stall', metavar='N', type=builtins.int, default=200,
+                    help='Solve for a stuck branch after N runs without new coverage')
+    ap.add_argument('--steps', metavar='N', type=builtins.int, default=10000,
+                    help='End a run after N loop iterations')
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    args = _parse_args()
+    prg = ast.parse_file(args.in_file)
+    fuzzer = Fuzzer(seed=args.seed, stall=args.stall, steps=args.steps)
+    failures = fuzzer.fuzz(prg, args.runs)
+    for inputs, node in failures:
+        what = 'assertion failed:' if isinstance(node, ast.AssertStmt) else 'division by zero:'
+        print('[fuzz]:', what, str(node).strip())
+        print('[fuzz]: inputs:', inputs)
+    print('[fuzz]:', fuzzer.runs, 'runs,', fuzzer.solved, 'branches solved,',
+          fuzzer.coverage)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
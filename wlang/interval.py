@@ -0,0 +1,362 @@
+"""
+Interval analysis of programs.
+
+Computes a range of values of every variable at every statement, for
+all executions of a program at once, and uses it to decide the
+conditions of ifs, loops and asserts. A condition that the ranges
+decide holds, or fails, on every execution that reaches it, so the
+engines can skip the solver query that would otherwise decide it.
+
+An interval is a pair (lo, hi) of ints or infinities. An env maps
+variables to intervals; a variable that is not in it may have any
+value. None stands for the env of a statement that is never reached.
+"""
+import math
+
+from . import ast, util
+
+_TOP = (-math.inf, math.inf)
+
+# the comparison that holds exactly when a given one fails
+_NEGATE = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '=': None}
+# the comparison with its arguments swapped
+_FLIP = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '=': '='}
+
+
+def _mul(a, b):
+    # unlike floats, 0 * inf is 0 for the bounds of intervals
+    if a == 0 or b == 0:
+        return 0
+    return a * b
+
+
+def _compare(op, a, b):
+    """Decide a comparison of two intervals: True if it always holds,
+       False if it never does and None if it depends"""
+    if op in ('>', '>='):
+        return _compare(_FLIP[op], b, a)
+    if op == '<':
+        if a[1] < b[0]:
+            return True
+        if a[0] >= b[1]:
+            return False
+    elif op == '<=':
+        if a[1] <= b[0]:
+            return True
+        if a[0] > b[1]:
+            return False
+    elif op == '=':
+        if a[0] == a[1] == b[0] == b[1]:
+            return True
+        if a[1] < b[0] or b[1] < a[0]:
+            return False
+    return None
+
+
+def _restrict(op, a, b):
+    """The values of an interval a for which a comparison with some
+       value of b holds, None if there are none"""
+    lo, hi = a
+    if op == '<':
+        hi = min(hi, b[1] - 1)
+    elif op == '<=':
+        hi = min(hi, b[1])
+    elif op == '>':
+        lo = max(lo, b[0] + 1)
+    elif op == '>=':
+        lo = max(lo, b[0])
+    elif op == '=':
+        lo, hi = max(lo, b[0]), min(hi, b[1])
+    if lo > hi:
+        return None
+    return (lo, hi)
+
+
+def _conjuncts(exp):
+    if isinstance(exp, ast.BExp) and not isinstance(exp, ast.RelExp) and exp.op == 'and':
+        for a in exp.args:
+            yield from _conjuncts(a)
+    else:
+        yield exp
+
+
+def join(a, b):
+    """The smallest env that includes two envs"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return {k: (min(v[0], b[k][0]), max(v[1], b[k][1]))
+            for k, v in a.items() if k in b}
+
+
+def widen(a, b):
+    """An env that includes two envs, where every bound that grows from
+       a to b goes to infinity so that loops converge"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    res = dict()
+    for k, v in a.items():
+        if k in b:
+            lo = v[0] if b[k][0] >= v[0] else -math.inf
+            hi = v[1] if b[k][1] <= v[1] else math.inf
+            res[k] = (lo, hi)
+    return res
+
+
+def includes(a, b):
+    """True if env a includes env b"""
+    if b is None:
+        return True
+    if a is None:
+        return False
+    return all(k in b and b[k][0] >= v[0] and b[k][1] <= v[1]
+               for k, v in a.items())
+
+
+class IntervalAnalysis(ast.AstVisitor):
+    """Computes the ranges of all variables and the conditions they decide"""
+
+    def __init__(self):
+        super(IntervalAnalysis, self).__init__()
+        # decided conditions of statements by statement id
+        self._facts = dict()
+        # envs on entry to loops by loop id
+        self._entries = dict()
+
+    def check(self, node):
+        """Analyze a program from a state where every variable is undefined"""
+        self._facts = dict()
+        self._entries = dict()
+        return self.visit(node, env=dict())
+
+    def decide(self, node):
+        """True if the condition of an if, loop or assert holds every time
+           it is evaluated, False if it never does, None if that is not known"""
+        return self._facts.get(id(node))
+
+    def bound(self, node):
+        """The most times the body of a loop is executed every time the
+           loop is entered, None if that is not known.
+
+           A loop is bounded if its condition is a comparison, or a
+           conjunction with one, between a variable that the body moves
+           by a constant towards the exit and an expression that the body
+           does not change.
+        """
+        env = self._entries.get(id(node))
+        if env is None:
+            return None
+        changed = util.assigned_vars(node.body)
+        res = None
+        for c in _conjuncts(node.cond):
+            n = self._trip_count(c, node.body, env, changed)
+            if n is not None and (res is None or n < res):
+                res = n
+        return res
+
+    def _trip_count(self, exp, body, env, changed):
+        if not isinstance(exp, ast.RelExp) or exp.op == '=':
+            return None
+        op, var, limit = exp.op, exp.arg(0), exp.arg(1)
+        if not isinstance(var, ast.IntVar):
+            op, var, limit = _FLIP[op], limit, var
+        if not isinstance(var, ast.IntVar) or util.uses_vars(limit, changed):
+            return None
+        step = util.counter_step(body, var.name)
+        if step is None:
+            return None
+
+        start = self.visit(var, env=env)
+        end = self.visit(limit, env=env)
+        if op in ('<', '<=') and step > 0:
+            gap = end[1] - start[0]
+        elif op in ('>', '>=') and step < 0:
+            gap, step = start[1] - end[0], -step
+        else:
+            return None
+        if math.isinf(gap):
+            return None
+        # the loop goes on while the counter is gap away from the limit
+        if op in ('<', '>'):
+            return max(0, -(-gap // step))
+        return max(0, gap // step + 1)
+
+    def visit_IntConst(self, node, *args, **kwargs):
+        return (node.val, node.val)
+
+    def visit_IntVar(self, node, *args, **kwargs):
+        return kwargs['env'].get(node.name, _TOP)
+
+    def visit_AExp(self, node, *args, **kwargs):
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        res = kids[0]
+        for b in kids[1:]:
+            if node.op == '+':
+                res = (res[0] + b[0], res[1] + b[1])
+            elif node.op == '-':
+                res = (res[0] - b[1], res[1] - b[0])
+            elif node.op == '*':
+                bounds = [_mul(x, y) for x in res for y in b]
+                res = (min(bounds), max(bounds))
+            else:
+                res = _TOP
+        return res
+
+    def visit_BoolConst(self, node, *args, **kwargs):
+        return node.val
+
+    def visit_RelExp(self, node, *args, **kwargs):
+        lhs = self.visit(node.arg(0), *args, **kwargs)
+        rhs = self.visit(node.arg(1), *args, **kwargs)
+        return _compare(node.op, lhs, rhs)
+
+    def visit_BExp(self, node, *args, **kwargs):
+        kids = [self.visit(a, *args, **kwargs) for a in node.args]
+        if node.op == 'not':
+            return None if kids[0] is None else not kids[0]
+        if node.op == 'and':
+            if False in kids:
+                return False
+            return True if all(kids) else None
+        if True in kids:
+            return True
+        return False if all(k is False for k in kids) else None
+
+    def assume(self, exp, env, positive=True):
+        """The part of an env where a condition holds, or fails if
+           positive is False"""
+        if env is None:
+            return None
+        res = self.visit(exp, env=env)
+        if res is not None:
+            return env if res == positive else None
+
+        if isinstance(exp, ast.RelExp):
+            op = exp.op if positive else _NEGATE[exp.op]
+            if op is None:
+                return env
+            lhs, rhs = exp.arg(0), exp.arg(1)
+            env = dict(env)
+            if isinstance(lhs, ast.IntVar):
+                val = _restrict(op, self.visit(lhs, env=env), self.visit(rhs, env=env))
+                if val is None:
+                    return None
+                env[lhs.name] = val
+            if isinstance(rhs, ast.IntVar):
+                val = _restrict(_FLIP[op], self.visit(rhs, env=env), self.visit(lhs, env=env))
+                if val is None:
+                    return None
+                env[rhs.name] = val
+            return env
+
+        if exp.op == 'not':
+            return self.assume(exp.arg(0), env, not positive)
+        if (exp.op == 'and') == positive:
+            for a in exp.args:
+                env = self.assume(a, env, positive)
+            return env
+        res = None
+        for a in exp.args:
+            res = join(res, self.assume(a, env, positive))
+        return res
+
+    def _decide(self, node, env):
+        if env is not None:
+            self._facts[id(node)] = self.visit(node.cond, env=env)
+
+    def visit_StmtList(self, node, *args, **kwargs):
+        env = kwargs['env']
+        for s in node.stmts:
+            env = self.visit(s, env=env)
+        return env
+
+    def visit_SkipStmt(self, node, *args, **kwargs):
+        return kwargs['env']
+
+    def visit_PrintStateStmt(self, node, *args, **kwargs):
+        return kwargs['env']
+
+    def visit_AsgnStmt(self, node, *args, **kwargs):
+        env = kwargs['env']
+        if env is None:
+            return None
+        env = dict(env)
+        env[node.lhs.name] = self.visit(node.rhs, env=env)
+        return env
+
+    def visit_HavocStmt(self, node, *args, **kwargs):
+        env = kwargs['env']
+        if env is None:
+            return None
+        names = set(v.name for v in node.vars)
+        return {k: v for k, v in env.items() if k not in names}
+
+    def visit_AssumeStmt(self, node, *args, **kwargs):
+        return self.assume(node.cond, kwargs['env'])
+
+    def visit_AssertStmt(self, node, *args, **kwargs):
+        env = kwargs['env']
+        self._decide(node, env)
+        # the engines go on after a failed assertion as well
+        return env
+
+    def visit_IfStmt(self, node, *args, **kwargs):
+        env = kwargs['env']
+        self._decide(node, env)
+        then_env = self.visit(node.then_stmt, env=self.assume(node.cond, env))
+        else_env = self.assume(node.cond, env, False)
+        if node.has_else():
+            else_env = self.visit(node.else_stmt, env=else_env)
+        return join(then_env, else_env)
+
+    def visit_WhileStmt(self, node, *args, **kwargs):
+        env = kwargs['env']
+        if env is not None:
+            self._entries[id(node)] = env
+        head = env
+        iters = 0
+        while True:
+            body_env = self.visit(node.body, env=self.assume(node.cond, head))
+            new = join(env, body_env)
+            if includes(head, new):
+                break
+            iters += 1
+            head = join(head, new) if iters < 3 else widen(head, new)
+
+        if new != head:
+            # one more step narrows the bounds that widening lost
+            head = new
+            self.visit(node.body, env=self.assume(node.cond, head))
+        # the body was analyzed last from the final head, so the facts in
+        # it hold on every iteration
+        self._decide(node, head)
+        return self.assume(node.cond, head, False)
+
+
+def loop_bounds(prg, analysis):
+    """Return the bounds that an analysis of a program found for its
+       loops, indexed by the id of the loop"""
+    res = dict()
+    for loop in util.loops(prg):
+        bound = analysis.bound(loop)
+        if bound is not None:
+            res[id(loop)] = bound
+    return res
+
+
+def main():
+    import sys
+
+    prg = ast.parse_file(sys.argv[1])
+    ia = IntervalAnalysis()
+    print('ranges at end:', ia.check(prg))
+    for i, loop in enumerate(util.loops(prg)):
+        print('loop', i, 'bound:', ia.bound(loop))
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Parallel exploration of programs.
+
+A single program is explored by several processes with ``explore``;
+many programs are analyzed at once on a thread pool with ``analyze``.
+
+The paths of a program are named by their branch prefix: the index of
+the successor taken at every fork, from the start of the program. A
+worker explores everything below a prefix by replaying it and then
+running as usual. Whenever another worker is idle, a worker gives away
+the siblings of the state it keeps at a fork as new prefixes.
+
+Every worker is a separate process, so it has its own z3 context.
+Threads share a process, so ``analyze`` gives every program a fresh
+context instead.
+"""
+import multiprocessing as mp
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import z3
+
+
+def split(engine, branches, n):
+    """Indices of the successors of a fork that an engine explores itself.
+
+    ``branches`` is the prefix of the forked state and ``n`` the number
+    of its successors. While replaying a prefix only the successor on
+    the prefix is kept; after that, siblings are given away to idle
+    workers through ``engine.donate``.
+    """
+    depth = len(branches)
+    if depth < len(engine.prefix):
+        return [engine.prefix[depth]]
+    if engine.donate is None:
+        return list(range(n))
+    return [0] + [i for i in range(1, n)
+                  if not engine.donate(branches + (i,))]
+
+
+def _worker(setup, args, report, tasks, results, hungry):
+    try:
+        engine, prg, mk_state = setup(args)
+    except Exception:
+        results.put(('error', None, traceback.format_exc()))
+        return
+
+    def donate(prefix):
+        with hungry.get_lock():
+            if hungry.value <= 0:
+                return False
+            hungry.value -= 1
+        tasks.put(prefix)
+        splits.append(prefix)
+        return True
+
+    engine.donate = donate
+    while True:
+        with hungry.get_lock():
+            hungry.value += 1
+        prefix = tasks.get()
+        if prefix is None:
+            break
+        splits = []
+        engine.prefix = prefix
+        try:
+            for out in engine.stream(prg, mk_state()):
+                results.put(('state', report(out)))
+        except Exception:
+            results.put(('error', prefix, traceback.format_exc()))
+            break
+        results.put(('done', prefix, splits))
+
+
+def explore(setup, args, jobs, report):
+    """Explore a program with the given number of worker processes.
+
+    ``setup(args)`` is called in every worker and returns the engine,
+    the program and a function that creates an initial state.
+    ``report`` turns a final state into something that can be sent to
+    the parent. Reports are yielded as soon as they arrive.
+    """
+    tasks = mp.Queue()
+    results = mp.Queue()
+    # number of idle workers minus the number of queued prefixes
+    hungry = mp.Value('i', -1)
+    workers = [mp.Process(target=_worker, daemon=True,
+                          args=(setup, args, report, tasks, results, hungry))
+               for _ in range(jobs)]
+    for w in workers:
+        w.start()
+
+    tasks.put(())
+    # a prefix is known once the worker that split it off is done, so
+    # the two sets only meet when every prefix has been explored
+    known = {()}
+    done = set()
+    try:
+        while known != done:
+            msg = results.get()
+            if msg[0] == 'state':
+                yield msg[1]
+            elif msg[0] == 'done':
+                done.add(msg[1])
+                known.update(msg[2])
+            else:
+                raise RuntimeError('worker failed on prefix %s:\n%s'
+                                   % (msg[1], msg[2]))
+    finally:
+        if known != done:
+            for w in workers:
+                w.terminate()
+        else:
+            for w in workers:
+                tasks.put(None)
+        for w in workers:
+            w.join()
+
+
+def analyze(prgs, threads, mk_engine, mk_state):
+    """Analyze many programs on a pool of threads.
+
+    ``mk_engine(ctx)`` and ``mk_state(ctx)`` create an engine and an
+    initial state in the z3 context of a single program. Return the
+    final states of every program, in order.
+    """
+    def run(prg):
+        ctx = z3.Context()
+        return mk_engine(ctx).run(prg, mk_state(ctx))
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(run, prgs))
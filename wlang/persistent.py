@@ -0,0 +1,296 @@
+"""
+Persistent data structures for symbolic states.
+
+Updates never modify a structure in place; they return a new one that
+shares everything it did not change with the old one. Forking a state
+only copies a reference, and siblings share their common history.
+"""
+from collections.abc import MutableMapping
+import itertools
+
+
+class PList(object):
+    """Immutable list that grows at the end, stored as a cons-list.
+
+    Iteration goes from the oldest element to the newest one. Lists
+    built from a common list share it as their tail.
+    """
+    __slots__ = ('_head', '_tail', '_len')
+
+    def __init__(self, items=()):
+        self._head = None
+        self._tail = None
+        self._len = 0
+        if items:
+            res = PList().extend(items)
+            self._head, self._tail, self._len = res._head, res._tail, res._len
+
+    def append(self, x):
+        """A list with x added at the end"""
+        res = PList.__new__(PList)
+        res._head, res._tail, res._len = x, self, self._len + 1
+        return res
+
+    def extend(self, items):
+        """A list with all the items added at the end"""
+        res = self
+        for x in items:
+            res = res.append(x)
+        return res
+
+    def common(self, other):
+        """The longest tail shared with another list"""
+        a, b = self, other
+        while a._len > b._len:
+            a = a._tail
+        while b._len > a._len:
+            b = b._tail
+        while a is not b and a._len > 0:
+            a, b = a._tail, b._tail
+        return a if a is b else PList()
+
+    def since(self, tail):
+        """The items added after a tail of the list, oldest first"""
+        res = []
+        node = self
+        while node._len > tail._len:
+            res.append(node._head)
+            node = node._tail
+        res.reverse()
+        return res
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(self.since(PList()))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+# a map is a trie on 5-bit slices of the hash of its keys
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+
+
+def _hash(key):
+    return hash(key) & ((1 << _HASH_BITS) - 1)
+
+
+class _Node(object):
+    """Trie node; entries are leaves (hash, key, value, seq) or nodes"""
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def _index(self, bit):
+        return bin(self.bitmap & (bit - 1)).count('1')
+
+    def get(self, shift, h, key):
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return None
+        e = self.entries[self._index(bit)]
+        if isinstance(e, tuple):
+            return e if e[0] == h and e[1] == key else None
+        return e.get(shift + _BITS, h, key)
+
+    def assoc(self, shift, leaf):
+        """The node with a leaf added or replaced, and whether it was added"""
+        bit = 1 << ((leaf[0] >> shift) & _MASK)
+        idx = self._index(bit)
+        entries = self.entries
+        if not self.bitmap & bit:
+            entries = entries[:idx] + (leaf,) + entries[idx:]
+            return _Node(self.bitmap | bit, entries), True
+
+        e = entries[idx]
+        if isinstance(e, tuple):
+            if e[0] == leaf[0] and e[1] == leaf[1]:
+                # keep the position of the key
+                new, added = (leaf[0], leaf[1], leaf[2], e[3]), False
+            else:
+                new, added = _pair(shift + _BITS, e, leaf), True
+        else:
+            new, added = e.assoc(shift + _BITS, leaf)
+        return _Node(self.bitmap, entries[:idx] + (new,) + entries[idx + 1:]), added
+
+    def dissoc(self, shift, h, key):
+        """The node without a key, None if it becomes empty"""
+        bit = 1 << ((h >> shift) & _MASK)
+        idx = self._index(bit)
+        e = self.entries[idx]
+        if isinstance(e, tuple):
+            new = None
+        else:
+            new = e.dissoc(shift + _BITS, h, key)
+        if new is None:
+            if self.bitmap == bit:
+                return None
+            return _Node(self.bitmap & ~bit, self.entries[:idx] + self.entries[idx + 1:])
+        return _Node(self.bitmap, self.entries[:idx] + (new,) + self.entries[idx + 1:])
+
+    def leaves(self):
+        for e in self.entries:
+            if isinstance(e, tuple):
+                yield e
+            else:
+                yield from e.leaves()
+
+
+class _Collision(object):
+    """Leaves whose keys have the same hash"""
+    __slots__ = ('entries',)
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get(self, shift, h, key):
+        for e in self.entries:
+            if e[1] == key:
+                return e
+        return None
+
+    def assoc(self, shift, leaf):
+        for i, e in enumerate(self.entries):
+            if e[1] == leaf[1]:
+                new = (leaf[0], leaf[1], leaf[2], e[3])
+                return _Collision(self.entries[:i] + (new,) + self.entries[i + 1:]), False
+        return _Collision(self.entries + (leaf,)), True
+
+    def dissoc(self, shift, h, key):
+        entries = tuple(e for e in self.entries if e[1] != key)
+        return _Collision(entries) if len(entries) > 0 else None
+
+    def leaves(self):
+        return iter(self.entries)
+
+
+def _pair(shift, a, b):
+    """A node holding two leaves with different keys"""
+    if shift >= _HASH_BITS:
+        return _Collision((a, b))
+    fa = (a[0] >> shift) & _MASK
+    fb = (b[0] >> shift) & _MASK
+    if fa == fb:
+        return _Node(1 << fa, (_pair(shift + _BITS, a, b),))
+    entries = (a, b) if fa < fb else (b, a)
+    return _Node((1 << fa) | (1 << fb), entries)
+
+
+_EMPTY = _Node(0, ())
+# position of every key ever added, so that maps iterate like dicts
+_seqs = itertools.count()
+
+
+class PMap(object):
+    """Immutable hash map (a hash array mapped trie).
+
+    Keys are iterated in the order in which they were first added. The
+    positions of the keys are kept in a list that grows with every added
+    key, and that is rebuilt once removed keys make up most of it.
+    """
+    __slots__ = ('_root', '_len', '_order')
+
+    def __init__(self, items=()):
+        self._root = _EMPTY
+        self._len = 0
+        self._order = PList()
+        for k, v in (items.items() if hasattr(items, 'items') else items):
+            seq = next(_seqs)
+            self._root, added = self._root.assoc(0, (_hash(k), k, v, seq))
+            if added:
+                self._len += 1
+                self._order = self._order.append(seq)
+
+    def set(self, key, value):
+        """A map where key is mapped to value"""
+        seq = next(_seqs)
+        root, added = self._root.assoc(0, (_hash(key), key, value, seq))
+        res = PMap.__new__(PMap)
+        res._root, res._len = root, self._len + added
+        res._order = self._order.append(seq) if added else self._order
+        return res
+
+    def remove(self, key):
+        """A map without key"""
+        if key not in self:
+            raise KeyError(key)
+        res = PMap.__new__(PMap)
+        res._root = self._root.dissoc(0, _hash(key), key) or _EMPTY
+        res._len = self._len - 1
+        res._order = self._order
+        if len(res._order) > 2 * res._len + 8:
+            res._order = PList(sorted(e[3] for e in res._root.leaves()))
+        return res
+
+    def _leaf(self, key):
+        return self._root.get(0, _hash(key), key)
+
+    def __getitem__(self, key):
+        leaf = self._leaf(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf[2]
+
+    def __contains__(self, key):
+        return self._leaf(key) is not None
+
+    def __len__(self):
+        return self._len
+
+    def items(self):
+        leaves = {e[3]: e for e in self._root.leaves()}
+        # keys that were removed, or removed and added again later, have
+        # no leaf at their old position
+        return [(e[1], e[2]) for e in map(leaves.get, self._order) if e is not None]
+
+    def __iter__(self):
+        return iter([k for k, _ in self.items()])
+
+
+class PDict(MutableMapping):
+    """A dict backed by a PMap.
+
+    Updates replace the map in place, and copy shares the map, so copying
+    takes constant time no matter how big the dict is.
+    """
+
+    def __init__(self, items=()):
+        if isinstance(items, PDict):
+            self._map = items._map
+        elif isinstance(items, PMap):
+            self._map = items
+        else:
+            self._map = PMap(items)
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __setitem__(self, key, value):
+        self._map = self._map.set(key, value)
+
+    def __delitem__(self, key):
+        self._map = self._map.remove(key)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self):
+        return len(self._map)
+
+    def items(self):
+        return self._map.items()
+
+    def copy(self):
+        return self.__class__(self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,235 @@
+"""
+Bulk replay of the inputs that wlang.exe generates.
+
+The results of an exploration are saved to a directory of NumPy .npy
+files, one int64 column per input and per variable of the final states:
+
+- ``inputs.npy`` holds the inputs of every path, named as in wlang.fuzz.
+- ``outputs.npy`` holds the final values of the variables that every
+  final state defines.
+- ``status.npy`` holds the outcome reported for every path.
+- ``columns.json`` names the columns of the two tables.
+
+The tables are stored column by column (Fortran order). The files are
+written and memory-mapped with the standard library alone, and
+numpy.load(..., mmap_mode='r') reads them as well.
+
+Replaying runs every row through the concrete interpreter. It checks
+that the run ends the way it was reported, with the same final values,
+and measures the branch coverage of all the runs together.
+"""
+import array
+from ast import literal_eval
+import json
+import mmap
+import os
+import struct
+import sys
+
+from . import ast, coverage, fuzz
+
+# outcomes of a path
+VALID = 0
+ERROR = 1
+INFEASIBLE = 2
+
+_STATUS_NAMES = {VALID: 'valid', ERROR: 'error', INFEASIBLE: 'infeasible'}
+_MAGIC = b'\x93NUMPY\x01\x00'
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+
+def _write_npy(path, columns, rows, matrix=True):
+    """Write int64 columns of the given number of rows as an .npy array,
+       a vector if matrix is False"""
+    shape = '(%d, %d)' % (rows, len(columns)) if matrix else '(%d,)' % rows
+    header = "{'descr': '<i8', 'fortran_order': True, 'shape': %s, }" % shape
+    # the data starts at a multiple of 64 bytes, as numpy expects
+    pad = -(len(_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * pad + '\n').encode('latin1')
+    with open(path, 'wb') as f:
+        f.write(_MAGIC + struct.pack('<H', len(header)) + header)
+        for col in columns:
+            for v in col:
+                if not _INT64[0] <= v <= _INT64[1]:
+                    raise ValueError('value does not fit in 64 bits: %d' % v)
+            data = array.array('q', col)
+            if sys.byteorder == 'big':
+                data.byteswap()
+            f.write(data.tobytes())
+
+
+def _read_npy(path):
+    """Memory-map an int64 .npy array written by _write_npy. Return its
+       data, column after column, and its shape"""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(_MAGIC)] != _MAGIC:
+        raise ValueError('not a version 1.0 .npy file: ' + path)
+    size = struct.unpack('<H', mm[8:10])[0]
+    header = literal_eval(mm[10:10 + size].decode('latin1'))
+    shape = header['shape']
+    if header['descr'] != '<i8' or (len(shape) > 1 and not header['fortran_order']):
+        raise ValueError('not an int64 array in column order: ' + path)
+    n = 1
+    for d in shape:
+        n *= d
+    data = memoryview(mm)[10 + size:10 + size + 8 * n].cast('q')
+    if sys.byteorder == 'big':
+        data = array.array('q', data)
+        data.byteswap()
+    return data, shape
+
+
+class Tests(object):
+    """Saved inputs and the outcomes reported for them, by column"""
+
+    def __init__(self, inputs, outputs, input_data, output_data, status):
+        # names of the input and output columns
+        self.inputs = inputs
+        self.outputs = outputs
+        self._input_data = input_data
+        self._output_data = output_data
+        # outcome of every row, see VALID, ERROR and INFEASIBLE
+        self.status = status
+
+    def __len__(self):
+        return len(self.status)
+
+    def _column(self, data, names, name):
+        n = len(self)
+        i = names.index(name)
+        return data[i * n:(i + 1) * n]
+
+    def input(self, name):
+        """The column of an input"""
+        return self._column(self._input_data, self.inputs, name)
+
+    def output(self, name):
+        """The column of the final values of a variable"""
+        return self._column(self._output_data, self.outputs, name)
+
+    def row(self, i):
+        """The inputs and the final values of a row, as dicts"""
+        n = len(self)
+        ins = {name: self._input_data[j * n + i] for j, name in enumerate(self.inputs)}
+        outs = {name: self._output_data[j * n + i] for j, name in enumerate(self.outputs)}
+        return ins, outs
+
+
+def _status(res):
+    if res.is_infeasible():
+        return INFEASIBLE
+    return VALID if res.is_valid() else ERROR
+
+
+def save(path, results):
+    """Save the exe.ExeResults that have inputs to a directory. Return the
+       number of rows saved"""
+    rows = [r for r in results if r.inputs is not None]
+    inputs = []
+    for r in rows:
+        for name in r.inputs:
+            if name not in inputs:
+                inputs.append(name)
+    outputs = []
+    if len(rows) > 0:
+        outputs = [v for v in rows[0].con_state.env
+                   if all(v in r.con_state.env for r in rows)]
+
+    os.makedirs(path, exist_ok=True)
+    _write_npy(os.path.join(path, 'inputs.npy'),
+               [[r.inputs.get(name, 0) for r in rows] for name in inputs], len(rows))
+    _write_npy(os.path.join(path, 'outputs.npy'),
+               [[r.con_state.env[v] for r in rows] for v in outputs], len(rows))
+    _write_npy(os.path.join(path, 'status.npy'),
+               [[_status(r) for r in rows]], len(rows), matrix=False)
+    with open(os.path.join(path, 'columns.json'), 'w') as f:
+        json.dump({'inputs': inputs, 'outputs': outputs}, f)
+    return len(rows)
+
+
+def load(path):
+    """Memory-map the tests saved in a directory"""
+    with open(os.path.join(path, 'columns.json')) as f:
+        columns = json.load(f)
+    input_data, _ = _read_npy(os.path.join(path, 'inputs.npy'))
+    output_data, _ = _read_npy(os.path.join(path, 'outputs.npy'))
+    status, _ = _read_npy(os.path.join(path, 'status.npy'))
+    return Tests(columns['inputs'], columns['outputs'], input_data, output_data, status)
+
+
+class Report(object):
+    """The outcome of replaying saved tests"""
+
+    def __init__(self, prg):
+        self.rows = 0
+        # (row, what differs) for every row that does not replay as reported
+        self.mismatches = []
+        self.coverage = coverage.Coverage(prg)
+
+    def is_valid(self):
+        return len(self.mismatches) == 0
+
+    def __str__(self):
+        return '%d of %d rows replayed as reported, %s' % (
+            self.rows - len(self.mismatches), self.rows, self.coverage)
+
+
+def _check(run, status, outs):
+    """What differs between a run and the outcome reported for it, None
+       if nothing does"""
+    if run.stop == 'steps':
+        return 'the run did not end within the step limit'
+    if status == INFEASIBLE:
+        return None if run.stop == 'assume' else 'expected an assumption to fail'
+    if run.stop == 'assume' or run.is_error() != (status == ERROR):
+        got = 'the run ended by ' + run.stop if run.stop is not None else 'the run ended'
+        return 'expected %s, %s' % (_STATUS_NAMES[status], got)
+    for name, val in outs.items():
+        if run.env.get(name) != val:
+            return 'expected %s = %d, got %s' % (name, val, run.env.get(name))
+    return None
+
+
+def replay(prg, tests, steps=10000):
+    """Run a program on every row of saved tests and check the outcomes"""
+    tracer = fuzz.Tracer(steps)
+    report = Report(prg)
+    for i in range(len(tests)):
+        ins, outs = tests.row(i)
+        run = tracer.trace(prg, ins, lambda: 0)
+        report.rows += 1
+        for node, taken in run.path:
+            report.coverage.hit(node, taken)
+        problem = _check(run, tests.status[i], outs)
+        if problem is not None:
+            report.mismatches.append((i, problem))
+    return report
+
+
+def _parse_args():
+    import argparse
+    ap = argparse.ArgumentParser(prog='replay',
+                                 description='Replay saved WLang tests')
+    ap.add_argument('in_file', metavar='FILE',
+                    help='WLang program the tests were generated for')
+    ap.add_argument('tests', metavar='DIR',
+                    help='Directory the tests were saved to')
+    ap.add_argument('--steps', metavar='N', type=int, default=10000,
+                    help='End a run after N loop iterations')
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    args = _parse_args()
+    prg = ast.parse_file(args.in_file)
+    report = replay(prg, load(args.tests), args.steps)
+    for row, problem in report.mismatches:
+        print('[replay]: row %d: %s' % (row, problem))
+    print('[replay]:', report)
+    return 0 if report.is_valid() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Simplifying smart constructors for z3 terms.
+
+Every constructor folds concrete sub-terms in Python, flattens nested
+n-ary operators and drops identity elements, so the terms that end up in
+path conditions and environments are as small as possible.
+"""
+import z3
+
+
+def _is_int(t):
+    return z3.is_int_value(t)
+
+
+def _int(v, ctx):
+    return z3.IntVal(v, ctx)
+
+
+def _bool(v, ctx):
+    return z3.BoolVal(v, ctx)
+
+
+def div(a, b):
+    """Integer division with z3 (Euclidean) semantics on Python ints.
+       Raises ZeroDivisionError if b is 0, where z3 leaves the result open"""
+    if b > 0:
+        return a // b
+    return -(a // -b)
+
+
+def mk_add(*args):
+    ctx = args[0].ctx
+    const = 0
+    kids = []
+    for a in args:
+        for k in (a.children() if z3.is_add(a) else [a]):
+            if _is_int(k):
+                const += k.as_long()
+            else:
+                kids.append(k)
+
+    if const != 0 or len(kids) == 0:
+        kids.append(_int(const, ctx))
+    if len(kids) == 1:
+        return kids[0]
+    return z3.Sum(*kids)
+
+
+def mk_sub(a, b):
+    if _is_int(a) and _is_int(b):
+        return _int(a.as_long() - b.as_long(), a.ctx)
+    if _is_int(b) and b.as_long() == 0:
+        return a
+    if a.eq(b):
+        return _int(0, a.ctx)
+    return a - b
+
+
+def mk_mul(*args):
+    ctx = args[0].ctx
+    const = 1
+    kids = []
+    for a in args:
+        for k in (a.children() if z3.is_mul(a) else [a]):
+            if _is_int(k):
+                const *= k.as_long()
+            else:
+                kids.append(k)
+
+    if const == 0:
+        return _int(0, ctx)
+    if const != 1 or len(kids) == 0:
+        kids.insert(0, _int(const, ctx))
+    if len(kids) == 1:
+        return kids[0]
+    return z3.Product(*kids)
+
+
+def mk_div(a, b):
+    if _is_int(b):
+        d = b.as_long()
+        if d == 1:
+            return a
+        # division by zero is left uninterpreted, exactly as z3 does
+        if d != 0 and _is_int(a):
+            return _int(div(a.as_long(), d), a.ctx)
+    return a / b
+
+
+_REL = {
+    "<=": lambda x, y: x <= y,
+    "<": lambda x, y: x < y,
+    "=": lambda x, y: x == y,
+    ">=": lambda x, y: x >= y,
+    ">": lambda x, y: x > y,
+}
+
+
+def mk_rel(op, a, b):
+    fn = _REL[op]
+    if _is_int(a) and _is_int(b):
+        return _bool(fn(a.as_long(), b.as_long()), a.ctx)
+    if a.eq(b):
+        return _bool(op in ("<=", "=", ">="), a.ctx)
+    return fn(a, b)
+
+
+def mk_not(a):
+    if z3.is_true(a):
+        return _bool(False, a.ctx)
+    if z3.is_false(a):
+        return _bool(True, a.ctx)
+    if z3.is_not(a):
+        return a.arg(0)
+    return z3.Not(a)
+
+
+def _mk_nary(args, flatten, unit, zero, fn):
+    ctx = args[0].ctx
+    kids = []
+    seen = set()
+    for a in args:
+        todo = a.children() if flatten(a) else [a]
+        for k in todo:
+            if unit(k):
+                continue
+            if zero(k):
+                return k
+            if k.get_id() not in seen:
+                seen.add(k.get_id())
+                kids.append(k)
+
+    if len(kids) == 0:
+        return _bool(unit is z3.is_true, ctx)
+    if len(kids) == 1:
+        return kids[0]
+    return fn(*kids)
+
+
+def mk_and(*args):
+    return _mk_nary(args, z3.is_and, z3.is_true, z3.is_false, z3.And)
+
+
+def mk_or(*args):
+    return _mk_nary(args, z3.is_or, z3.is_false, z3.is_true, z3.Or)
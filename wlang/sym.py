@@ -20,33 +20,112 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-from functools import reduce
+import builtins
 import sys
 
 import io 
 import z3
 
-from . import ast, int
+from . import ast, int, interval, parallel, persistent, util, worklist
+from . import budget as budget_
+from . import simplify as smp
+
+# number of memoized terms above which the memo table is cleared once a
+# path is done
+_MEMO_LIMIT = 4096
 
 
 class SymState(object):
-    def __init__(self, solver=None):
+    def __init__(self, solver=None, compact=None, ctx=None):
         # environment mapping variables to symbolic constants
-        self.env = dict()
-        # path condition
-        self.path = list()
+        self.env = persistent.PDict()
+        # path condition, shared with the states this one was forked from
+        self._path = persistent.PList()
+        # solver for the path condition, created when first needed
         self._solver = solver
-        if self._solver is None:
-            self._solver = z3.Solver()
+        self._ctx = solver.ctx if solver is not None else ctx
+        if self._ctx is None:
+            self._ctx = z3.main_ctx()
+        # result of the last check of the path condition and its model,
+        # None until the path is checked again after it changes
+        self._result = None
+        self._model = None
 
         # true if this is an error state
         self._is_error = False
+        # index of the successor taken at every fork so far
+        self.branches = ()
+        # budget that solver queries are accounted to, if any
+        self.budget = None
+
+        # compact the path condition once it grows beyond this many
+        # constraints (None disables compaction)
+        self._compact = compact
+        self._compact_at = compact
+
+    @property
+    def ctx(self):
+        """The z3 context of every term of the state"""
+        return self._ctx
+
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        if not isinstance(path, persistent.PList):
+            path = persistent.PList(path)
+        self._path = path
+        self._solver = None
+        self._result = None
+        self._model = None
+
+    @property
+    def solver(self):
+        """The solver of the path condition"""
+        if self._solver is None:
+            self._solver = z3.Solver(ctx=self._ctx)
+            self._solver.append(list(self._path))
+            self._solver.push()
+        return self._solver
+
+    @property
+    def env(self):
+        return self._env
+
+    @env.setter
+    def env(self, env):
+        if not isinstance(env, persistent.PDict):
+            env = persistent.PDict(env)
+        self._env = env
 
     def add_pc(self, *exp):
         """Add constraints to the path condition"""
-        self.path.extend(exp)
-        self._solver.append(exp)
-        self._solver.push()
+        self._path = self._path.extend(exp)
+        self._result = None
+        self._model = None
+        if self._solver is not None:
+            self._solver.append(exp)
+            self._solver.push()
+
+        if self._compact_at is not None and len(self.path) > self._compact_at:
+            self.compact()
+
+    def compact(self):
+        """Remove redundant constraints from the path condition and
+           rebuild the solver from what is left"""
+        path = _compact_bounds(list(self.path))
+        if len(path) > self._compact:
+            goal = z3.Goal(ctx=self.ctx)
+            goal.add(*path)
+            res = z3.Tactic('ctx-solver-simplify', ctx=self.ctx)(goal)
+            path = list(res[0]) if len(res) == 1 else [z3.And(*res[0])]
+
+        # the solver is rebuilt from the new path when needed
+        self.path = path
+        # do not compact again before the path doubles
+        self._compact_at = max(self._compact, 2 * len(path))
 
     def is_error(self):
         return self._is_error
@@ -54,18 +133,45 @@ class SymState(object):
     def mk_error(self):
         self._is_error = True
 
+    def _query(self):
+        if self.budget is None:
+            return self.solver.check()
+        return self.budget.check(self.solver)
+
+    def _check(self):
+        """Check the path condition, unless it has not changed since the
+           last check"""
+        if self._result is None:
+            self._result = self._query()
+            self._model = self.solver.model() if self._result == z3.sat else None
+        return self._result
+
+    def model(self):
+        """A model of the path condition, None if there is none"""
+        self._check()
+        return self._model
+
     def is_empty(self):
-        """Check whether the current symbolic state has any concrete states"""
-        res = self._solver.check()
+        """Check whether the current symbolic state has any concrete states.
+           A state the solver gives up on counts as empty"""
+        res = self._check()
+        return res != z3.sat
+
+    def implies(self, exp):
+        """Check whether the path condition implies an expression"""
+        solver = self.solver
+        solver.push()
+        solver.add(smp.mk_not(exp))
+        res = self._query()
+        solver.pop()
         return res == z3.unsat
 
     def pick_concerete(self):
         """Pick a concrete state consistent with the symbolic state.
            Return None if no such state exists"""
-        res = self._solver.check()
-        if res != z3.sat:
+        model = self.model()
+        if model is None:
             return None
-        model = self._solver.model()
         st = int.State()
         for (k, v) in self.env.items():
             st.env[k] = model.eval(v, model_completion=True)
@@ -73,9 +179,16 @@ class SymState(object):
 
     def fork(self):
         """Fork the current state into two identical states that can evolve separately"""
-        child = SymState()
-        child.env = dict(self.env)
-        child.add_pc(*self.path)
+        child = SymState(compact=self._compact, ctx=self.ctx)
+        # the env and the path are shared until either state changes them
+        child.env = self.env.copy()
+        child._path = self._path
+        # the path is the same, so the last check holds for both
+        child._result = self._result
+        child._model = self._model
+        child._compact_at = self._compact_at
+        child.branches = self.branches
+        child.budget = self.budget
 
         return (self, child)
 
@@ -83,212 +196,788 @@ class SymState(object):
         return str(self)
 
     def __str__(self):
-        buf = io.StringIO()
-        for k, v in self.env.items():
-            buf.write(str(k))
-            buf.write(': ')
-            buf.write(str(v))
-            buf.write('\n')
-        buf.write('pc: ')
-        buf.write(str(self.path))
+        return _state_str(self.env, self.path)
+
+
+def _state_str(env, path):
+    buf = io.StringIO()
+    for k, v in env.items():
+        buf.write(str(k))
+        buf.write(': ')
+        buf.write(str(v))
         buf.write('\n')
+    buf.write('pc: ')
+    buf.write(str(list(path)))
+    buf.write('\n')
 
-        return buf.getvalue()
+    return buf.getvalue()
 
 
-class SymExec(ast.AstVisitor):
+class SymResult(object):
+    """A terminated symbolic state.
+
+    Keeps the environment, the path condition and, optionally, a
+    witness, but not the solver of the state. Queries on the result
+    use a temporary solver.
+    """
+    __slots__ = ('env', 'path', 'branches', 'witness', 'ctx', '_is_error')
+
+    def __init__(self, state, witness=False):
+        self.env = state.env.copy()
+        self.path = state.path
+        self.branches = state.branches
+        self.ctx = state.ctx
+        self._is_error = state.is_error()
+        # concrete state consistent with the path, if asked for
+        self.witness = state.pick_concerete() if witness else None
+
+    def is_error(self):
+        return self._is_error
+
+    def _temp_solver(self):
+        solver = z3.Solver(ctx=self.ctx)
+        solver.append(list(self.path))
+        return solver
+
+    def is_empty(self):
+        return self._temp_solver().check() != z3.sat
+
+    def pick_concerete(self):
+        if self.witness is not None:
+            return self.witness
+        st = SymState(solver=self._temp_solver())
+        st.env = self.env
+        return st.pick_concerete()
+
+    def size(self):
+        """Bytes taken by the result, not counting the terms, the env and
+           the path condition it shares with other states"""
+        res = sys.getsizeof(self) + sys.getsizeof(self.env)
+        res += sys.getsizeof(self.path) + sys.getsizeof(self.branches)
+        if self.witness is not None:
+            res += sys.getsizeof(self.witness.env)
+        return res
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return _state_str(self.env, self.path)
+
+
+def _as_bound(exp):
+    """Decompose a comparison of a term against a constant into
+       (term, lower, upper) with inclusive bounds on the term.
+       Return None for any other constraint"""
+    neg = False
+    if z3.is_not(exp):
+        neg = True
+        exp = exp.arg(0)
+
+    kinds = {z3.Z3_OP_LT: '<', z3.Z3_OP_LE: '<=',
+             z3.Z3_OP_GT: '>', z3.Z3_OP_GE: '>='}
+    if not z3.is_app(exp) or exp.decl().kind() not in kinds:
+        return None
+    op = kinds[exp.decl().kind()]
+    lhs, rhs = exp.arg(0), exp.arg(1)
+
+    if z3.is_int_value(lhs) and not z3.is_int_value(rhs):
+        lhs, rhs = rhs, lhs
+        op = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}[op]
+    elif not z3.is_int_value(rhs) or z3.is_int_value(lhs):
+        return None
+    if neg:
+        op = {'<': '>=', '<=': '>', '>': '<=', '>=': '<'}[op]
+
+    # move a constant offset of the term to the bound, i.e., x + 1 < c
+    # is the bound x < c - 1
+    c = rhs.as_long()
+    if z3.is_add(lhs):
+        offset = [k.as_long() for k in lhs.children() if z3.is_int_value(k)]
+        rest = [k for k in lhs.children() if not z3.is_int_value(k)]
+        if len(rest) == 0:
+            return None
+        c = c - sum(offset)
+        lhs = rest[0] if len(rest) == 1 else z3.Sum(*rest)
+
+    if op == '<':
+        return (lhs, None, c - 1)
+    if op == '<=':
+        return (lhs, None, c)
+    if op == '>':
+        return (lhs, c + 1, None)
+    return (lhs, c, None)
+
+
+def _compact_bounds(path):
+    """Drop trivial, duplicate and subsumed constant bounds from a path condition"""
+    seen = set()
+    lower = dict()
+    upper = dict()
+    bounds = dict()
+    for i, exp in enumerate(path):
+        if z3.is_true(exp) or exp.get_id() in seen:
+            continue
+        seen.add(exp.get_id())
+
+        bnd = _as_bound(exp)
+        if bnd is None:
+            continue
+        bounds[i] = bnd
+        key = bnd[0].get_id()
+        if bnd[1] is not None and (key not in lower or bnd[1] > bounds[lower[key]][1]):
+            lower[key] = i
+        if bnd[2] is not None and (key not in upper or bnd[2] < bounds[upper[key]][2]):
+            upper[key] = i
+
+    keep = set(lower.values()) | set(upper.values())
+    res = []
+    seen = set()
+    for i, exp in enumerate(path):
+        if z3.is_true(exp) or exp.get_id() in seen:
+            continue
+        seen.add(exp.get_id())
+        if i in bounds and i not in keep:
+            continue
+        res.append(exp)
+    return res
+
+
+def _exp_vars(exp, res):
+    """Collect the names of all variables of an expression"""
+    if isinstance(exp, ast.IntVar):
+        res.add(exp.name)
+    elif isinstance(exp, ast.Exp):
+        for a in exp.args:
+            _exp_vars(a, res)
+    return res
+
+
+def _merge(a, b):
+    """Merge two symbolic states at the same program point into one"""
+    common = a.path.common(b.path)
+    da = a.path.since(common)
+    db = b.path.since(common)
+    ca = smp.mk_and(*da) if len(da) > 0 else z3.BoolVal(True, a.ctx)
+    cb = smp.mk_and(*db) if len(db) > 0 else z3.BoolVal(True, a.ctx)
+
+    res = SymState(compact=a._compact, ctx=a.ctx)
+    res.budget = a.budget
+    # both states define the same variables, see SymExec._merge_states
+    for k in a.env.keys():
+        va = a.env[k]
+        vb = b.env[k]
+        if va.eq(vb):
+            res.env[k] = va
+        else:
+            res.env[k] = z3.If(ca, va, vb)
+
+    res.path = common
+    # the branches of an if-then-else cover everything
+    if not smp.mk_not(ca).eq(cb):
+        res.add_pc(smp.mk_or(ca, cb))
+    return res
+
+
+class VisitedStates(object):
+    """Symbolic states seen at program points, used to prune repeated ones.
+
+    A state is subsumed by one seen before at the same point if both have
+    the same env, its path condition implies the other one, and the other
+    one had at least as many loop iterations left. The rank of a state
+    lists the iteration of every enclosing loop, innermost first. States
+    are indexed by a hash of their env, so only states with equal envs
+    are ever compared. Engines that keep part of a state outside of the
+    symbolic env pass it as extra, and only states with equal extras are
+    compared as well.
+    """
+
     def __init__(self):
-        pass
+        self._seen = dict()
+        # number of states pruned so far
+        self.pruned = 0
+
+    def visit(self, point, rank, state, extra=()):
+        """Record a state at a program point. Return False if it is subsumed"""
+        env = tuple(sorted((k, v.get_id()) for k, v in state.env.items()))
+        seen = self._seen.setdefault((id(point), state.is_error(), env, extra), [])
+        ids = frozenset(c.get_id() for c in state.path)
+        for (r, other_ids, other_path) in seen:
+            if not all(a <= b for a, b in zip(r, rank)):
+                continue
+            # a path with all the constraints of the other one implies it
+            if other_ids <= ids or state.implies(smp.mk_and(*other_path)):
+                self.pruned += 1
+                return False
+        seen.append((rank, ids, list(state.path)))
+        return True
+
+
+def _loop_depths(kont):
+    """The iterations of the loops a continuation is in, innermost first"""
+    res = []
+    while kont is not None:
+        (node, depth), kont = kont
+        if isinstance(node, ast.WhileStmt):
+            res.append(depth)
+    return tuple(res)
+
+
+class SymExec(ast.AstVisitor):
+    def __init__(self, strategy=None, loop_bound=10, merge=False, merge_alpha=0.5,
+                 ctx=None, budget=None, witness=False, prune=False,
+                 summarize=False, accelerate=False, intervals=False,
+                 infer_bounds=False):
+        # z3 context of all terms, the global one if None
+        self.ctx = ctx if ctx is not None else z3.main_ctx()
+        # memo table from (expression id, ids of the terms of the variables
+        # it reads) to z3 term, and the variables of every expression
+        self._memo = dict()
+        self._reads = dict()
+        # search strategy, depth-first if None
+        self.strategy = strategy
+        # default number of times a loop is unrolled
+        self.loop_bound = loop_bound
+        # per-loop unrolling bounds, indexed by the id of the loop
+        self._loop_bounds = dict()
+        # unroll loops as often as an interval analysis finds they can run
+        self.infer_bounds = infer_bounds
+        self.inferred_bounds = dict()
+        # ids of all statements executed so far
+        self.covered = set()
+        # merge states at the end of if-then-else and of loop iterations
+        self.merge = merge
+        # a state is not merged if it differs from another on a variable
+        # that is used by more than this fraction of the remaining queries
+        self.merge_alpha = merge_alpha
+        # cache of the number of queries each statement makes per variable
+        self._queries = dict()
+        # branch prefix to replay before exploring, see wlang.parallel
+        self.prefix = ()
+        # gives a branch prefix away to another worker, or returns False
+        self.donate = None
+        # limits of a run and the summary of the last one
+        self.budget = budget if budget is not None else budget_.Budget()
+        self.summary = None
+        # keep a concrete witness with every final state
+        self.witness = witness
+        # prune states subsumed by ones seen at loop heads and after ifs
+        self.prune = prune
+        self.visited = VisitedStates()
+        # use the invariants of loops instead of unrolling them
+        self.summarize = summarize
+        # run loops that only add constants to variables in one step
+        self.accelerate = accelerate
+        # cache of the increments of every loop, None if it has other effects
+        self._increments = dict()
+        # decide conditions by an interval analysis before using the solver
+        self.intervals = intervals
+        self.facts = None
+
+    def set_loop_bound(self, node, bound):
+        """Set the number of times a given loop is unrolled"""
+        self._loop_bounds[id(node)] = bound
+
+    def get_loop_bound(self, node):
+        """The bound set for a loop, else the inferred one, else the default"""
+        bound = self.inferred_bounds.get(id(node), self.loop_bound)
+        return self._loop_bounds.get(id(node), bound)
+
+    def pc_size(self, state):
+        return len(state.path)
 
     def run(self, ast, state):
-        states = self.visit(ast, state=state)
-        if (len(states) > 0):
-            return states
-        else:
-            return []
+        return list(self.stream(ast, state))
+
+    def stream(self, ast, state):
+        """Yield a SymResult for every final state as soon as its path is done"""
+        self._memo.clear()
+        self._reads.clear()
+        self.covered = set()
+        self.budget.reset()
+        self.summary = None
+        self.visited = VisitedStates()
+        self._analyze(ast)
+        state.budget = self.budget
+        for st in self._iter_exec(ast, state, self.budget):
+            # the solver of the state goes away with it
+            res = SymResult(st, self.witness)
+            self.budget.final(res.size())
+            yield res
+
+    def _analyze(self, prg):
+        """Run the interval analysis of a program if it is used"""
+        analysis = None
+        if self.intervals or self.infer_bounds:
+            analysis = interval.IntervalAnalysis()
+            analysis.check(prg)
+        self.facts = analysis if self.intervals else None
+        self.inferred_bounds = dict()
+        if self.infer_bounds:
+            self.inferred_bounds = interval.loop_bounds(prg, analysis)
+
+    def _exec(self, node, state):
+        """Execute a statement from a given state until every path is done"""
+        return list(self._iter_exec(node, state))
+
+    def _iter_exec(self, node, state, budget=None):
+        paths = 0
+        wl = worklist.Worklist(self, self.strategy)
+        wl.extend([(state, worklist.push(None, node))])
+        while len(wl) > 0:
+            reason = budget.exhausted() if budget is not None else None
+            if reason is not None:
+                pending = wl.drain()
+                # states waiting at join points are unexplored as well
+                joins = {id(j): j for _, k in pending for j in worklist.joins(k)}
+                states = [st for st, _ in pending]
+                for j in joins.values():
+                    states.extend(j.states)
+                # keep the errors found so far
+                errors = [st for st in states if st.is_error()]
+                yield from errors
+                self.summary = budget.summary(reason, paths,
+                                              len(states) - len(errors))
+                return
+
+            st, kont = wl.pop()
+            if kont is None:
+                paths += 1
+                if len(self._memo) > _MEMO_LIMIT:
+                    self._memo.clear()
+                yield st
+                continue
+            (stmt, depth), rest = kont
+            self.covered.add(id(stmt))
+            method = '_step_' + stmt.__class__.__name__
+            base = st.branches
+            succs = getattr(self, method)(stmt, state=st, kont=rest, depth=depth)
+            if len(succs) > 1 and not isinstance(stmt, worklist.Join):
+                for i, (s, _) in enumerate(succs):
+                    s.branches = base + (i,)
+                succs = [succs[i] for i in parallel.split(self, base, len(succs))]
+                if budget is not None:
+                    budget.fork(len(succs))
+            # every successor that is not done is on its way to the same
+            # join points
+            arriving = len([k for _, k in succs if k is not None])
+            if self.merge and arriving != 1 and not isinstance(stmt, worklist.Join):
+                for j in worklist.joins(rest):
+                    j.pending += arriving - 1
+                # a dead state may have been the last one a join waited for
+                for j in worklist.joins(rest):
+                    if j.pending == 0 and len(j.states) > 0:
+                        succs.extend(self._release(j))
+            wl.extend(succs)
+
+        if budget is not None:
+            self.summary = budget.summary(None, paths, 0)
 
     def visit_IntVar(self, node, *args, **kwargs):
         return kwargs['state'].env[node.name]
 
     def visit_BoolConst(self, node, *args, **kwargs):
-        return z3.BoolVal(node.val)
+        return z3.BoolVal(node.val, self.ctx)
 
     def visit_IntConst(self, node, *args, **kwargs):
-        return z3.IntVal(node.val)
+        return z3.IntVal(node.val, self.ctx)
+
+    def _memo_key(self, node, state):
+        names = self._reads.get(id(node))
+        if names is None:
+            names = self._reads[id(node)] = tuple(sorted(_exp_vars(node, set())))
+        env = state.env
+        return (id(node),) + tuple(env[n].get_id() for n in names)
+
+    def _memoize(self, key, term):
+        if key is not None:
+            self._memo[key] = term
+        return term
 
     def visit_RelExp(self, node, *args, **kwargs):
+        key = self._memo_key(node, kwargs['state'])
+        if key in self._memo:
+            return self._memo[key]
+
         lhs = self.visit(node.arg(0), *args, **kwargs)
         rhs = self.visit(node.arg(1), *args, **kwargs)
-        if node.op == "<=":
-            return lhs <= rhs
-        if node.op == "<":
-            return lhs < rhs
-        if node.op == "=":
-            return lhs == rhs
-        if node.op == ">=":
-            return lhs >= rhs
-        if node.op == ">":
-            return lhs > rhs
+        return self._memoize(key, smp.mk_rel(node.op, lhs, rhs))
 
     def visit_BExp(self, node, *args, **kwargs):
+        key = self._memo_key(node, kwargs['state'])
+        if key in self._memo:
+            return self._memo[key]
+
         kids = [self.visit(a, *args, **kwargs) for a in node.args]
 
         if node.op == "not":
             assert node.is_unary()
             assert len(kids) == 1
-            return z3.Not(kids[0])
+            return self._memoize(key, smp.mk_not(kids[0]))
 
         fn = None
-        base = None
         if node.op == "and":
-            fn = lambda x, y: z3.And(x,y)
-            base = z3.BoolVal(True)
+            fn = smp.mk_and
         elif node.op == "or":
-            fn = lambda x, y: z3.Or(x,y)
-            base = z3.BoolVal(False)
+            fn = smp.mk_or
 
         assert fn is not None
-        return reduce(fn, kids, base)
+        return self._memoize(key, fn(*kids))
 
     def visit_AExp(self, node, *args, **kwargs):
+        key = self._memo_key(node, kwargs['state'])
+        if key in self._memo:
+            return self._memo[key]
+
         kids = [self.visit(a, *args, **kwargs) for a in node.args]
 
         fn = None
 
         if node.op == "+":
-            fn = lambda x, y: x + y
+            fn = smp.mk_add
 
         elif node.op == "-":
-            fn = lambda x, y: x - y
+            fn = smp.mk_sub
 
         elif node.op == "*":
-            fn = lambda x, y: x * y
+            fn = smp.mk_mul
 
         elif node.op == "/":
-            fn = lambda x, y: x / y
+            fn = smp.mk_div
 
         assert fn is not None
-        return reduce(fn, kids)
+        return self._memoize(key, fn(*kids))
+
+    def visit_Stmt(self, node, *args, **kwargs):
+        return self._exec(node, kwargs["state"])
+
+    def visit_StmtList(self, node, *args, **kwargs):
+        return self._exec(node, kwargs["state"])
+
+    def _join(self, kont, node, pending):
+        """Add a join point for the given number of states to a continuation"""
+        if not self.merge:
+            return kont
+        return worklist.push(kont, worklist.Join(node, pending))
+
+    def _count_queries(self, node):
+        """Estimate the number of solver queries a statement makes on each
+           variable. The total is stored under None"""
+        if id(node) in self._queries:
+            return self._queries[id(node)]
+
+        res = dict()
+
+        def add(counts, times=1):
+            for k, v in counts.items():
+                res[k] = res.get(k, 0) + v * times
+
+        def add_cond(exp):
+            add({v: 1 for v in _exp_vars(exp, set())})
+            add({None: 1})
+
+        if isinstance(node, ast.StmtList):
+            for s in node.stmts:
+                add(self._count_queries(s))
+        elif isinstance(node, ast.IfStmt):
+            add_cond(node.cond)
+            add(self._count_queries(node.then_stmt))
+            if node.has_else():
+                add(self._count_queries(node.else_stmt))
+        elif isinstance(node, ast.WhileStmt):
+            add_cond(node.cond)
+            add(self._count_queries(node.body))
+            res = {k: v * (self.get_loop_bound(node) + 1) for k, v in res.items()}
+        elif isinstance(node, (ast.AssertStmt, ast.AssumeStmt)):
+            add_cond(node.cond)
+
+        self._queries[id(node)] = res
+        return res
+
+    def _merge_states(self, states, kont):
+        """Merge states at a join point whenever the merge does not make
+           the remaining queries harder"""
+        hot = dict()
+        while kont is not None:
+            (node, _), kont = kont
+            for k, v in self._count_queries(node).items():
+                hot[k] = hot.get(k, 0) + v
+        limit = self.merge_alpha * hot.get(None, 0)
+
+        res = []
+        for st in states:
+            for i, other in enumerate(res):
+                if st.is_error() or other.is_error():
+                    continue
+                # a variable that only one of the states defines has no
+                # value on the paths of the other one
+                if set(st.env.keys()) != set(other.env.keys()):
+                    continue
+                diff = [k for k in st.env.keys()
+                        if k not in other.env or not st.env[k].eq(other.env[k])]
+                if all(hot.get(k, 0) <= limit for k in diff):
+                    res[i] = _merge(other, st)
+                    break
+            else:
+                res.append(st)
+        return res
+
+    def _release(self, join):
+        """Merge the states collected at a join point and continue them"""
+        states = self._merge_states(join.states, join.kont)
+        # the collected states still count at the enclosing join points
+        for j in worklist.joins(join.kont):
+            j.pending += len(states) - len(join.states)
+        join.states = list()
+        return [(st, join.kont) for st in states]
+
+    def _step_Join(self, node, *args, **kwargs):
+        node.kont = kwargs["kont"]
+        node.states.append(kwargs["state"])
+        node.pending -= 1
+        if node.pending > 0:
+            # wait for the remaining states
+            return []
+        return self._release(node)
 
-    def visit_SkipStmt(self, node, *args, **kwargs):
-        return [kwargs["state"]]
+    def _step_SkipStmt(self, node, *args, **kwargs):
+        return [(kwargs["state"], kwargs["kont"])]
 
-    def visit_PrintStateStmt(self, node, *args, **kwargs):
-        return [kwargs["state"]]
+    def _step_PrintStateStmt(self, node, *args, **kwargs):
+        return [(kwargs["state"], kwargs["kont"])]
 
-    def visit_AsgnStmt(self, node, *args, **kwargs):
+    def _step_AsgnStmt(self, node, *args, **kwargs):
         st = kwargs["state"]
         rhs = self.visit(node.rhs, *args, **kwargs)
         st.env[node.lhs.name] = rhs
-        return [st]
-
-    def visit_IfStmt(self, node, *args, **kwargs):
+        return [(st, kwargs["kont"])]
+
+    def _is_feasible(self, node, state, taken):
+        """Check whether a state, with the condition of a statement added
+           to its path, can take the branch where the condition is taken.
+           The interval analysis is asked before the solver"""
+        decided = self.facts.decide(node) if self.facts is not None else None
+        if decided is not None:
+            return decided == taken
+        return not state.is_empty()
+
+    def _step_IfStmt(self, node, *args, **kwargs):
         cond = self.visit(node.cond, *args, **kwargs)
 
         st: SymState = kwargs["state"]
+        kont = kwargs["kont"]
         then_st, else_st = st.fork()
 
         then_st.add_pc(cond)
-        else_st.add_pc(z3.Not(cond))
+        else_st.add_pc(smp.mk_not(cond))
+
+        succs = []
 
-        states = []
+        if self._is_feasible(node, then_st, True):
+            succs.append((then_st, node.then_stmt))
 
-        if not then_st.is_empty():
-            then_states = self.visit(node.then_stmt, state=then_st)
-            states.extend(then_states)
+        if self._is_feasible(node, else_st, False):
+            succs.append((else_st, node.else_stmt))
 
-        if not else_st.is_empty():
-            else_states = [else_st]
-            if node.has_else() :
-                else_states = self.visit(node.else_stmt, state=else_st)
-            states.extend(else_states)
+        if len(succs) > 1:
+            if self.prune:
+                kont = worklist.push(kont, worklist.Visit(node))
+            kont = self._join(kont, node, len(succs))
+        return [(st, kont if stmt is None else worklist.push(kont, stmt))
+                for st, stmt in succs]
 
-        return states
-    
-    def visit_WhileStmt(self, node, *args, **kwargs):
-        depth = kwargs.get('depth', 0)
+    def _step_Visit(self, node, *args, **kwargs):
+        st = kwargs["state"]
+        kont = kwargs["kont"]
+        if not self.visited.visit(node.node, _loop_depths(kont), st):
+            return []
+        return [(st, kont)]
+
+    def _step_WhileStmt(self, node, *args, **kwargs):
+        depth = kwargs["depth"]
 
         st: SymState = kwargs["state"]
-        init_states = [st]
-        
-        # Run loop
-        states = []
+        kont = kwargs["kont"]
+        if self.prune:
+            rank = (depth,) + _loop_depths(kont)
+            if not self.visited.visit(node, rank, st):
+                return []
+        if self.accelerate and self._get_increments(node, st) is not None:
+            return self._accelerate(node, st, kont)
+        if self.summarize and node.inv is not None:
+            return self._summarize(node, st, kont)
+        cond = self.visit(node.cond, *args, state=st)
+
+        true_st, false_st = st.fork()
+
+        true_st.add_pc(cond)
+        false_st.add_pc(smp.mk_not(cond))
+
+        succs = []
 
-        for s in init_states:
-            cond = self.visit(node.cond, *args, state=s)
-            
-            true_st, false_st = s.fork()
+        if self._is_feasible(node, false_st, False):
+            succs.append((false_st, kont))
 
-            true_st.add_pc(cond)
-            false_st.add_pc(z3.Not(cond))
+        # Limit the number of iterations
+        if depth < self.get_loop_bound(node) and self._is_feasible(node, true_st, True):
+            loop = worklist.push(kont, node, depth + 1)
+            loop = self._join(loop, node, 1)
+            succs.append((true_st, worklist.push(loop, node.body)))
 
-            if not false_st.is_empty():
-                states.extend([false_st])
+        return succs
 
-            # Limit to 10 iterations
-            if not true_st.is_empty() and depth < 10:
-                true_states = self.visit(node.body, state=true_st)
-                for true_st in true_states:
-                        loop_states = self.visit(node, state=true_st, depth=depth+1)
-                        states.extend(loop_states)
+    def _get_increments(self, node, state):
+        """The constants the body of a loop adds to its variables, None if
+           the loop cannot be accelerated from the given state"""
+        if id(node) not in self._increments:
+            incs = util.increments(node.body)
+            if incs is not None and not util.is_affine_cond(node.cond, incs):
+                incs = None
+            self._increments[id(node)] = incs
 
-        return states
+        incs = self._increments[id(node)]
+        if incs is None or any(v not in state.env for v in incs):
+            return None
+        return incs
+
+    def _accelerate(self, node, st, kont):
+        """Execute a loop that only adds constants to variables in one step.
+
+        The loop runs k times for a fresh k. Every variable is affine in
+        k after k iterations. The condition of the loop holds after 0 and
+        after k - 1 iterations and not after k. It is a conjunction of
+        affine comparisons, so it then holds after every iteration before
+        the k-th one as well.
+        """
+        incs = self._get_increments(node, st)
+        k = z3.FreshInt('k', self.ctx)
+
+        def after(n, state):
+            for v, c in incs.items():
+                state.env[v] = smp.mk_add(st.env[v], smp.mk_mul(n, z3.IntVal(c, self.ctx)))
+            return self.visit(node.cond, state=state)
+
+        first = self.visit(node.cond, state=st)
+        _, last_st = st.fork()
+        last = after(smp.mk_sub(k, z3.IntVal(1, self.ctx)), last_st)
+        _, exit_st = st.fork()
+        done = after(k, exit_st)
+
+        zero = z3.IntVal(0, self.ctx)
+        exit_st.add_pc(smp.mk_rel('>=', k, zero))
+        exit_st.add_pc(smp.mk_not(done))
+        exit_st.add_pc(smp.mk_or(smp.mk_rel('=', k, zero), smp.mk_and(first, last)))
+        if exit_st.is_empty():
+            return []
+        return [(exit_st, kont)]
+
+    def _summarize(self, node, st, kont):
+        """Execute a loop in one step using its invariant.
+
+        A state where the invariant may fail on entry is an error. The
+        body is run once from an arbitrary state of the invariant where
+        the loop condition holds, and is checked to keep the invariant at
+        its end, where the state dies. The state after the loop is an
+        arbitrary one where the invariant holds and the condition does
+        not.
+        """
+        succs = []
+        inv = self.visit(node.inv, state=st)
+        st, entry_st = st.fork()
+        entry_st.add_pc(smp.mk_not(inv))
+        if not entry_st.is_empty():
+            print("Invariant may not hold on entry: " + str(node.inv))
+            print("State: " + str(entry_st))
+            entry_st.mk_error()
+            self.budget.error()
+            succs.append((entry_st, None))
+
+        st.add_pc(inv)
+        if st.is_empty():
+            return succs
+        for v in util.assigned_vars(node.body):
+            st.env[v] = z3.FreshInt(v, self.ctx)
+        inv = self.visit(node.inv, state=st)
+        cond = self.visit(node.cond, state=st)
+
+        body_st, exit_st = st.fork()
+        body_st.add_pc(inv)
+        body_st.add_pc(cond)
+        if not body_st.is_empty():
+            check = worklist.push(kont, worklist.Check(node))
+            succs.append((body_st, worklist.push(check, node.body)))
+
+        exit_st.add_pc(inv)
+        exit_st.add_pc(smp.mk_not(cond))
+        if not exit_st.is_empty():
+            succs.append((exit_st, kont))
+        return succs
+
+    def _step_Check(self, node, *args, **kwargs):
+        st: SymState = kwargs["state"]
+        if st.is_error():
+            return [(st, None)]
 
-    def visit_AssertStmt(self, node, *args, **kwargs):
+        inv = self.visit(node.node.inv, state=st)
+        st.add_pc(smp.mk_not(inv))
+        if st.is_empty():
+            return []
+        print("Invariant may not be inductive: " + str(node.node.inv))
+        print("State: " + str(st))
+        st.mk_error()
+        self.budget.error()
+        return [(st, None)]
+
+    def _step_AssertStmt(self, node, *args, **kwargs):
         cond = self.visit(node.cond, *args, **kwargs)
 
         st: SymState = kwargs["state"]
+        kont = kwargs["kont"]
         true_st, false_st = st.fork()
 
-        states = []
+        succs = []
 
         # Don't forget to print an error message if an assertion might be violated
-        false_st.add_pc(z3.Not(cond))
-        if not false_st.is_empty():
+        false_st.add_pc(smp.mk_not(cond))
+        if self._is_feasible(node, false_st, False):
             print("Assertion error: " + str(node))
             print("State: " + str(false_st))
             print("Concrete State: " + str(false_st.pick_concerete()))
             false_st.mk_error()
-            states.append(false_st)
+            self.budget.error()
+            succs.append((false_st, kont))
 
         true_st.add_pc(cond)
 
         # if there is no possible true state we should remove this state
-        if not true_st.is_empty():
-            states.append(true_st)
-        return states
-        
-    def visit_AssumeStmt(self, node, *args, **kwargs):
+        if self._is_feasible(node, true_st, True):
+            succs.append((true_st, kont))
+        return succs
+
+    def _step_AssumeStmt(self, node, *args, **kwargs):
         cond = self.visit(node.cond, *args, **kwargs)
 
         st: SymState = kwargs["state"]
         st.add_pc(cond)
 
-        states = []
+        succs = []
 
         if not st.is_empty():
-            states.append(st)
-        
-        return states
+            succs.append((st, kwargs["kont"]))
+
+        return succs
 
-    def visit_HavocStmt(self, node, *args, **kwargs):
+    def _step_HavocStmt(self, node, *args, **kwargs):
         st = kwargs["state"]
         for v in node.vars:
-            st.env[v.name] = z3.FreshInt(v.name)
-        return [st]
+            st.env[v.name] = z3.FreshInt(v.name, self.ctx)
+        return [(st, kwargs["kont"])]
 
-    def visit_StmtList(self, node, *args, **kwargs):
-        states = kwargs["state"]
-        states = [states]
-    
-        for stmt in node.stmts:
-            new_states = []
-            for st in states:
-                res_state = self.visit(stmt, state=st)
-                new_states.extend(res_state)
-
-            states = new_states
-        return states
+    def _step_StmtList(self, node, *args, **kwargs):
+        kont = kwargs["kont"]
+        for stmt in reversed(node.stmts):
+            kont = worklist.push(kont, stmt)
+        return [(kwargs["state"], kont)]
 
 
 def _parse_args():
@@ -297,26 +986,93 @@ def _parse_args():
                                  description='WLang Interpreter')
     ap.add_argument('in_file', metavar='FILE',
                     help='WLang program to interpret')
+    ap.add_argument('--compact', metavar='N', type=builtins.int, default=None,
+                    help='Compact path conditions longer than N constraints')
+    ap.add_argument('--strategy', default='dfs',
+                    choices=sorted(worklist.STRATEGIES.keys()),
+                    help='Search strategy')
+    ap.add_argument('--seed', type=builtins.int, default=None,
+                    help='Seed of the random search strategy')
+    ap.add_argument('--loop-bound', metavar='N', type=builtins.int, default=10,
+                    help='Number of times a loop is unrolled')
+    ap.add_argument('--bound', metavar='I=N', action='append', default=[],
+                    help='Unroll the I-th loop (from 0, in program order) N times')
+    ap.add_argument('--merge', action='store_true',
+                    help='Merge states at the end of branches and loop iterations')
+    ap.add_argument('--prune', action='store_true',
+                    help='Prune states subsumed by ones seen at loop heads and after ifs')
+    ap.add_argument('--summarize', action='store_true',
+                    help='Use the invariants of loops instead of unrolling them')
+    ap.add_argument('--accelerate', action='store_true',
+                    help='Run loops that only add constants to variables in one step')
+    ap.add_argument('--intervals', action='store_true',
+                    help='Decide conditions by an interval analysis before using the solver')
+    ap.add_argument('--infer-bounds', action='store_true',
+                    help='Unroll loops as often as an interval analysis finds they can run')
+    ap.add_argument('--jobs', metavar='N', type=builtins.int, default=1,
+                    help='Explore with N worker processes')
+    budget_.add_arguments(ap)
     args = ap.parse_args()
+    budget_.check_jobs(ap, args)
+    if args.jobs > 1 and args.merge:
+        ap.error('--merge cannot be used with --jobs')
     return args
 
 
-def main():
-    args = _parse_args()
+def _setup(args):
+    """Create the engine, the program and initial states from the arguments"""
     prg = ast.parse_file(args.in_file)
-    st = SymState()
-    sym = SymExec()
+    sym = SymExec(strategy=worklist.make_strategy(args.strategy, args.seed),
+                  loop_bound=args.loop_bound, merge=args.merge,
+                  prune=args.prune, summarize=args.summarize,
+                  accelerate=args.accelerate, intervals=args.intervals,
+                  infer_bounds=args.infer_bounds, budget=budget_.from_args(args))
+    loops = util.loops(prg)
+    for b in args.bound:
+        idx, bound = b.split('=')
+        sym.set_loop_bound(loops[builtins.int(idx)], builtins.int(bound))
+    return (sym, prg, lambda: SymState(compact=args.compact))
+
+
+def _report(state):
+    return str(state)
+
+
+def _print_bounds(prefix, engine, prg):
+    """Print the number of times every loop is unrolled and why"""
+    for i, loop in enumerate(util.loops(prg)):
+        if id(loop) in engine._loop_bounds:
+            how = 'set'
+        elif id(loop) in engine.inferred_bounds:
+            how = 'inferred'
+        else:
+            how = 'default'
+        print(prefix, 'loop', i, 'unrolled at most',
+              engine.get_loop_bound(loop), 'times (%s)' % how)
 
-    states = sym.run(prg, st)
-    if len(states) == 0:
+
+def main():
+    args = _parse_args()
+    sym = None
+    if args.jobs > 1:
+        states = parallel.explore(_setup, args, args.jobs, _report)
+    else:
+        sym, prg, mk_state = _setup(args)
+        states = (_report(s) for s in sym.stream(prg, mk_state()))
+
+    count = 0
+    for out in states:
+        count = count + 1
+        print('[symexec]: symbolic state reached')
+        print(out)
+    if count == 0:
         print('[symexec]: no output states')
     else:
-        count = 0
-        for out in states:
-            count = count + 1
-            print('[symexec]: symbolic state reached')
-            print(out)
         print('[symexec]: found', count, 'symbolic states')
+    if sym is not None and not sym.summary.is_complete():
+        print('[symexec]:', sym.summary)
+    if sym is not None and args.infer_bounds:
+        _print_bounds('[symexec]:', sym, prg)
     return 0
 
 
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from . import ast, budget, exe, sym
+
+
+class TestBudget (unittest.TestCase):
+    prg = """
+            havoc a, b, c, x;
+            x := 0;
+            if a > 0 then x := x + 1;
+            if b > 0 then x := x + 1;
+            if c > 0 then x := x + 1;
+            assert x < 2
+          """
+
+    def test_complete(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = sym.SymExec()
+        out = engine.run(ast1, sym.SymState())
+        self.assertTrue(engine.summary.is_complete())
+        self.assertEqual(engine.summary.paths, len(out))
+        self.assertEqual(engine.summary.errors, 4)
+
+    def test_sym_errors(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = sym.SymExec(budget=budget.Budget(errors=1))
+        out = engine.run(ast1, sym.SymState())
+        self.assertEqual(len(out), 1)
+        self.assertTrue(out[0].is_error())
+        self.assertEqual(engine.summary.reason, 'errors')
+        self.assertGreater(engine.summary.pending, 0)
+
+    def test_sym_limits(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = sym.SymExec(budget=budget.Budget(queries=5))
+        engine.run(ast1, sym.SymState())
+        self.assertEqual(engine.summary.reason, 'queries')
+        self.assertFalse(engine.summary.is_complete())
+
+        engine = sym.SymExec(budget=budget.Budget(states=3))
+        engine.run(ast1, sym.SymState())
+        self.assertEqual(engine.summary.reason, 'states')
+
+        engine = sym.SymExec(budget=budget.Budget(time=0))
+        self.assertEqual(engine.run(ast1, sym.SymState()), [])
+        self.assertEqual(engine.summary.reason, 'time')
+        self.assertEqual(engine.summary.pending, 1)
+
+    def test_exe_errors(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = exe.ExeExec(budget=budget.Budget(errors=1))
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(len([s for s in out if not s.is_valid()]), 1)
+        self.assertEqual(engine.summary.reason, 'errors')
+        self.assertIsNone(engine.summary.pending)
+
+        engine = exe.ExeExec()
+        engine.run(ast1, exe.ExeState())
+        self.assertTrue(engine.summary.is_complete())
+
+    def test_jobs(self):
+        # the workers of --jobs each have a budget of their own
+        for main in (sym.main, exe.main):
+            for opt in (['--max-errors', '1'], ['--stop-on-first-error'], ['--time', '5']):
+                with patch('sys.argv', ['wlang', 'wlang/test1.prg', '--jobs', '2'] + opt):
+                    with patch('sys.stderr'):
+                        self.assertRaises(SystemExit, main)
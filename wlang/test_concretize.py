@@ -0,0 +1,83 @@
+import unittest
+
+import z3
+
+from . import ast, concretize, exe
+
+
+class TestConcretize (unittest.TestCase):
+    def test_policy(self):
+        prg1 = "havoc x; if x > 0 then skip; while x > 0 do x := x - 1"
+        ast1 = ast.parse_string(prg1)
+        if_stmt, loop = ast1.stmts[1], ast1.stmts[2]
+        policy = concretize.Policy(site_time=1.0, query_size=5)
+        policy.query(if_stmt, 0.6, 1)
+        self.assertFalse(policy.is_concrete(if_stmt))
+        policy.query(if_stmt, 0.6, 1)
+        self.assertTrue(policy.is_concrete(if_stmt))
+        policy.query(loop, 0.0, 5)
+        self.assertTrue(policy.is_concrete(loop))
+        self.assertEqual([d[0] for d in policy.decisions], [if_stmt, loop])
+        self.assertIn('1.20s', concretize.describe(policy.decisions[0]))
+        policy.reset()
+        self.assertFalse(policy.is_concrete(if_stmt))
+        self.assertFalse(policy.bind_nonlinear(loop.cond))
+
+    def test_sites(self):
+        prg1 = """
+                havoc x, y;
+                if x > 0 then y := y + 1;
+                if x > 5 then y := y + 1;
+                i := 0;
+                while i < x do i := i + 1;
+                assert y < 5
+               """
+        ast1 = ast.parse_string(prg1)
+        ref = exe.ExeExec()
+        out1 = ref.run(ast1, exe.ExeState())
+        self.assertEqual(len(ref.policy.decisions), 0)
+
+        # every site goes concrete as soon as it is queried
+        engine = exe.ExeExec(policy=concretize.Policy(query_size=0))
+        out2 = engine.run(ast1, exe.ExeState())
+        self.assertLess(len(out2), len(out1))
+        self.assertLess(engine.summary.queries, ref.summary.queries)
+        sites = [d[0] for d in engine.policy.decisions]
+        self.assertIn(ast1.stmts[1], sites)
+        for s in out2:
+            # bound variables keep the values they were bound to
+            self.assertNotIn('x', s.sym_state.env)
+            env = s.init_state.env
+            self.assertEqual(s.con_state.env['i'], max(env['x'], 0))
+
+    def test_loop(self):
+        # a concretized loop ends the path at a failed assertion
+        prg1 = "havoc x; assume x > 20; i := 0; while i < x do { if i > 15 then assert false; i := i + 1 }"
+        engine = exe.ExeExec(policy=concretize.Policy(query_size=2))
+        out = engine.run(ast.parse_string(prg1), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertFalse(out[0].is_valid())
+        self.assertFalse(out[0].is_infeasible())
+        self.assertEqual(out[0].con_state.env['i'], 16)
+        self.assertEqual(engine.summary.errors, 1)
+
+        # and at a failed assumption
+        prg2 = "havoc x; assume x > 20; i := 0; while i < x do { assume i < 3; i := i + 1 }"
+        out = engine.run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertTrue(out[0].is_infeasible())
+        self.assertEqual(out[0].con_state.env['i'], 3)
+
+    def test_nonlinear(self):
+        prg1 = "havoc x, y; assume y = 3; z := x * y; if z = 12 then assert x > 3; q := 7 / (x + 1)"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec(policy=concretize.Policy(nonlinear=True))
+        out = engine.run(ast1, exe.ExeState())
+        kinds = [d[1] for d in engine.policy.decisions]
+        self.assertEqual(kinds, ['non-linear term', 'non-linear term'])
+        self.assertEqual(len(out), 2)
+        self.assertTrue(all(s.is_valid() for s in out))
+        for s in out:
+            self.assertEqual(s.init_state.env['y'], 3)
+            # the divisor is bound to its value
+            self.assertTrue(z3.is_int_value(s.sym_state.env['q']))
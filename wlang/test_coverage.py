@@ -0,0 +1,65 @@
+import unittest
+
+from . import ast, coverage, exe
+
+
+class TestCoverage (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            if x > 0 then y := y + 1;
+            if y > 0 then x := x + 1;
+            i := 0;
+            while i < x do i := i + 1;
+            assert i < 5
+          """
+
+    def test_bitmap(self):
+        ast1 = ast.parse_string(self.prg)
+        cov = coverage.Coverage(ast1)
+        self.assertEqual(len(cov.bitmap), 8)
+        if1, loop = ast1.stmts[1], ast1.stmts[4]
+        self.assertEqual(cov.edge(if1, True), 0)
+        self.assertEqual(cov.edge(loop, False), 5)
+        self.assertTrue(cov.hit(if1, False))
+        self.assertFalse(cov.hit(if1, False))
+        self.assertTrue(cov.is_covered(if1, False))
+        self.assertFalse(cov.is_covered(if1, True))
+        self.assertEqual(cov.covered(), 1)
+        cov.exclude(if1, True)
+        self.assertEqual(str(cov), 'covered 1 of 7 branch outcomes')
+        self.assertFalse(cov.is_saturated())
+        # assumptions are not branch sites
+        assume = ast.parse_string("assume x > 0")
+        self.assertIsNone(cov.edge(assume, True))
+        self.assertFalse(cov.hit(assume, True))
+        self.assertTrue(cov.is_covered(assume, False))
+
+    def test_engines(self):
+        ast1 = ast.parse_string(self.prg)
+        ref = exe.ExeExec()
+        out1 = ref.run(ast1, exe.ExeState())
+        self.assertTrue(ref.coverage.is_saturated())
+        self.assertTrue(ref.summary.is_complete())
+
+        engine = exe.ExeExec(stop_on_coverage=True)
+        out2 = engine.run(ast1, exe.ExeState())
+        self.assertTrue(engine.coverage.is_saturated())
+        self.assertEqual(engine.summary.reason, 'coverage')
+        self.assertLess(len(out2), len(out1))
+        self.assertLess(engine.summary.queries, ref.summary.queries)
+
+        engine = exe.ExeExec(generational=True, stop_on_coverage=True)
+        out3 = engine.run(ast1, exe.ExeState())
+        self.assertTrue(engine.coverage.is_saturated())
+        self.assertLess(len(out3), len(out1))
+        # the assertion fails for a large enough x
+        self.assertGreater(len([s for s in out3 if not s.is_valid()]), 0)
+
+    def test_excluded(self):
+        prg1 = "havoc x; y := 1; if y > 0 then x := x + 1; if x > 0 then skip"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec(intervals=True, stop_on_coverage=True)
+        engine.run(ast1, exe.ExeState())
+        # the else of the first if is never taken
+        self.assertEqual(engine.coverage.total(), 3)
+        self.assertTrue(engine.coverage.is_saturated())
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch
 
 from . import ast, sym, exe
+from . import simplify as smp
 import z3
 from unittest.mock import MagicMock
 
@@ -167,3 +168,251 @@ class TestExe (unittest.TestCase):
     def test_main2(self):
         self.assertEqual(exe.main(),0)
 
+
+    def test_stream(self):
+        prg1 = "havoc x, y; if x > 0 then y := 1 else y := 2; assert y > 1"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec()
+        out = engine.stream(ast1, exe.ExeState())
+        first = next(out)
+        self.assertEqual(len(list(out)) + 1, len(engine.run(ast1, exe.ExeState())))
+        self.assertIn(first.con_state.env['y'], (1, 2))
+
+    def test_result(self):
+        prg1 = "havoc x; assume x > 10; assert x > 15"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec()
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(len(out), 2)
+        for s in out:
+            self.assertIsInstance(s, exe.ExeResult)
+            self.assertFalse(hasattr(s.sym_state, '_solver'))
+            self.assertGreater(s.init_state.env['x'], 10)
+        self.assertEqual(len([s for s in out if not s.is_valid()]), 1)
+        self.assertIn('Init Concrete State', str(out[0]))
+
+    def test_prune(self):
+        prg1 = "havoc x; y := 0; while x > 0 do { if y > 0 then y := 1 else y := 1 }; assert y < 2"
+        ast1 = ast.parse_string(prg1)
+        # without pruning the loop would be run concretely forever
+        engine = exe.ExeExec(prune=True)
+        out = engine.run(ast1, exe.ExeState())
+        self.assertGreater(engine.visited.pruned, 0)
+        self.assertEqual(len(out), 1)
+        self.assertTrue(all(s.is_valid() for s in out))
+
+        # states that fail in the body are not pruned at the loop head
+        prg2 = "havoc a; i := 0; while i < 2 do { assert a > 1; i := i + 1 }"
+        out = exe.ExeExec(prune=True).run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(len(out), 2)
+        self.assertEqual(len([s for s in out if not s.is_valid()]), 1)
+
+    def test_summarize(self):
+        prg1 = "havoc n; i := 0; while i < n inv i <= n do i := i + 1; assert i = n"
+        ast1 = ast.parse_string(prg1)
+        out = exe.ExeExec(summarize=True).run(ast1, exe.ExeState())
+        self.assertEqual(len(out), 2)
+        # the invariant does not hold on entry if n is negative
+        bad = [s for s in out if not s.is_valid()]
+        self.assertEqual(len(bad), 1)
+        self.assertLess(bad[0].con_state.env['n'], 0)
+
+        prg2 = "havoc n; assume n >= 0; i := 0; while i < n inv i <= n do i := i + 1; assert i = n"
+        out = exe.ExeExec(summarize=True).run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertTrue(out[0].is_valid())
+
+    def test_infer_bounds(self):
+        prg1 = "havoc n; assume n <= 15; i := 0; while i < n do i := i + 1; assert i <= 15"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec(loop_bound=3, infer_bounds=True)
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(engine.get_loop_bound(ast1.stmts[3]), 15)
+        # every path through the loop is explored symbolically
+        self.assertEqual(len(out), 16)
+        self.assertTrue(all(s.is_valid() for s in out))
+
+    def test_generational(self):
+        prg1 = "havoc x, y; if x > 10 then { if y = x + 3 then assert x < 50 }; assume y > 0"
+        ast1 = ast.parse_string(prg1)
+        ref = exe.ExeExec()
+        out1 = ref.run(ast1, exe.ExeState())
+        engine = exe.ExeExec(generational=True)
+        out2 = engine.run(ast1, exe.ExeState())
+        self.assertEqual(len(out1), len(out2))
+        self.assertLess(engine.summary.queries, ref.summary.queries)
+        # the inputs of a run are its initial state
+        bad = [s for s in out2 if not s.is_valid()]
+        self.assertEqual(len(bad), 1)
+        env = bad[0].init_state.env
+        self.assertGreaterEqual(env['x'], 50)
+        self.assertEqual(env['y'], env['x'] + 3)
+        for s in out2:
+            self.assertGreater(s.init_state.env['y'], 0)
+
+        # loops are not negated past their bound
+        prg2 = "havoc n; i := 0; while i < n do i := i + 1"
+        out = exe.ExeExec(generational=True, loop_bound=4).run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(sorted(s.con_state.env['i'] for s in out), [0, 1, 2, 3, 4])
+
+        # runs that do not end are cut off at the step limit
+        prg3 = "havoc x; while x > 0 do x := x + 1"
+        engine = exe.ExeExec(generational=True, steps=100)
+        out = engine.run(ast.parse_string(prg3), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertEqual(out[0].init_state.env['x'], 0)
+        self.assertEqual(engine.summary.reason, 'steps')
+
+        # models of paths with symbolic division also define div0
+        prg4 = "havoc x; if x > 0 then { y := 10 / (x - 3); assert y < 5 }"
+        out = exe.ExeExec(generational=True).run(ast.parse_string(prg4), exe.ExeState())
+        self.assertEqual(len(out), 4)
+        bad = sorted(s.init_state.env['x'] for s in out if not s.is_valid())
+        # x = 3 divides by zero
+        self.assertEqual(len(bad), 2)
+        self.assertEqual(bad[0], 3)
+        self.assertIn(bad[1], (4, 5))
+
+    def test_evaluator(self):
+        st = exe.ExeState()
+        x = z3.Int('x')
+        st.con_state.env['x'] = -7
+        st.sym_state.env['x'] = x
+        ev = exe.ConcolicEvaluator(z3.main_ctx())
+        exp = ast.parse_string("y := ((x + 1) * 2) / (0 - 5)").rhs
+        con, sym = ev.visit(exp, state=st)
+        self.assertEqual(con, 3)
+        # division agrees with z3 on negative numbers
+        self.assertEqual(z3.simplify(z3.substitute(sym, (x, z3.IntVal(-7)))).as_long(), con)
+
+        cond = ast.parse_string("while not (x < 0 and x = 3) or false do skip").cond
+        con, sym = ev.visit(cond, state=st)
+        self.assertTrue(con)
+        self.assertTrue(z3.is_true(z3.simplify(z3.substitute(sym, (x, z3.IntVal(-7))))))
+
+        # loops past their bound are finished with the same division
+        prg1 = "havoc x; assume x > 3; i := 0; y := 7; while i < x do { y := y / 2; i := i + 1 }"
+        out = exe.ExeExec(loop_bound=0).run(ast.parse_string(prg1), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertEqual(out[0].con_state.env['y'], 0)
+
+    def test_zero_division(self):
+        st = exe.ExeState()
+        st.con_state.env['x'] = 0
+        st.sym_state.env['x'] = z3.Int('x')
+        ev = exe.ConcolicEvaluator(z3.main_ctx())
+        con, sym = ev.visit(ast.parse_string("y := 1 + 7 / x").rhs, state=st)
+        # left open as z3 does
+        self.assertIsNone(con)
+        self.assertTrue(sym.eq(smp.mk_add(z3.IntVal(1), z3.IntVal(7) / z3.Int('x'))))
+        self.assertEqual(len(ev.divisors), 1)
+        self.assertTrue(ev.divisors.pop().eq(z3.Int('x')))
+        con, sym = ev.visit(ast.parse_string("y := 7 / 0").rhs, state=st)
+        self.assertIsNone(con)
+        self.assertIsNotNone(sym)
+
+        # the divisor is zero on one path and not on the other
+        prg1 = "havoc x; y := 10 / x; assert y < 100"
+        for engine in (exe.ExeExec(), exe.ExeExec(generational=True)):
+            out = engine.run(ast.parse_string(prg1), exe.ExeState())
+            self.assertEqual(len(out), 2)
+            bad = [s for s in out if not s.is_valid()]
+            self.assertEqual(len(bad), 1)
+            self.assertEqual(bad[0].inputs['x!0'], 0)
+            self.assertNotEqual([s for s in out if s.is_valid()][0].inputs['x!0'], 0)
+            self.assertEqual(engine.summary.errors, 1)
+
+        # a divisor that is not zero on the first path can be on another
+        prg3 = "havoc x; if 10 / (x - 1) > 2 then skip"
+        for engine in (exe.ExeExec(), exe.ExeExec(generational=True)):
+            out = engine.run(ast.parse_string(prg3), exe.ExeState())
+            self.assertEqual(len(out), 3)
+            bad = [s for s in out if not s.is_valid()]
+            self.assertEqual([s.inputs['x!0'] for s in bad], [1])
+
+        # divisors that do not depend on the inputs end the path
+        prg2 = "havoc x; i := 0; while i < 3 do { y := x / (1 - i); i := i + 1 }"
+        out = exe.ExeExec(loop_bound=0).run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertFalse(out[0].is_valid())
+        self.assertEqual(out[0].con_state.env['i'], 1)
+
+    def test_taint(self):
+        prg1 = "havoc x; i := 0; s := 0; while i < 5 do { s := s + i; i := i + 1 }; assert s = 10"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec()
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(len(out), 1)
+        self.assertTrue(out[0].is_valid())
+        self.assertEqual(out[0].con_state.env['s'], 10)
+        # nothing depends on x, so only the initial state of the result
+        # is queried
+        self.assertEqual(engine.summary.queries, 1)
+
+        prg2 = "havoc x; i := 0; while i < 3 do { if x > i then y := x else y := 0; i := i + 1 }; assert y = 0"
+        out = engine.run(ast.parse_string(prg2), exe.ExeState())
+        # one path for every number of iterations with x > i
+        self.assertEqual(len(out), 4)
+        bad = [s for s in out if not s.is_valid()]
+        self.assertEqual(len(bad), 1)
+        self.assertEqual(bad[0].con_state.env['y'], bad[0].init_state.env['x'])
+        self.assertGreater(bad[0].init_state.env['x'], 2)
+        # y no longer depends on x once 0 is assigned to it
+        for s in out:
+            if s.is_valid():
+                self.assertNotIn('y', s.sym_state.env)
+
+    def test_model_cache(self):
+        prg1 = "havoc x, y; havoc x; if x > 10 then y := x + 1 else assert y > 0"
+        ast1 = ast.parse_string(prg1)
+        engine = exe.ExeExec()
+        out = engine.run(ast1, exe.ExeState())
+        # one query for each side of the if and one for each side of the
+        # assert, the models of the checks are reused for the results
+        self.assertEqual(len(out), 3)
+        self.assertEqual(engine.summary.queries, 4)
+        for s in out:
+            # the initial state has the first value of every input
+            self.assertEqual(set(s.init_state.env), {'x', 'y'})
+
+        # models of paths with symbolic division also define div0
+        prg2 = "havoc x; assume x > 0; y := 10 / (x - 3); assert y < 5"
+        out = engine.run(ast.parse_string(prg2), exe.ExeState())
+        self.assertEqual(len(out), 3)
+        bad = sorted(s.inputs['x!0'] for s in out if not s.is_valid())
+        # x = 3 divides by zero
+        self.assertEqual(len(bad), 2)
+        self.assertEqual(bad[0], 3)
+        self.assertIn(bad[1], (4, 5))
+
+    def test_fork_sharing(self):
+        st = exe.ExeState()
+        x = z3.Int('x')
+        st.con_state.env['x'] = 5
+        st.sym_state.env['x'] = x
+        st.sym_state.add_pc(x > 3)
+        self.assertFalse(st.sym_state.is_empty())
+        parent, child = st.fork()
+        # nothing is copied or checked again until a state changes
+        self.assertIs(child.con_state.env._map, parent.con_state.env._map)
+        self.assertIs(child.sym_state.env._map, parent.sym_state.env._map)
+        self.assertIs(child.sym_state.path, parent.sym_state.path)
+        self.assertIsNone(child.sym_state._solver)
+        self.assertFalse(child.sym_state.is_empty())
+        self.assertIsNone(child.sym_state._solver)
+
+        child.con_state.env['x'] = 7
+        child.sym_state.add_pc(x > 6)
+        self.assertEqual(parent.con_state.env['x'], 5)
+        self.assertEqual(len(parent.sym_state.path), 1)
+        # picking a concrete state keeps the values of the other variables
+        child.con_state.env['y'] = 2
+        env = exe._pick_concrete(child)
+        self.assertGreater(env['x'], 6)
+        self.assertEqual(env['y'], 2)
+
+        # a fork of an error or infeasible state is one too
+        parent.mk_error()
+        self.assertFalse(parent.fork()[1].is_valid())
+        child.mk_infeasable()
+        self.assertFalse(child.fork()[1].is_valid())
@@ -0,0 +1,84 @@
+import unittest
+
+from . import ast, exe, exhaust
+
+
+class TestExhaust (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            assume x >= 0 and x < 16 and y >= -3 and y <= 3;
+            assume x + y > 0;
+            if x * y > 20 then z := 1 else z := 0;
+            i := 0;
+            while i < x do i := i + 1;
+            assert z = 0 or x < 10
+          """
+
+    def test_domain(self):
+        ast1 = ast.parse_string(self.prg)
+        dom = exhaust.domain(ast1)
+        self.assertEqual(dom, {'x': (0, 15), 'y': (-3, 3)})
+        self.assertEqual(exhaust.size(dom), 112)
+        self.assertIsNone(exhaust.domain(ast.parse_string("havoc x; assume x > 0")))
+        self.assertIsNone(exhaust.domain(ast.parse_string(
+            "havoc x; assume x > 0 and x < 3; if x > 1 then havoc y")))
+        self.assertEqual(exhaust.domain(ast.parse_string("x := 1")), dict())
+        self.assertEqual(exhaust.size(exhaust.domain(ast.parse_string(
+            "havoc x; assume x > 3 and x < 2"))), 0)
+
+    def test_enumerate(self):
+        ast1 = ast.parse_string(self.prg)
+        dom = exhaust.domain(ast1)
+        enum = exhaust.Enumerator()
+        paths = enum.run(ast1, dom)
+        # one path for every number of loop iterations and value of z
+        self.assertEqual(sum(p.count for p in paths) + enum.rejected, 112)
+        self.assertEqual(enum.stopped, 0)
+        bad = [p for p in paths if p.is_error()]
+        self.assertEqual(len(bad), 6)
+        for p in bad:
+            self.assertIs(p.error, ast1.stmts[-1])
+            self.assertGreaterEqual(p.inputs['x!0'], 10)
+            self.assertEqual(p.env['z'], 1)
+
+        par = exhaust.Enumerator(jobs=2)
+        paths2 = par.run(ast1, dom)
+        self.assertEqual([p.inputs for p in paths2], [p.inputs for p in paths])
+        self.assertEqual([p.count for p in paths2], [p.count for p in paths])
+        self.assertEqual([p.error for p in paths2], [p.error for p in paths])
+
+    def test_engine(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = exe.ExeExec(enumerate_below=1000)
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(engine.summary.queries, 0)
+        self.assertTrue(engine.summary.is_complete())
+        self.assertTrue(engine.coverage.is_saturated())
+        self.assertEqual(len([s for s in out if not s.is_valid()]), 6)
+        for s in out:
+            self.assertEqual(s.con_state.env['i'], s.init_state.env['x'])
+
+        # too many inputs to enumerate
+        engine = exe.ExeExec(enumerate_below=100)
+        engine.run(ast1, exe.ExeState())
+        self.assertGreater(engine.summary.queries, 0)
+
+    def test_division(self):
+        ast1 = ast.parse_string("havoc x; assume x >= -3 and x <= 3; y := 6 / x; assert y < 6")
+        dom = exhaust.domain(ast1)
+        enum = exhaust.Enumerator()
+        paths = enum.run(ast1, dom)
+        # x = 0 divides by zero, which is an error and not a rejected input
+        self.assertEqual(enum.rejected, 0)
+        self.assertEqual(sorted(p.count for p in paths), [1, 1, 5])
+        bad = {p.inputs['x!0']: p.error for p in paths if p.is_error()}
+        self.assertEqual(bad, {0: ast1.stmts[2], 1: ast1.stmts[3]})
+
+        paths2 = exhaust.Enumerator(jobs=2).run(ast1, dom)
+        self.assertEqual([p.error for p in paths2], [p.error for p in paths])
+
+        engine = exe.ExeExec(enumerate_below=1000)
+        out = engine.run(ast1, exe.ExeState())
+        self.assertEqual(engine.summary.queries, 0)
+        self.assertEqual(engine.summary.errors, 2)
+        self.assertEqual(len([s for s in out if not s.is_valid()]), 2)
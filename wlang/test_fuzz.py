@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+
+from . import ast, fuzz
+
+
+class TestFuzz (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            if x > 10 then y := y + 1;
+            if x * 3 = 123456 then { if y > 5 then assert false };
+            i := 0;
+            while i < 3 do i := i + 1
+          """
+
+    def test_tracer(self):
+        ast1 = ast.parse_string("havoc x; y := x / 0 - 1; assert y > 0")
+        run = fuzz.Tracer().trace(ast1, {'x!0': 7}, lambda: 0)
+        self.assertEqual(run.stop, 'division by zero')
+        # the run fails at the statement that divides
+        self.assertTrue(run.is_error())
+        self.assertIs(run.node, ast1.stmts[1])
+
+        ast1 = ast.parse_string("havoc x, x; y := (0 - 7) / 2; while x > 0 do x := x + 1; assert y > 0")
+        inputs = {'x!0': 3}
+        run = fuzz.Tracer(steps=50).trace(ast1, inputs, lambda: 5)
+        # the second input is made up
+        self.assertEqual(run.used, {'x!0': 3, 'x!1': 5})
+        self.assertEqual(run.stop, 'steps')
+        run = fuzz.Tracer().trace(ast1, {'x!0': 3, 'x!1': 0}, lambda: 5)
+        self.assertTrue(run.is_error())
+        # division agrees with z3
+        self.assertEqual([t for _, t in run.path], [False, False])
+
+    def test_fuzz(self):
+        ast1 = ast.parse_string(self.prg)
+        fuzzer = fuzz.Fuzzer(seed=1, stall=50)
+        failures = fuzzer.fuzz(ast1, runs=500)
+        # the fuzzer cannot guess x, the concolic engine solves for it
+        self.assertGreater(fuzzer.solved, 0)
+        self.assertEqual(len(failures), 1)
+        inputs, node = failures[0]
+        self.assertEqual(inputs['x!0'] * 3, 123456)
+        self.assertGreater(inputs['y!0'], 4)
+        self.assertIs(node, ast1.stmts[2].then_stmt.stmts[0].then_stmt)
+        # the assertion cannot hold
+        self.assertEqual(fuzzer.coverage.covered(), fuzzer.coverage.total() - 1)
+        self.assertTrue(fuzz.Tracer().trace(ast1, dict(inputs), lambda: 0).is_error())
+
+    def test_division(self):
+        prg1 = "havoc x; y := 100000 / (x - 7); if y = 5000 then assert false"
+        ast1 = ast.parse_string(prg1)
+        fuzzer = fuzz.Fuzzer(seed=1, stall=50)
+        failures = fuzzer.fuzz(ast1, runs=500)
+        # the engine solves through the symbolic division
+        self.assertGreater(fuzzer.solved, 0)
+        self.assertEqual(sorted((inputs['x!0'], str(node).strip()) for inputs, node in failures),
+                         [(7, str(ast1.stmts[1]).strip()), (27, 'assert false')])
+
+    def test_shallow(self):
+        prg1 = "havoc x; if x > 0 then y := 1 else y := 2; if x = 0 then y := 3"
+        fuzzer = fuzz.Fuzzer(seed=2)
+        fuzzer.fuzz(ast.parse_string(prg1))
+        self.assertTrue(fuzzer.coverage.is_saturated())
+        # random inputs are enough, no query is made
+        self.assertEqual(fuzzer.solved, 0)
+        self.assertEqual(fuzzer.engine.budget.num_queries, 0)
+
+    def test_steps(self):
+        prg1 = "havoc x; assume x > 0; while x > 0 do x := x + 1"
+        fuzzer = fuzz.Fuzzer(seed=0, stall=10, steps=100)
+        self.assertEqual(fuzzer.engine.steps, 100)
+        fuzzer.fuzz(ast.parse_string(prg1), runs=100)
+        self.assertEqual(fuzzer.runs, 100)
+        # runs that do not end are not handed to the engine
+        self.assertEqual(fuzzer.solved, 0)
+
+    @patch('sys.argv', ['wlang.fuzz', 'wlang/test1.prg', '--runs', '20', '--seed', '0'])
+    def test_main(self):
+        self.assertEqual(fuzz.main(), 0)
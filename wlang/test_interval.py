@@ -0,0 +1,86 @@
+import math
+import unittest
+
+from . import ast, exe, interval, sym, util
+
+
+class TestInterval (unittest.TestCase):
+    prg = """
+            havoc x; assume x > 5;
+            if x > 3 then y := 1 else y := 2;
+            assert y = 1;
+            i := 0;
+            while i < 10 do { i := i + 1; if i > 0 then skip };
+            assert i = 10;
+            havoc z;
+            if z > 0 or z < -3 then z := 0;
+            assert z > 0
+          """
+
+    def test_ranges(self):
+        ast1 = ast.parse_string(self.prg)
+        ia = interval.IntervalAnalysis()
+        env = ia.check(ast1)
+        self.assertEqual(env['x'], (6, math.inf))
+        self.assertEqual(env['y'], (1, 1))
+        self.assertEqual(env['i'], (10, 10))
+        self.assertEqual(env['z'], (-3, 0))
+
+    def test_decide(self):
+        ast1 = ast.parse_string(self.prg)
+        ia = interval.IntervalAnalysis()
+        ia.check(ast1)
+        stmts = ast1.stmts
+        self.assertTrue(ia.decide(stmts[2]))
+        self.assertTrue(ia.decide(stmts[3]))
+        # the if in the loop is decided on every iteration
+        self.assertTrue(ia.decide(stmts[5].body.stmts[1]))
+        self.assertIsNone(ia.decide(stmts[5]))
+        self.assertTrue(ia.decide(stmts[6]))
+        self.assertIsNone(ia.decide(stmts[8]))
+        self.assertFalse(ia.decide(stmts[9]))
+
+    def test_unreachable(self):
+        prg1 = "x := 1; if x > 2 then { y := 1; assert y = 2 }; while x < 0 do skip"
+        ast1 = ast.parse_string(prg1)
+        ia = interval.IntervalAnalysis()
+        ia.check(ast1)
+        self.assertFalse(ia.decide(ast1.stmts[1]))
+        self.assertIsNone(ia.decide(ast1.stmts[1].then_stmt.stmts[1]))
+        self.assertFalse(ia.decide(ast1.stmts[2]))
+
+    def test_bound(self):
+        prg1 = """
+                i := 0; while i < 10 do i := i + 1;
+                havoc n; assume n <= 5;
+                j := 0; while j <= n and i > 0 do { j := j + 2; if j > 3 then skip };
+                k := 20; while 3 < k do k := k - 4;
+                while n < 4 do n := n + 1;
+                a := 0; while a < 3 do { b := 0; while b < a do b := b + 1; a := a + 1 };
+                while a < 10 do { a := a + 1; if a > 5 then a := 0 }
+               """
+        ast1 = ast.parse_string(prg1)
+        ia = interval.IntervalAnalysis()
+        ia.check(ast1)
+        bounds = [ia.bound(l) for l in util.loops(ast1)]
+        self.assertEqual(bounds, [10, 3, 5, None, 3, 2, None])
+
+    def test_engines(self):
+        ast1 = ast.parse_string(self.prg)
+        ref = sym.SymExec(loop_bound=20)
+        out1 = ref.run(ast1, sym.SymState())
+        engine = sym.SymExec(loop_bound=20, intervals=True)
+        out2 = engine.run(ast1, sym.SymState())
+        self.assertEqual(len(out1), len(out2))
+        # the last assertion fails on both paths
+        self.assertEqual(len([s for s in out2 if s.is_error()]), 2)
+        self.assertLess(engine.summary.queries, ref.summary.queries)
+
+        ref = exe.ExeExec()
+        out1 = ref.run(ast1, exe.ExeState())
+        engine = exe.ExeExec(intervals=True)
+        out2 = engine.run(ast1, exe.ExeState())
+        self.assertEqual(len(out1), len(out2))
+        self.assertEqual(len([s for s in out2 if not s.is_valid()]),
+                         len([s for s in out1 if not s.is_valid()]))
+        self.assertLess(engine.summary.queries, ref.summary.queries)
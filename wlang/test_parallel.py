@@ -0,0 +1,90 @@
+import argparse
+import os
+import tempfile
+import unittest
+
+import z3
+
+from . import ast, budget, concretize, exe, parallel, sym
+
+
+class TestParallel (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            if x > 0 then y := y + 1 else y := y - 1;
+            if y > 2 then x := x + 1;
+            while y < 3 do
+                y := y + 1;
+            assert x < 5
+          """
+
+    def setUp(self):
+        fd, self.in_file = tempfile.mkstemp(suffix='.prg')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.prg)
+
+    def tearDown(self):
+        os.remove(self.in_file)
+
+    def _args(self, **kwargs):
+        ap = argparse.ArgumentParser()
+        budget.add_arguments(ap)
+        concretize.add_arguments(ap)
+        args = argparse.Namespace(in_file=self.in_file, compact=None, prune=False,
+                                  summarize=False, accelerate=False, intervals=False,
+                                  infer_bounds=False, **kwargs)
+        return ap.parse_args([], args)
+
+    def test_prefix(self):
+        ast1 = ast.parse_string(self.prg)
+        ref = sym.SymExec().run(ast1, sym.SymState())
+        out = []
+        for i in range(2):
+            engine = sym.SymExec()
+            engine.prefix = (i,)
+            res = engine.run(ast1, sym.SymState())
+            self.assertTrue(all(s.branches[0] == i for s in res))
+            out.extend(res)
+        self.assertEqual(len(out), len(ref))
+
+        donated = []
+        engine = sym.SymExec()
+        engine.donate = lambda p: len(p) == 2 and not donated.append(p)
+        res = engine.run(ast1, sym.SymState())
+        self.assertEqual(len(donated), 2)
+        for p in donated:
+            engine = sym.SymExec()
+            engine.prefix = p
+            res.extend(engine.run(ast1, sym.SymState()))
+        self.assertEqual(len(res), len(ref))
+
+    def test_sym(self):
+        args = self._args(strategy='dfs', seed=None, loop_bound=10,
+                          bound=[], merge=False)
+        ref = sym.SymExec().run(ast.parse_string(self.prg), sym.SymState())
+        out = list(parallel.explore(sym._setup, args, 3, sym._report))
+        self.assertEqual(len(out), len(ref))
+
+    def test_exe(self):
+        args = self._args(loop_bound=10, generational=False, stop_on_coverage=False,
+                          enumerate_below=None, enumerate_jobs=1, save_tests=None,
+                          steps=10000)
+        ref = exe.ExeExec().run(ast.parse_string(self.prg), exe.ExeState())
+        out = list(parallel.explore(exe._setup, args, 3, exe._report))
+        self.assertEqual(len(out), len(ref))
+        self.assertEqual(len([v for v, _ in out if not v]),
+                         len([s for s in ref if not s.is_valid()]))
+
+    def test_analyze(self):
+        prgs = [ast.parse_string(self.prg),
+                ast.parse_string("havoc x; assume x > 10; assert x > 15")]
+        ref = [len(sym.SymExec().run(p, sym.SymState())) for p in prgs]
+        out = parallel.analyze(prgs * 4, 4,
+                               lambda ctx: sym.SymExec(ctx=ctx),
+                               lambda ctx: sym.SymState(ctx=ctx))
+        self.assertEqual([len(r) for r in out], ref * 4)
+        self.assertEqual(len(set(r[0].ctx for r in out)), 8)
+
+        out = parallel.analyze(prgs, 2, lambda ctx: exe.ExeExec(ctx=ctx),
+                               lambda ctx: exe.ExeState(ctx=ctx))
+        self.assertNotEqual(out[0][0].sym_state.ctx, z3.main_ctx())
@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from . import persistent
+
+
+class TestPersistent (unittest.TestCase):
+    def test_list(self):
+        base = persistent.PList([1, 2, 3])
+        a = base.append(4).append(5)
+        b = base.extend([6])
+        self.assertEqual(list(base), [1, 2, 3])
+        self.assertEqual(list(a), [1, 2, 3, 4, 5])
+        self.assertEqual(len(b), 4)
+        self.assertIs(a.common(b), base)
+        self.assertEqual(a.since(base), [4, 5])
+        self.assertEqual(len(a.common(persistent.PList([1]))), 0)
+
+    def test_map(self):
+        rnd = random.Random(1)
+        ref = dict()
+        m = persistent.PDict()
+        snapshots = []
+        for i in range(2000):
+            k = rnd.randrange(300)
+            if rnd.random() < 0.7:
+                ref[k] = i
+                m[k] = i
+            elif k in ref:
+                del ref[k]
+                del m[k]
+            if i % 200 == 0:
+                snapshots.append((dict(ref), m.copy()))
+        for r, s in snapshots + [(ref, m)]:
+            self.assertEqual(dict(s.items()), r)
+            self.assertEqual(list(s), list(r))
+            self.assertEqual(len(s), len(r))
+        # removed keys do not pile up in the order of the keys
+        self.assertLessEqual(len(m._map._order), 2 * len(m) + 8)
+
+    def test_collisions(self):
+        class Key(object):
+            def __init__(self, v):
+                self.v = v
+
+            def __hash__(self):
+                return 7
+
+            def __eq__(self, other):
+                return self.v == other.v
+
+        m = persistent.PMap()
+        for i in range(5):
+            m = m.set(Key(i), i)
+        m = m.set(Key(2), 20).remove(Key(3))
+        self.assertEqual([(k.v, v) for k, v in m.items()],
+                         [(0, 0), (1, 1), (2, 20), (4, 4)])
+        self.assertNotIn(Key(3), m)
@@ -0,0 +1,98 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from . import ast, exe, replay
+
+
+class TestReplay (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            if x > 3 then y := y + x else havoc y;
+            i := 0;
+            while i < 3 do i := i + 1;
+            assume y < 100;
+            assert y < 10
+          """
+
+    def _save(self, path, **kwargs):
+        ast1 = ast.parse_string(self.prg)
+        out = exe.ExeExec(**kwargs).run(ast1, exe.ExeState())
+        return ast1, out, replay.save(path, out)
+
+    def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            ast1, out, n = self._save(d)
+            self.assertEqual(n, len([s for s in out if s.inputs is not None]))
+            tests = replay.load(d)
+            self.assertEqual(len(tests), n)
+            self.assertEqual(tests.inputs, ['x!0', 'y!0', 'y!1'])
+            self.assertEqual(tests.outputs, ['x', 'y', 'i'])
+            self.assertEqual(list(tests.output('i')), [3] * n)
+            for i, s in enumerate([s for s in out if s.inputs is not None]):
+                ins, outs = tests.row(i)
+                self.assertEqual(ins['x!0'], s.init_state.env['x'])
+                self.assertEqual(outs['y'], s.con_state.env['y'])
+                self.assertEqual(tests.input('x!0')[i], ins['x!0'])
+            # paths that break the assumption have no inputs to save
+            self.assertEqual(set(tests.status), {replay.VALID, replay.ERROR})
+
+            # the data starts at a multiple of 64 bytes, as numpy expects
+            with open(os.path.join(d, 'inputs.npy'), 'rb') as f:
+                head = f.read(10)
+            self.assertEqual((10 + struct.unpack('<H', head[8:])[0]) % 64, 0)
+
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as d:
+            ast1, out, n = self._save(d)
+            report = replay.replay(ast1, replay.load(d))
+            self.assertTrue(report.is_valid(), report.mismatches)
+            self.assertEqual(report.rows, n)
+            self.assertTrue(report.coverage.is_saturated())
+
+            # a program that changed since the tests were generated
+            ast2 = ast.parse_string(self.prg.replace("y := y + x", "y := y + x + 1"))
+            report = replay.replay(ast2, replay.load(d))
+            self.assertFalse(report.is_valid())
+            self.assertIn('expected', report.mismatches[0][1])
+
+    def test_generational(self):
+        with tempfile.TemporaryDirectory() as d:
+            ast1, out, n = self._save(d, generational=True)
+            report = replay.replay(ast1, replay.load(d))
+            self.assertTrue(report.is_valid(), report.mismatches)
+
+    def test_zero_division(self):
+        ast1 = ast.parse_string("havoc x; y := 10 / (x - 2); assert y < 100")
+        out = exe.ExeExec().run(ast1, exe.ExeState())
+        with tempfile.TemporaryDirectory() as d:
+            self.assertEqual(replay.save(d, out), 2)
+            tests = replay.load(d)
+            self.assertEqual(sorted(tests.status), [replay.VALID, replay.ERROR])
+            report = replay.replay(ast1, tests)
+            self.assertTrue(report.is_valid(), report.mismatches)
+
+    def test_loop_errors(self):
+        # states that failed an assertion in a loop stay errors after it
+        ast1 = ast.parse_string("havoc a, n; i := 0; while i < n do { i := i + 1; assert a > i }")
+        out = exe.ExeExec(loop_bound=3).run(ast1, exe.ExeState())
+        with tempfile.TemporaryDirectory() as d:
+            self.assertEqual(replay.save(d, out), len(out))
+            tests = replay.load(d)
+            self.assertEqual(list(tests.status).count(replay.ERROR), 4)
+            report = replay.replay(ast1, tests)
+            self.assertTrue(report.is_valid(), report.mismatches)
+
+    def test_main(self):
+        prg = os.path.join(os.path.dirname(__file__), 'test1.prg')
+        with tempfile.TemporaryDirectory() as d:
+            with patch('sys.argv', ['wlang.exe', prg, '--save-tests', d]):
+                self.assertEqual(exe.main(), 0)
+            with patch('sys.argv', ['wlang.replay', prg, d]):
+                self.assertEqual(replay.main(), 0)
+            # the workers of --jobs do not send their results back
+            with patch('sys.argv', ['wlang.exe', prg, '--save-tests', d, '--jobs', '2']):
+                with patch('sys.stderr'):
+                    self.assertRaises(SystemExit, exe.main)
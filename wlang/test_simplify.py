@@ -0,0 +1,59 @@
+import unittest
+import z3
+
+from . import ast, sym
+from . import simplify as smp
+
+
+class TestSimplify (unittest.TestCase):
+    def test_fold(self):
+        a = z3.IntVal(7)
+        b = z3.IntVal(-2)
+        self.assertTrue(smp.mk_add(a, b).eq(z3.IntVal(5)))
+        self.assertTrue(smp.mk_mul(a, b).eq(z3.IntVal(-14)))
+        self.assertTrue(smp.mk_div(a, b).eq(z3.simplify(a / b)))
+        self.assertTrue(z3.is_true(smp.mk_rel("<", b, a)))
+        # division by zero is not folded
+        self.assertFalse(z3.is_int_value(smp.mk_div(a, z3.IntVal(0))))
+
+    def test_identities(self):
+        x = z3.Int('x')
+        self.assertTrue(smp.mk_add(x, z3.IntVal(0)).eq(x))
+        self.assertTrue(smp.mk_mul(z3.IntVal(1), x).eq(x))
+        self.assertTrue(smp.mk_mul(z3.IntVal(0), x).eq(z3.IntVal(0)))
+        self.assertTrue(smp.mk_sub(x, x).eq(z3.IntVal(0)))
+        self.assertTrue(smp.mk_not(smp.mk_not(x > 0)).eq(x > 0))
+
+    def test_flatten(self):
+        x, y, z = z3.Ints('x y z')
+        t = smp.mk_and(z3.BoolVal(True), smp.mk_and(x > 0, y > 0), z > 0)
+        self.assertEqual(t.num_args(), 3)
+        self.assertTrue(z3.is_false(smp.mk_and(x > 0, z3.BoolVal(False))))
+        self.assertTrue(z3.is_true(smp.mk_or(x > 0, z3.BoolVal(True))))
+        t = smp.mk_add(smp.mk_add(x, z3.IntVal(1)), smp.mk_add(y, z3.IntVal(2)))
+        self.assertEqual(t.num_args(), 3)
+
+    def test_sym_concrete(self):
+        prg1 = "x := 1 + 2 - 3 * 4 / 5; y := x + 0; havoc z; w := z + 0"
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec()
+        out = engine.run(ast1, sym.SymState())
+        self.assertEqual(len(out), 1)
+        self.assertTrue(z3.is_int_value(out[0].env['x']))
+        self.assertTrue(out[0].env['w'].eq(out[0].env['z']))
+
+    def test_memo(self):
+        prg1 = "havoc x; if x + 1 > 0 then skip"
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec()
+        st = sym.SymState()
+        st.env['x'] = z3.Int('x')
+        cond = ast1.stmts[1].cond
+        t1 = engine.visit(cond, state=st)
+        self.assertIs(engine.visit(cond, state=st), t1)
+        # states with the same value of x share the term
+        _, other = st.fork()
+        other.env['z'] = z3.Int('z')
+        self.assertIs(engine.visit(cond, state=other), t1)
+        st.env['x'] = z3.Int('y')
+        self.assertFalse(engine.visit(cond, state=st).eq(t1))
@@ -24,7 +24,7 @@ import unittest
 import z3 
 from unittest.mock import patch
 
-from . import ast, sym
+from . import ast, budget, sym, util
 
 
 class TestSym (unittest.TestCase):
@@ -204,3 +204,221 @@ pc: [10 < x!14, 15 < x!14]
         st = sym.SymState()
         out = [s for s in engine.run(ast1, st) if not s.is_error()]
         self.assertEquals(len(out), 1)
+
+    def test_compact(self):
+        prg1 =  """
+                    havoc x;
+                    while x < 20 do
+                        x := x + 1
+                """
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec()
+        st = sym.SymState(compact=3)
+        out = [s for s in engine.run(ast1, st)]
+        self.assertEquals(len(out), 11)
+        for s in out:
+            self.assertLessEqual(len(s.path), 6)
+
+        x = z3.Int('x')
+        st = sym.SymState(compact=1)
+        st.add_pc(x < 20, x + 1 < 20, x > 0, z3.BoolVal(True), x > 0)
+        self.assertEquals(len(st.path), 2)
+        self.assertFalse(st.is_empty())
+
+    def test_merge(self):
+        prg1 =  """
+                    havoc a, b, c, d;
+                    x := 0;
+                    if a > 0 then x := x + 1;
+                    if b > 0 then x := x + 1;
+                    if c > 0 then x := x + 1;
+                    if d > 0 then x := x + 1 else assume false
+                """
+        ast1 = ast.parse_string(prg1)
+        out = sym.SymExec().run(ast1, sym.SymState())
+        self.assertEquals(len(out), 8)
+        out = sym.SymExec(merge=True).run(ast1, sym.SymState())
+        self.assertEquals(len(out), 1)
+        self.assertFalse(out[0].is_empty())
+
+        ast1 = ast.parse_string(prg1 + "; assert x < 4")
+        out = sym.SymExec(merge=True).run(ast1, sym.SymState())
+        self.assertEquals(len(out), 2)
+        self.assertEquals(len([s for s in out if s.is_error()]), 1)
+
+        # y is used by every remaining query, so the states are kept apart
+        prg2 = "havoc x, y; if x > 0 then y := 1 else y := 2; assert y > 1"
+        ast1 = ast.parse_string(prg2)
+        out = sym.SymExec(merge=True).run(ast1, sym.SymState())
+        self.assertEquals(len(out), 2)
+        for s in out:
+            self.assertTrue(z3.is_int_value(s.env['y']))
+
+        # j is only defined on the paths that run the loop
+        prg3 = "havoc x; if x > 0 then { j := 0; while j < 2 do j := j + 1 }"
+        ast1 = ast.parse_string(prg3)
+        out = sym.SymExec(merge=True).run(ast1, sym.SymState())
+        self.assertEquals(len(out), 2)
+        self.assertEquals(len([s for s in out if 'j' in s.env]), 1)
+
+    def test_stream(self):
+        prg1 = """
+                    havoc a, b, c;
+                    if a > 0 then x := 1 else x := 2;
+                    if b > 0 then y := 1 else y := 2;
+                    if c > 0 then z := 1 else z := 2
+                """
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec()
+        out = engine.stream(ast1, sym.SymState())
+        self.assertEqual(next(out).env['x'].as_long(), 1)
+        # the else branch of the first if has not been explored yet
+        self.assertNotIn(id(ast1.stmts[1].else_stmt), engine.covered)
+        self.assertEqual(len(list(out)), 7)
+
+    def test_result(self):
+        prg1 = "havoc x; assume x > 10; assert x > 15"
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec(witness=True)
+        out = engine.run(ast1, sym.SymState())
+        self.assertTrue(all(isinstance(s, sym.SymResult) for s in out))
+        self.assertFalse(hasattr(out[0], '_solver'))
+        self.assertTrue(out[0].is_error())
+        self.assertLessEqual(out[0].pick_concerete().env['x'].as_long(), 15)
+        self.assertFalse(out[1].is_empty())
+        self.assertGreater(engine.summary.state_bytes, 0)
+
+        out = sym.SymExec().run(ast1, sym.SymState())
+        self.assertIsNone(out[0].witness)
+        self.assertGreater(out[1].pick_concerete().env['x'].as_long(), 15)
+
+    def test_fork_sharing(self):
+        x = z3.Int('x')
+        st = sym.SymState()
+        st.env['x'] = x
+        st.add_pc(x > 0)
+        parent, child = st.fork()
+        self.assertIs(child.path, parent.path)
+        child.add_pc(x > 5)
+        child.env['y'] = x
+        self.assertEqual(len(parent.path), 1)
+        self.assertNotIn('y', parent.env)
+        self.assertIs(child.path.common(parent.path), parent.path)
+        self.assertFalse(child.is_empty())
+
+    def test_prune(self):
+        prg1 = "havoc x; y := 0; while x > 0 do { if y > 0 then y := 1 else y := 1 }; assert y < 2"
+        ast1 = ast.parse_string(prg1)
+        ref = sym.SymExec()
+        ref.run(ast1, sym.SymState())
+        engine = sym.SymExec(prune=True)
+        out = engine.run(ast1, sym.SymState())
+        # the loop is the same from the second iteration on and never exits
+        self.assertGreater(engine.visited.pruned, 0)
+        self.assertEqual(len(out), 1)
+        self.assertLess(engine.summary.queries, ref.summary.queries)
+        self.assertFalse(any(s.is_error() for s in out))
+
+        prg2 = "havoc x; y := 0; while x > 0 do { x := x - 1; y := y + 1 }; assert y < 3"
+        ast2 = ast.parse_string(prg2)
+        engine = sym.SymExec(prune=True)
+        out = engine.run(ast2, sym.SymState())
+        self.assertEqual(engine.visited.pruned, 0)
+        self.assertEqual(len([s for s in out if s.is_error()]), 8)
+
+    def test_summarize(self):
+        prg1 = """
+                    havoc n; assume n >= 0; i := 0; s := 0;
+                    while i < n inv i <= n and i >= 0 and s >= 0 do { s := s + i; i := i + 1 };
+                    assert i = n; assert s >= 0
+                """
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec(summarize=True)
+        out = engine.run(ast1, sym.SymState())
+        # one state after the loop no matter how large n is
+        self.assertEqual(len(out), 1)
+        self.assertFalse(out[0].is_error())
+        self.assertTrue(engine.summary.is_complete())
+
+        # not true on entry
+        prg2 = "havoc n; i := 0; while i < n inv i <= n do i := i + 1"
+        out = sym.SymExec(summarize=True).run(ast.parse_string(prg2), sym.SymState())
+        self.assertEqual(len([s for s in out if s.is_error()]), 1)
+
+        # not inductive
+        prg3 = "i := 5; while i > 0 inv i >= 0 do i := i - 2; assert i = 0"
+        ast3 = ast.parse_string(prg3)
+        for merge in (False, True):
+            out = sym.SymExec(summarize=True, merge=merge).run(ast3, sym.SymState())
+            self.assertEqual(len(out), 2)
+            self.assertEqual(len([s for s in out if s.is_error()]), 1)
+
+    def test_accelerate(self):
+        prg1 = "havoc x; y := 0; while x > 0 do { x := x - 3; y := y + 1 }; assert x > -3"
+        ast1 = ast.parse_string(prg1)
+        engine = sym.SymExec(accelerate=True)
+        out = engine.run(ast1, sym.SymState())
+        # a single exit state covers every number of iterations
+        self.assertEqual(len(out), 2)
+        self.assertTrue(engine.summary.is_complete())
+        bad = [s for s in out if s.is_error()]
+        self.assertEqual(len(bad), 1)
+        self.assertEqual(bad[0].pick_concerete().env['x'].as_long(), -3)
+
+        prg2 = "x := 0; while x < 1000000 do x := x + 1; assert x = 1000000"
+        engine = sym.SymExec(accelerate=True)
+        out = engine.run(ast.parse_string(prg2), sym.SymState())
+        self.assertEqual(len(out), 1)
+        self.assertFalse(out[0].is_error())
+        self.assertLess(engine.summary.queries, 5)
+
+        # the loop never exits
+        prg3 = "x := 0; while x >= 0 do x := x + 1"
+        out = sym.SymExec(accelerate=True).run(ast.parse_string(prg3), sym.SymState())
+        self.assertEqual(len(out), 0)
+
+        # bodies with branches are unrolled
+        prg4 = "havoc x; while x < 3 do { x := x + 1; if x > 1 then skip }"
+        ast4 = ast.parse_string(prg4)
+        out = sym.SymExec(accelerate=True).run(ast4, sym.SymState())
+        self.assertEqual(len(out), len(sym.SymExec().run(ast4, sym.SymState())))
+
+    def test_infer_bounds(self):
+        prg1 = "i := 0; while i < 15 do i := i + 1; assert i = 15; havoc n; while n > 0 do n := n - 1"
+        ast1 = ast.parse_string(prg1)
+        out = sym.SymExec(loop_bound=3).run(ast1, sym.SymState())
+        self.assertEqual(len(out), 0)
+
+        engine = sym.SymExec(loop_bound=3, infer_bounds=True)
+        out = engine.run(ast1, sym.SymState())
+        # the second loop is unbounded and keeps the default
+        self.assertEqual(len(out), 4)
+        self.assertFalse(any(s.is_error() for s in out))
+        loops = util.loops(ast1)
+        self.assertEqual(engine.get_loop_bound(loops[0]), 15)
+        self.assertEqual(engine.get_loop_bound(loops[1]), 3)
+        engine.set_loop_bound(loops[0], 20)
+        self.assertEqual(engine.get_loop_bound(loops[0]), 20)
+
+
+    def test_model_cache(self):
+        st = sym.SymState()
+        st.budget = budget.Budget()
+        x = z3.Int('x')
+        st.add_pc(x > 3)
+        self.assertFalse(st.is_empty())
+        self.assertGreater(st.pick_concerete().env.get('x', 4), 3)
+        self.assertIsNotNone(st.model())
+        self.assertEqual(st.budget.num_queries, 1)
+        # a fork has the same path and reuses the model
+        _, child = st.fork()
+        self.assertFalse(child.is_empty())
+        self.assertEqual(st.budget.num_queries, 1)
+        child.add_pc(x < 2)
+        self.assertTrue(child.is_empty())
+        self.assertIsNone(child.model())
+        self.assertEqual(st.budget.num_queries, 2)
+        # queries on top of the path do not touch the model
+        self.assertTrue(st.implies(x > 0))
+        self.assertIsNotNone(st.model())
+        self.assertEqual(st.budget.num_queries, 3)
@@ -21,9 +21,50 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import unittest
-from . import util
+from . import ast, util
 
 class UtilTest (unittest.TestCase):
     def test_one (self):
         # TODO
         self.assertTrue (True)
+
+    def test_loops(self):
+        prg = "while x < 1 do { while y < 1 do skip }; if x < 1 then while z < 1 do skip"
+        res = util.loops(ast.parse_string(prg))
+        self.assertEqual([str(l.cond) for l in res], ["(x < 1)", "(y < 1)", "(z < 1)"])
+
+    def test_branch_sites(self):
+        prg = "assert x > 0; while x < 1 do { if y < 1 then skip else assert y = 2 }; skip"
+        res = util.branch_sites(ast.parse_string(prg))
+        self.assertEqual([str(s.cond) for s in res], ["(x > 0)", "(x < 1)", "(y < 1)", "(y = 2)"])
+
+    def test_assigned_vars(self):
+        prg = "x := 1; if x < 1 then havoc y, x else while z < 1 do z := z + 1; assert w > 0"
+        res = util.assigned_vars(ast.parse_string(prg))
+        self.assertEqual(res, ["x", "y", "z"])
+
+    def test_increments(self):
+        prg = "x := x + 1; skip; y := y - 2 * 3; x := x - 4; y := 1 + y"
+        self.assertEqual(util.increments(ast.parse_string(prg)), {"x": -3, "y": -5})
+        prg = "x := x + 1; y := y + x"
+        self.assertIsNone(util.increments(ast.parse_string(prg)))
+        prg = "x := x + 1; if x > 0 then skip"
+        self.assertIsNone(util.increments(ast.parse_string(prg)))
+
+    def test_is_affine_cond(self):
+        def cond(text):
+            return ast.parse_string("while " + text + " do skip").cond
+        self.assertTrue(util.is_affine_cond(cond("x < 2 * n and not (y > x + 3)"), {"x", "y"}))
+        self.assertTrue(util.is_affine_cond(cond("x * n < 10"), {"x"}))
+        self.assertFalse(util.is_affine_cond(cond("x * y < 10"), {"x", "y"}))
+        self.assertFalse(util.is_affine_cond(cond("x < 1 or x > 5"), {"x"}))
+        self.assertFalse(util.is_affine_cond(cond("not (x = 3)"), {"x"}))
+        self.assertFalse(util.is_affine_cond(cond("x / 2 < 3"), {"x"}))
+
+    def test_counter_step(self):
+        body = ast.parse_string("x := x + 1; if y > 0 then y := 0; x := x + 2; z := x")
+        self.assertEqual(util.counter_step(body, "x"), 3)
+        self.assertEqual(util.counter_step(body, "w"), 0)
+        self.assertIsNone(util.counter_step(body, "y"))
+        self.assertIsNone(util.counter_step(body, "z"))
+
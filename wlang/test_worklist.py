@@ -0,0 +1,49 @@
+import unittest
+
+from . import ast, sym, util, worklist
+
+
+class TestWorklist (unittest.TestCase):
+    prg = """
+            havoc x, y;
+            if x > 0 then y := y + 1 else y := y - 1;
+            while y < 3 do
+                y := y + 1;
+            assert x < 5
+          """
+
+    def test_strategies(self):
+        ast1 = ast.parse_string(self.prg)
+        ref = sym.SymExec().run(ast1, sym.SymState())
+        for name in sorted(worklist.STRATEGIES.keys()):
+            engine = sym.SymExec(strategy=worklist.make_strategy(name, seed=1))
+            out = engine.run(ast1, sym.SymState())
+            self.assertEqual(len(out), len(ref))
+            self.assertEqual(len([s for s in out if s.is_error()]),
+                             len([s for s in ref if s.is_error()]))
+        # strategies must say how they order states
+        self.assertRaises(TypeError, worklist.Strategy)
+
+    def test_dfs_order(self):
+        ast1 = ast.parse_string("havoc x; assume x > 10; assert x > 15")
+        out = sym.SymExec().run(ast1, sym.SymState())
+        self.assertTrue(out[0].is_error())
+        self.assertFalse(out[1].is_error())
+
+    def test_loop_bound(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = sym.SymExec(loop_bound=2)
+        out = engine.run(ast1, sym.SymState())
+        engine = sym.SymExec()
+        engine.set_loop_bound(util.loops(ast1)[0], 2)
+        self.assertEqual(len(engine.run(ast1, sym.SymState())), len(out))
+
+        engine = sym.SymExec(loop_bound=0)
+        out = engine.run(ast1, sym.SymState())
+        self.assertEqual(len(out), 3)
+
+    def test_coverage(self):
+        ast1 = ast.parse_string(self.prg)
+        engine = sym.SymExec(strategy=worklist.CoverageNew())
+        engine.run(ast1, sym.SymState())
+        self.assertIn(id(ast1.stmts[2].body), engine.covered)
@@ -55,6 +55,190 @@ def _hash_cons_rec(exp, table):
     return table[key]
 
 
+def loops(node):
+    """Return all the loops of a program in program order"""
+    res = list()
+    _loops_rec(node, res)
+    return res
+
+
+def _loops_rec(node, res):
+    if isinstance(node, ast.StmtList):
+        for s in node.stmts:
+            _loops_rec(s, res)
+    elif isinstance(node, ast.IfStmt):
+        _loops_rec(node.then_stmt, res)
+        if node.has_else():
+            _loops_rec(node.else_stmt, res)
+    elif isinstance(node, ast.WhileStmt):
+        res.append(node)
+        _loops_rec(node.body, res)
+
+
+def branch_sites(node):
+    """Return all the ifs, loops and asserts of a program in program order"""
+    res = list()
+    _sites_rec(node, res)
+    return res
+
+
+def _sites_rec(node, res):
+    if isinstance(node, ast.StmtList):
+        for s in node.stmts:
+            _sites_rec(s, res)
+    elif isinstance(node, ast.IfStmt):
+        res.append(node)
+        _sites_rec(node.then_stmt, res)
+        if node.has_else():
+            _sites_rec(node.else_stmt, res)
+    elif isinstance(node, ast.WhileStmt):
+        res.append(node)
+        _sites_rec(node.body, res)
+    elif isinstance(node, ast.AssertStmt):
+        res.append(node)
+
+
+def assigned_vars(node):
+    """Return the names of all variables a statement may change, in
+    program order"""
+    res = list()
+    _assigned_rec(node, res)
+    return res
+
+
+def _assigned_rec(node, res):
+    if isinstance(node, ast.StmtList):
+        for s in node.stmts:
+            _assigned_rec(s, res)
+    elif isinstance(node, ast.IfStmt):
+        _assigned_rec(node.then_stmt, res)
+        if node.has_else():
+            _assigned_rec(node.else_stmt, res)
+    elif isinstance(node, ast.WhileStmt):
+        _assigned_rec(node.body, res)
+    elif isinstance(node, ast.AsgnStmt):
+        if node.lhs.name not in res:
+            res.append(node.lhs.name)
+    elif isinstance(node, ast.HavocStmt):
+        for v in node.vars:
+            if v.name not in res:
+                res.append(v.name)
+
+
+def increments(node):
+    """Return how much a statement adds to every variable it changes, or
+    None if it does anything but add constants to variables"""
+    res = dict()
+    if not _increments_rec(node, res):
+        return None
+    return res
+
+
+def _increments_rec(node, res):
+    if isinstance(node, ast.StmtList):
+        return all(_increments_rec(s, res) for s in node.stmts)
+    if isinstance(node, (ast.SkipStmt, ast.PrintStateStmt)):
+        return True
+    if not isinstance(node, ast.AsgnStmt):
+        return False
+
+    rhs = node.rhs
+    if not isinstance(rhs, ast.AExp) or rhs.op not in ("+", "-"):
+        return False
+    if rhs.arg(0) == node.lhs:
+        delta = const_value(rhs.arg(1))
+        if delta is not None and rhs.op == "-":
+            delta = -delta
+    elif rhs.op == "+" and rhs.arg(1) == node.lhs:
+        delta = const_value(rhs.arg(0))
+    else:
+        delta = None
+    if delta is None:
+        return False
+    res[node.lhs.name] = res.get(node.lhs.name, 0) + delta
+    return True
+
+
+def counter_step(node, name):
+    """Return the constant a statement adds to a variable every time it is
+    executed, None if it may change the variable in any other way"""
+    stmts = node.stmts if isinstance(node, ast.StmtList) else [node]
+    res = 0
+    for s in stmts:
+        if isinstance(s, ast.AsgnStmt) and s.lhs.name == name:
+            incs = increments(s)
+            if incs is None:
+                return None
+            res += incs[name]
+        elif name in assigned_vars(s):
+            return None
+    return res
+
+
+def const_value(exp):
+    """Return the value of an arithmetic expression without variables,
+    None if it has any"""
+    if isinstance(exp, ast.IntConst):
+        return exp.val
+    if not isinstance(exp, ast.AExp) or exp.op not in ("+", "-", "*"):
+        return None
+    vals = [const_value(a) for a in exp.args]
+    if None in vals:
+        return None
+    res = vals[0]
+    for v in vals[1:]:
+        if exp.op == "+":
+            res = res + v
+        elif exp.op == "-":
+            res = res - v
+        else:
+            res = res * v
+    return res
+
+
+def is_affine_cond(exp, names):
+    """Return True if a condition is a conjunction of comparisons that are
+    affine in the given variables.
+
+    The values of the variables for which such a condition holds form a
+    convex set.
+    """
+    if isinstance(exp, ast.BoolConst):
+        return True
+    if isinstance(exp, ast.RelExp):
+        return all(_is_affine(a, names) for a in exp.args)
+    if not isinstance(exp, ast.BExp):
+        return False
+    if exp.op == "and":
+        return all(is_affine_cond(a, names) for a in exp.args)
+    if exp.op == "not":
+        # the negation of an equality is not convex
+        kid = exp.arg(0)
+        return (isinstance(kid, ast.RelExp) and kid.op != "="
+                and is_affine_cond(kid, names))
+    return False
+
+
+def _is_affine(exp, names):
+    if isinstance(exp, (ast.IntConst, ast.IntVar)):
+        return True
+    if exp.op in ("+", "-"):
+        return all(_is_affine(a, names) for a in exp.args)
+    uses = [a for a in exp.args if uses_vars(a, names)]
+    if exp.op == "*":
+        return len(uses) <= 1 and all(_is_affine(a, names) for a in exp.args)
+    return len(uses) == 0
+
+
+def uses_vars(exp, names):
+    """Return True if an expression reads one of the given variables"""
+    if isinstance(exp, ast.IntVar):
+        return exp.name in names
+    if isinstance(exp, ast.Exp):
+        return any(uses_vars(a, names) for a in exp.args)
+    return False
+
+
 def test():
     x1 = ast.IntVar("x")
     n1 = ast.IntConst(5)
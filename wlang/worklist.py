@@ -0,0 +1,165 @@
+"""
+Worklist of pending symbolic states and the strategies that order it.
+
+A pending state is paired with a continuation: the stack of statements
+it still has to execute. Continuations are persistent cons-lists of
+frames ``((node, depth), rest)`` so siblings created by a fork share
+everything below the statement that forked them.
+"""
+import abc
+import heapq
+import math
+import random
+
+
+def push(kont, node, depth=0):
+    """Push a statement on a continuation"""
+    return ((node, depth), kont)
+
+
+class Join(object):
+    """A join point that collects states before they are merged.
+
+    ``pending`` is the number of live states that still have to reach
+    the join point.
+    """
+
+    def __init__(self, node, pending):
+        self.node = node
+        self.pending = pending
+        self.states = list()
+        # continuation of the states once they are merged
+        self.kont = None
+
+
+class Visit(object):
+    """A program point where states subsumed by earlier ones are pruned"""
+
+    def __init__(self, node):
+        self.node = node
+
+
+class Check(object):
+    """The end of the body of a summarized loop, where its invariant is
+    checked to be inductive"""
+
+    def __init__(self, node):
+        self.node = node
+
+
+def joins(kont):
+    """All join points of a continuation"""
+    while kont is not None:
+        (node, _), kont = kont
+        if isinstance(node, Join):
+            yield node
+
+
+class Strategy(abc.ABC):
+    """Base class of search strategies.
+
+    A strategy maps a pending state to a priority; states with smaller
+    priorities are explored first. ``batch`` numbers the fork that
+    created the state and ``idx`` its position among the siblings.
+    """
+
+    @abc.abstractmethod
+    def priority(self, engine, state, kont, batch, idx):
+        """The priority of a pending state"""
+
+
+class DFS(Strategy):
+    """Depth-first search, the order of the recursive engines"""
+
+    def priority(self, engine, state, kont, batch, idx):
+        return (-batch, idx)
+
+
+class BFS(Strategy):
+    """Breadth-first search"""
+
+    def priority(self, engine, state, kont, batch, idx):
+        return (batch, idx)
+
+
+class RandomPath(Strategy):
+    """Random path selection.
+
+    Every state races with an exponential clock whose rate halves with
+    each branch on its path, so shallow states are picked as often as
+    all of their descendants together.
+    """
+
+    def __init__(self, seed=None):
+        self._rnd = random.Random(seed)
+
+    def priority(self, engine, state, kont, batch, idx):
+        depth = min(engine.pc_size(state), 1000)
+        return self._rnd.expovariate(1.0) * math.pow(2.0, depth)
+
+
+class FewestConstraints(Strategy):
+    """Prefer states with the smallest path condition"""
+
+    def priority(self, engine, state, kont, batch, idx):
+        return (engine.pc_size(state), -batch, idx)
+
+
+class CoverageNew(Strategy):
+    """Prefer states that are about to execute a statement not covered yet"""
+
+    def priority(self, engine, state, kont, batch, idx):
+        if kont is None:
+            new = 0
+        else:
+            new = 0 if id(kont[0][0]) not in engine.covered else 1
+        return (new, -batch, idx)
+
+
+STRATEGIES = {
+    'dfs': DFS,
+    'bfs': BFS,
+    'random': RandomPath,
+    'fewest': FewestConstraints,
+    'coverage': CoverageNew,
+}
+
+
+def make_strategy(name, seed=None):
+    if name == 'random':
+        return RandomPath(seed)
+    return STRATEGIES[name]()
+
+
+class Worklist(object):
+    """Priority queue of (state, continuation) pairs"""
+
+    def __init__(self, engine, strategy=None):
+        self._engine = engine
+        self._strategy = strategy if strategy is not None else DFS()
+        self._heap = []
+        self._batch = 0
+        # tie breaker so that states are never compared
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def extend(self, items):
+        """Add the successors of a single step"""
+        self._batch += 1
+        for idx, (state, kont) in enumerate(items):
+            prio = self._strategy.priority(self._engine, state, kont,
+                                           self._batch, idx)
+            self._seq += 1
+            heapq.heappush(self._heap, (prio, self._seq, state, kont))
+
+    def pop(self):
+        _, _, state, kont = heapq.heappop(self._heap)
+        return (state, kont)
+
+    def drain(self):
+        """Remove and return every pending pair"""
+        res = [(state, kont) for _, _, state, kont in self._heap]
+        self._heap = []
+        return res